@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark of input latency while library is being parsed.
+
+Simulates UI input loop with a thread that wakes up every millisecond
+and measures how late it wakes up while another thread parses
+a 50k-track library page by page, with parsing in worker process off and on
+(see ``parse_in_process`` setting).
+
+Usage::
+
+    python benchmarks/parse_latency.py
+"""
+import gc
+import sys
+import threading
+import time
+
+sys.path.insert(0, '.')
+
+from track_parsing import make_payload  # pylint: disable=wrong-import-position
+
+TRACK_COUNT = 50000
+PAGE_SIZE = 1000
+TICK = 0.001
+
+
+def measure_latency(load):
+    """
+    Call *load* in a thread while measuring wake-up delays of another thread.
+    Return a tuple of load duration & sorted list of delays (in seconds).
+    """
+    delays = []
+    is_loading = threading.Event()
+    is_loading.set()
+
+    def tick():
+        """
+        Input loop stand-in.
+        """
+        while is_loading.is_set():
+            started_at = time.time()
+            time.sleep(TICK)
+            delays.append(time.time() - started_at - TICK)
+
+    ticker = threading.Thread(target=tick)
+    ticker.start()
+    started_at = time.time()
+    loader = threading.Thread(target=load)
+    loader.start()
+    loader.join()
+    duration = time.time() - started_at
+    is_loading.clear()
+    ticker.join()
+    return duration, sorted(delays)
+
+
+def main():
+    """
+    Run benchmark & print results.
+    """
+    from clay.gp import Track  # pylint: disable=import-outside-toplevel
+    from clay.library import TrackColumns  # pylint: disable=import-outside-toplevel
+    from clay.parsing import parser_process  # pylint: disable=import-outside-toplevel
+
+    pages = [
+        [make_payload(index) for index in range(offset, offset + PAGE_SIZE)]
+        for offset in range(0, TRACK_COUNT, PAGE_SIZE)
+    ]
+    # Start worker process before measuring, like the first page of a real load would.
+    parser_process.parse(pages[0][:1])
+
+    print('{:>12} {:>8} {:>9} {:>9} {:>9}'.format('mode', 'load', 'p50', 'p99', 'max'))
+    for parse_in_process in (False, True):
+        Track.parse_in_process = parse_in_process
+
+        def load():
+            """
+            Parse all pages like library loading does.
+            """
+            columns = TrackColumns()
+            for page in pages:
+                Track.from_data(page, Track.SOURCE_LIBRARY, True, columns)
+
+        # Start both runs with the same garbage collector state.
+        gc.collect()
+        duration, delays = measure_latency(load)
+        print('{:>12} {:7.3f}s {:8.2f}ms {:8.2f}ms {:8.2f}ms'.format(
+            'process' if parse_in_process else 'thread',
+            duration,
+            delays[len(delays) // 2] * 1000,
+            delays[int(len(delays) * 0.99)] * 1000,
+            delays[-1] * 1000
+        ))
+
+
+if __name__ == '__main__':
+    main()
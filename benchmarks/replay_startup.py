@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark of app startup against recorded API calls (see :mod:`clay.replay`).
+
+Measures time from login to library, playlists & stations being loaded
+and to the first bytes of audio of the first library track.
+No network is used, so results can be compared between releases.
+
+Record API calls by running the app with ``CLAY_RECORD=calls.jsonl``, or generate
+a synthetic recording with ``--generate``.
+
+Usage::
+
+    python benchmarks/replay_startup.py calls.jsonl --latency 0.1
+    python benchmarks/replay_startup.py synthetic.jsonl --generate 20000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+try:  # Python 3.x
+    from urllib.request import urlopen
+except ImportError:  # Python 2.x
+    from urllib2 import urlopen
+
+sys.path.insert(0, '.')  # noqa
+
+from track_parsing import make_payload  # pylint: disable=wrong-import-position
+
+
+def generate_recording(path, track_count, playlist_count=20, station_count=20):
+    """
+    Write a synthetic recording with *track_count* library tracks,
+    *playlist_count* playlists & *station_count* stations.
+    """
+    tracks = [make_payload(index) for index in range(track_count)]
+    playlists = [
+        dict(kind='sj#playlist', id='playlist-{}'.format(index),
+             name='Playlist #{}'.format(index), type='USER_GENERATED', deleted=False)
+        for index in range(playlist_count)
+    ]
+    entries = [
+        dict(kind='sj#playlistEntry', id='entry-{}'.format(index),
+             playlistId='playlist-{}'.format(index % playlist_count),
+             trackId=track['id'], absolutePosition='{:020d}'.format(index),
+             source='1', deleted=False)
+        for index, track in enumerate(tracks[:playlist_count * 100])
+    ]
+    stations = [
+        dict(kind='sj#radioStation', id='station-{}'.format(index),
+             name='Station #{}'.format(index), inLibrary=True, deleted=False)
+        for index in range(station_count)
+    ]
+    station_tracks = [make_payload(track_count + index) for index in range(50)]
+    responses = [
+        ('Config', {'data': {'entries': [{'key': 'isNautilusUser', 'value': 'true'}]}}),
+        ('ListTracks', {'data': {'items': tracks}}),
+        ('ListPlaylists', {'data': {'items': playlists}}),
+        ('ListPlaylistEntries', {'data': {'items': entries}}),
+        ('ListStations', {'data': {'items': stations}}),
+        ('ListStationTracks', {'data': {'stations': [{'tracks': station_tracks}]}}),
+    ]
+    with open(path, 'w') as recording:
+        for protocol, response in responses:
+            recording.write(json.dumps(dict(
+                protocol=protocol, args=[], kwargs={}, response=response
+            )) + '\n')
+
+
+def run(path, latency):
+    """
+    Start the app core against *path* recording and return a list of (step, seconds) tuples.
+    """
+    os.environ['CLAY_REPLAY'] = path
+    os.environ['CLAY_REPLAY_LATENCY'] = str(latency)
+    # Keep config, cache & snapshot of this run away from the real ones.
+    home = tempfile.mkdtemp(prefix='clay-benchmark-')
+    os.environ['XDG_CONFIG_HOME'] = os.path.join(home, 'config')
+    os.environ['XDG_CACHE_HOME'] = os.path.join(home, 'cache')
+
+    from clay.gp import gp  # pylint: disable=import-outside-toplevel
+
+    timings = []
+    finished = threading.Semaphore(0)
+    started_at = time.time()
+
+    def on_loaded(step):
+        """
+        Return callback that records time of *step*.
+        """
+        def callback(_, error):
+            """
+            Called when data is loaded.
+            """
+            if error:
+                raise error
+            timings.append((step, time.time() - started_at))
+            finished.release()
+        return callback
+
+    assert gp.use_authtoken('replay', 'replay'), 'Replay login failed'
+    timings.append(('login', time.time() - started_at))
+    gp.get_all_tracks_async(callback=on_loaded('library'))
+    gp.get_all_user_playlist_contents_async(callback=on_loaded('playlists'))
+    gp.get_all_user_station_contents_async(callback=on_loaded('stations'))
+    for _ in range(3):
+        finished.acquire()
+
+    track = gp.cached_tracks[0]
+    urlopen(gp.get_stream_url(track.store_id)).read(1)
+    timings.append(('first audio', time.time() - started_at))
+    return timings
+
+
+def main():
+    """
+    Parse arguments, run benchmark & print results.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('recording', help='file with recorded API calls')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='synthetic latency of each API call, in seconds')
+    parser.add_argument('--generate', type=int, metavar='TRACKS',
+                        help='write a synthetic recording with given number of tracks first')
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_recording(args.recording, args.generate)
+
+    for step, seconds in sorted(run(args.recording, args.latency), key=lambda item: item[1]):
+        print('{:>12}: {:8.3f}s'.format(step, seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Benchmark for parsing library payloads into :class:`clay.track.Track` instances.
+
+Reports resident memory per track (after API payloads are released)
+and parse rate for libraries of 10k, 50k & 100k tracks,
+with and without retaining original payloads.
+
+Usage::
+
+    python benchmarks/track_parsing.py
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from uuid import UUID
+
+sys.path.insert(0, '.')
+
+SIZES = (10000, 50000, 100000)
+
+
+def make_payload(index):
+    """
+    Return a library track payload that resembles Google Play Music API response.
+    """
+    return {
+        'kind': 'sj#track',
+        'id': str(UUID(int=index)),
+        'clientId': 'client-{}'.format(index),
+        'creationTimestamp': '1500000000000000',
+        'lastModifiedTimestamp': '1500000000000000',
+        'recentTimestamp': '1500000000000000',
+        'deleted': False,
+        'title': 'Track title #{}'.format(index),
+        'artist': 'Artist #{}'.format(index % 1000),
+        'composer': '',
+        'album': 'Album #{}'.format(index % 5000),
+        'albumArtist': 'Artist #{}'.format(index % 1000),
+        'year': 2000 + index % 20,
+        'trackNumber': index % 15,
+        'genre': 'Genre',
+        'durationMillis': str(180000 + index % 60000),
+        'albumArtRef': [{'url': 'https://lh3.googleusercontent.com/album{}'.format(index % 5000)}],
+        'artistArtRef': [
+            {
+                'kind': 'sj#imageRef',
+                'url': 'https://lh3.googleusercontent.com/artist{}'.format(index % 1000),
+                'aspectRatio': '2',
+                'autogen': False
+            },
+            {
+                'kind': 'sj#imageRef',
+                'url': 'https://lh3.googleusercontent.com/artist{}-wide'.format(index % 1000),
+                'aspectRatio': '1',
+                'autogen': False
+            }
+        ],
+        'playCount': index % 50,
+        'discNumber': 1,
+        'estimatedSize': '7000000',
+        'trackType': '8',
+        'storeId': 'T{:026d}'.format(index),
+        'albumId': 'B{:026d}'.format(index % 5000),
+        'artistId': ['A{:026d}'.format(index % 1000)],
+        'nid': 'T{:026d}'.format(index),
+        'explicitType': '2',
+        'rating': '0',
+    }
+
+
+def measure(size, keep_original_data):
+    """
+    Parse *size* payloads and return a tuple of bytes per track & tracks parsed per second.
+    """
+    # Imported here, so payloads can be generated without initializing the app.
+    from clay.gp import Track  # pylint: disable=import-outside-toplevel
+
+    Track.keep_original_data = keep_original_data
+    gc.collect()
+    tracemalloc.start()
+    payloads = [make_payload(index) for index in range(size)]
+
+    start = time.time()
+    tracks = Track.from_data(payloads, Track.SOURCE_LIBRARY, many=True)
+    elapsed = time.time() - start
+
+    del payloads
+    gc.collect()
+    resident, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert len(tracks) == size
+    return resident / float(size), size / elapsed
+
+
+def main():
+    """
+    Run benchmark & print results.
+    """
+    print('{:>8} {:>14} {:>16} {:>16}'.format(
+        'tracks', 'keep payload', 'bytes/track', 'tracks/second'
+    ))
+    for size in SIZES:
+        for keep_original_data in (False, True):
+            bytes_per_track, rate = measure(size, keep_original_data)
+            print('{:>8} {:>14} {:>16.0f} {:>16.0f}'.format(
+                size, str(keep_original_data), bytes_per_track, rate
+            ))
+
+
+if __name__ == '__main__':
+    main()
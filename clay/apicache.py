@@ -0,0 +1,256 @@
+"""
+Response cache for read-only Google Play Music API protocols.
+"""
+from collections import OrderedDict
+from contextlib import contextmanager
+from hashlib import sha1
+from threading import Lock, local
+import copy
+import json
+import time
+
+from clay.log import logger
+from clay.settings import settings
+
+DISK_CACHE_PREFIX = 'api-'
+
+
+class _APICache(object):
+    """
+    Caches responses of read-only protocols that are called via
+    :meth:`gmusicapi.Mobileclient._make_call`.
+
+    Responses are kept in a bounded in-memory LRU and,
+    if ``api_disk_cache`` setting is enabled, in cache dir as well
+    (up to *disk_size* files named after protocol, expiration time & cache key).
+    Responses of mutating protocols invalidate cached responses
+    of protocols they affect. Responses are keyed by account
+    (see :meth:`.set_account`), so they never leak from one account into another.
+
+    Singleton.
+    """
+    # Time to live of cached responses per protocol, in seconds.
+    TTLS = {
+        'Search': 600,
+        'ListStations': 300,
+        'ListStationTracks': 60,
+    }
+    # Protocols whose cached responses are invalidated by each mutating protocol.
+    INVALIDATES = {
+        'BatchMutateStations': ('ListStations', 'ListStationTracks'),
+        'BatchMutateTracks': ('Search', 'ListStationTracks'),
+    }
+
+    def __init__(self, size=100, disk_size=500):
+        self.size = size
+        self.disk_size = disk_size
+        self.use_disk = bool(settings.get('api_disk_cache', 'clay_settings'))
+
+        self._account = None
+        self._entries = OrderedDict()
+        # Cache key -> (protocol name, expiration time, file name) of responses in cache dir.
+        self._disk_entries = None
+        self._lock = Lock()
+        self._local = local()
+
+    @contextmanager
+    def bypassed(self):
+        """
+        Context manager that makes calls from current thread skip cache lookups.
+        Fresh responses are still stored.
+        """
+        self._local.is_bypassed = True
+        try:
+            yield
+        finally:
+            self._local.is_bypassed = False
+
+    def set_account(self, account):
+        """
+        Serve responses cached for *account* (a string that identifies it,
+        e.g. auth token, or ``None`` if nobody is logged in).
+        Responses of other accounts are never served.
+        """
+        with self._lock:
+            if account == self._account:
+                return
+            self._account = account
+            self._entries.clear()
+
+    def _get_key(self, name, args, kwargs):
+        """
+        Return cache key for protocol call.
+        """
+        return sha1(
+            repr((self._account, name, args, sorted(kwargs.items()))).encode('utf-8')
+        ).hexdigest()
+
+    @staticmethod
+    def _get_filename(name, expires_at, key):
+        """
+        Return name of file in cache dir for response.
+        Protocol name & expiration time are kept in file name
+        so that they can be checked without reading the file.
+        """
+        return '{}{}-{}-{}'.format(DISK_CACHE_PREFIX, name, int(expires_at), key)
+
+    def call(self, make_call, protocol, *args, **kwargs):
+        """
+        Perform protocol call with *make_call* unless its response is cached.
+        Returns a copy of cached response, so callers are free to modify it.
+        """
+        name = protocol.__name__
+        ttl = _APICache.TTLS.get(name)
+        if ttl is None:
+            response = make_call(protocol, *args, **kwargs)
+            if name in _APICache.INVALIDATES:
+                self.invalidate(*_APICache.INVALIDATES[name])
+            return response
+
+        key = self._get_key(name, args, kwargs)
+        if not getattr(self._local, 'is_bypassed', False):
+            response = self._get(key)
+            if response is not None:
+                logger.debug('API cache hit: %s', name)
+                return copy.deepcopy(response)
+
+        response = make_call(protocol, *args, **kwargs)
+        self._put(name, key, copy.deepcopy(response), time.time() + ttl)
+        return response
+
+    def _get(self, key):
+        """
+        Return cached response by key, ``None`` if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry[1] > now:
+                self._entries[key] = entry
+                return entry[2]
+            if not self.use_disk:
+                return None
+            disk_entry = self._get_disk_entries().get(key)
+
+        if disk_entry is None or disk_entry[1] <= now:
+            return None
+        response = self._read_disk_response(disk_entry[2])
+        if response is None:
+            return None
+        with self._lock:
+            self._entries[key] = (disk_entry[0], disk_entry[1], response)
+            self._trim()
+        return response
+
+    def _put(self, name, key, response, expires_at):
+        """
+        Store response.
+        """
+        entry = (name, expires_at, response)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            self._trim()
+            if not self.use_disk:
+                return
+            disk_entries = self._get_disk_entries()
+            old_disk_entry = disk_entries.get(key)
+            disk_entry = (name, expires_at, self._get_filename(name, expires_at, key))
+            disk_entries[key] = disk_entry
+            stale_filenames = self._trim_disk()
+
+        settings.save_file_to_cache(disk_entry[2], json.dumps(response).encode('utf-8'))
+        if old_disk_entry is not None:
+            stale_filenames.append(old_disk_entry[2])
+        for filename in stale_filenames:
+            settings.remove_file_from_cache(filename)
+
+    def _trim(self):
+        """
+        Evict expired & least recently used entries. Must be called with lock acquired.
+        """
+        now = time.time()
+        for key, entry in list(self._entries.items()):
+            if entry[1] <= now:
+                del self._entries[key]
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def _trim_disk(self):
+        """
+        Forget expired entries in cache dir & entries that expire first if there are
+        more than *disk_size* of them. Must be called with lock acquired.
+
+        Returns names of files to remove.
+        """
+        now = time.time()
+        disk_entries = self._get_disk_entries()
+        evicted = [key for key, entry in disk_entries.items() if entry[1] <= now]
+        excess = len(disk_entries) - len(evicted) - self.disk_size
+        if excess > 0:
+            alive = sorted(
+                (entry[1], key) for key, entry in disk_entries.items() if entry[1] > now
+            )
+            evicted.extend(key for _, key in alive[:excess])
+        return [disk_entries.pop(key)[2] for key in evicted]
+
+    def _get_disk_entries(self):
+        """
+        Return index of entries in cache dir, build it from file names if needed.
+        Must be called with lock acquired.
+        """
+        if self._disk_entries is None:
+            self._disk_entries = {}
+            for filename in settings.get_cached_filenames(DISK_CACHE_PREFIX):
+                try:
+                    name, expires_at, key = filename[len(DISK_CACHE_PREFIX):].split('-')
+                    self._disk_entries[key] = (name, int(expires_at), filename)
+                except ValueError:
+                    # Left by older versions.
+                    settings.remove_file_from_cache(filename)
+        return self._disk_entries
+
+    @staticmethod
+    def _read_disk_response(filename):
+        """
+        Return response stored in cache dir, ``None`` if it is missing or broken.
+        """
+        path = settings.get_cached_file_path(filename)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as cache_file:
+                return json.loads(cache_file.read().decode('utf-8'))
+        except (EnvironmentError, ValueError) as error:
+            logger.error('Failed to read API cache entry %s: %s', filename, str(error))
+            return None
+
+    def invalidate(self, *names):
+        """
+        Drop cached responses of protocols with given *names*.
+        """
+        filenames = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry[0] in names:
+                    del self._entries[key]
+            if self.use_disk:
+                disk_entries = self._get_disk_entries()
+                for key, entry in list(disk_entries.items()):
+                    if entry[0] in names:
+                        filenames.append(disk_entries.pop(key)[2])
+        for filename in filenames:
+            settings.remove_file_from_cache(filename)
+
+    def clear(self):
+        """
+        Drop all cached responses.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._disk_entries = None
+        for filename in settings.get_cached_filenames(DISK_CACHE_PREFIX):
+            settings.remove_file_from_cache(filename)
+
+
+api_cache = _APICache()  # pylint: disable=invalid-name
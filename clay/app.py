@@ -100,6 +100,7 @@ class AppWidget(urwid.Frame):
         )
 
         self.set_page('library')
+        gp.load_snapshot()
         self.log_in()
 
     def log_in(self, use_token=True):
@@ -0,0 +1,170 @@
+"""
+Artist & album art fetching.
+"""
+# pylint: disable=broad-except
+try:  # Python 3.x
+    from urllib.parse import urlparse
+except ImportError:  # Python 2.x
+    from urlparse import urlparse
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+from collections import deque
+from hashlib import sha1
+from io import BytesIO
+from threading import Lock
+import re
+
+from clay.concurrency import keyed_lock
+from clay.httpclient import http_client
+from clay.log import logger
+from clay.pool import worker_pool, PRIORITY_BACKGROUND
+from clay.settings import settings
+
+ART_SIZE = 128
+# Maximum number of art images downloaded at the same time.
+MAX_DOWNLOADS = 2
+# Google image servers accept size options after "=" at the end of URL path.
+SIZED_HOSTS = ('googleusercontent.com', 'ggpht.com')
+_SIZE_OPTIONS_RE = re.compile(r'=[^/=]*$')
+
+
+def get_sized_url(url, size=ART_SIZE):
+    """
+    Return URL of art variant scaled to fit into *size* x *size* pixels
+    if image server supports it, *url* otherwise.
+    """
+    parts = urlparse(url)
+    if not parts.netloc.endswith(SIZED_HOSTS):
+        return url
+    path = _SIZE_OPTIONS_RE.sub('', parts.path) + '=s{}'.format(size)
+    return parts._replace(path=path).geturl()
+
+
+def get_filename(url):
+    """
+    Return cache filename for art by *url*.
+    """
+    return sha1(url.encode('utf-8')).hexdigest() + u'.jpg'
+
+
+class _ArtManager(object):
+    """
+    Downloads, scales & caches art images.
+
+    Images are requested from server in the size they are displayed in
+    and are decoded & scaled by the worker that downloads them
+    (in the same process, see :meth:`._scale`).
+    Background downloads are queued and only *max_downloads* of them
+    are submitted to :data:`clay.pool.worker_pool` at a time,
+    so art never occupies all workers.
+
+    Singleton.
+    """
+    def __init__(self, size=ART_SIZE, max_downloads=MAX_DOWNLOADS):
+        self.size = size
+        self.max_downloads = max_downloads
+        self._queue = deque()
+        self._callbacks = {}
+        self._active = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def get_cached_filename(url):
+        """
+        Return path to cached art by *url*, ``None`` if *url* is ``None``
+        or art is not downloaded yet. Never blocks on network.
+        """
+        if url is None:
+            return None
+        return settings.get_cached_file_path(get_filename(url))
+
+    def fetch(self, url):
+        """
+        Return path to cached art by *url*, downloading it if necessary.
+        Return ``None`` if *url* is ``None``.
+        """
+        if url is None:
+            return None
+        filename = get_filename(url)
+        with keyed_lock.hold(('art', filename)):
+            if not settings.get_is_file_cached(filename):
+                data = http_client.read(get_sized_url(url, self.size))
+                settings.save_file_to_cache(filename, self._scale(data))
+        return settings.get_cached_file_path(filename)
+
+    def _scale(self, data):
+        """
+        Scale image down to art size & return it as JPEG.
+        Return *data* as is if PIL is not available.
+
+        JPEG images are decoded in draft mode, i.e. already downscaled,
+        which is much faster than decoding & scaling full image.
+        """
+        if Image is None:
+            return data
+        image = Image.open(BytesIO(data))
+        image.draft('RGB', (self.size, self.size))
+        image.thumbnail((self.size, self.size))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        out = BytesIO()
+        image.save(out, format='JPEG')
+        return out.getvalue()
+
+    def fetch_async(self, url, callback=None):
+        """
+        Queue fetching of art by *url* in background.
+        *callback* is called with "(path, error)" args once art is fetched.
+
+        Requests for art that is already queued are merged.
+        """
+        with self._lock:
+            if url not in self._callbacks:
+                self._callbacks[url] = []
+                self._queue.append(url)
+            if callback is not None:
+                self._callbacks[url].append(callback)
+        self._submit_next()
+
+    def _submit_next(self):
+        """
+        Submit queued downloads to worker pool until limit is reached.
+        """
+        with self._lock:
+            urls = []
+            while self._queue and self._active < self.max_downloads:
+                urls.append(self._queue.popleft())
+                self._active += 1
+        for url in urls:
+            worker_pool.submit(self._process, (url,), priority=PRIORITY_BACKGROUND)
+
+    def _process(self, url):
+        """
+        Download art & call its callbacks.
+        """
+        path, error = None, None
+        try:
+            path = self.fetch(url)
+        except Exception as fetch_error:
+            logger.error('Failed to fetch art %s: %s', url, str(fetch_error))
+            error = fetch_error
+        with self._lock:
+            self._active -= 1
+            callbacks = self._callbacks.pop(url, [])
+        self._submit_next()
+        for callback in callbacks:
+            callback(path, error)
+
+    def prefetch(self, tracks):
+        """
+        Fetch missing artist & album art of *tracks* in background.
+        """
+        for track in tracks:
+            for url in (track.artist_art_url, track.album_url or None):
+                if url is not None and not settings.get_is_file_cached(get_filename(url)):
+                    self.fetch_async(url)
+
+
+art_manager = _ArtManager()  # pylint: disable=invalid-name
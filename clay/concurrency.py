@@ -0,0 +1,243 @@
+"""
+Concurrency helpers: asynchronous calls, keyed locks & call coalescing.
+"""
+# pylint: disable=broad-except
+from contextlib import contextmanager
+from functools import wraps
+from threading import Event, Lock, RLock
+
+from clay.log import logger
+from clay.pool import worker_pool, PRIORITY_INTERACTIVE
+
+
+def asynchronous(func, priority=PRIORITY_INTERACTIVE):
+    """
+    Decorates a function to become asynchronous.
+
+    Once called, queues original function in :data:`clay.pool.worker_pool`
+    with given *priority* and returns a task that can be cancelled.
+
+    Must be called with a 'callback' argument that will be called
+    once thread with original function finishes. Receives two args:
+    result and error.
+
+    - "result" contains function return value or None if there was an exception.
+    - "error" contains None or Exception if there was one.
+    """
+    def wrapper(*args, **kwargs):
+        """
+        Inner function.
+        """
+        callback = kwargs.pop('callback')
+        extra = kwargs.pop('extra', dict())
+
+        def process():
+            """
+            Thread body.
+            """
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                callback(None, error, **extra)
+            else:
+                callback(result, None, **extra)
+
+        def deliver(result, error):
+            """
+            Pass result of joined call to callback.
+            """
+            callback(result, error, **extra)
+
+        # Calls that join an in-flight coalesced call do not occupy a worker while waiting.
+        join_flight = getattr(func, 'join_flight', None)
+        if join_flight is not None:
+            task = join_flight(deliver, priority, *args, **kwargs)
+            if task is not None:
+                return task
+        return worker_pool.submit(process, priority=priority)
+
+    return wrapper
+
+
+class _KeyedLock(object):
+    """
+    Hands out reentrant locks by key.
+
+    Locks are created on demand and dropped once nobody holds or waits for them.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._locks = {}
+
+    @contextmanager
+    def hold(self, key):
+        """
+        Context manager that holds a lock for *key*.
+        """
+        with self._lock:
+            entry = self._locks.setdefault(key, [RLock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[key]
+
+
+keyed_lock = _KeyedLock()  # pylint: disable=invalid-name
+
+
+def synchronized(key):
+    """
+    Decorates a function to become thread-safe by preventing
+    it from being executed multiple times for the same key before previous calls end.
+
+    *key* is either a hashable value or a callable that receives same arguments
+    as decorated function and returns a hashable value.
+    Calls with different keys run concurrently, even across different functions.
+
+    Lock is acquired on entrance and is released on return or Exception.
+    """
+    def decorator(func):
+        """
+        Actual decorator.
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            """
+            Inner function.
+            """
+            lock_key = key(*args, **kwargs) if callable(key) else key
+            with keyed_lock.hold(lock_key):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class _Flight(object):
+    """
+    Represents a single call that is currently in progress.
+    """
+    def __init__(self):
+        self.event = Event()
+        self.result = None
+        self.error = None
+        # Tasks that deliver result to joined asynchronous callers, see :meth:`.SingleFlight.join`.
+        self.tasks = []
+
+    def wait(self):
+        """
+        Block until call finishes, return its result or raise its error.
+        """
+        self.event.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent identical calls.
+
+    While a call with some key is in progress, other callers with
+    the same key wait for it and share its result (or error)
+    instead of performing the same work again.
+    """
+    def __init__(self):
+        self._lock = Lock()
+        self._flights = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Call *func* with *args* & *kwargs* or join an in-flight call with the same *key*.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            is_leader = flight is None
+            if is_leader:
+                flight = self._flights[key] = _Flight()
+
+        if not is_leader:
+            logger.debug('Joining in-flight call %s', key)
+            return flight.wait()
+
+        try:
+            flight.result = func(*args, **kwargs)
+            return flight.result
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                tasks, flight.tasks = flight.tasks, None
+            flight.event.set()
+            for task in tasks:
+                worker_pool.enqueue(task)
+
+    def join(self, key, callback, priority):
+        """
+        Join in-flight call with *key* without waiting for it.
+        *callback* is called with "(result, error)" args from :data:`clay.pool.worker_pool`
+        with given *priority* once call finishes.
+
+        Returns a task that can be cancelled, ``None`` if there is no such call.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None or flight.tasks is None:
+                return None
+            logger.debug('Joining in-flight call %s', key)
+            task = worker_pool.create_task(
+                lambda: callback(flight.result, flight.error), priority=priority
+            )
+            flight.tasks.append(task)
+            return task
+
+    def forget(self):
+        """
+        Detach all in-flight calls: they will still finish,
+        but new callers will not join them.
+        """
+        with self._lock:
+            self._flights.clear()
+
+
+def coalesced(func):
+    """
+    Decorates a :class:`._GP` method so that concurrent calls with
+    identical arguments share a single execution and a single result.
+
+    Asynchronous versions of decorated methods (see :func:`.asynchronous`)
+    join identical in-flight calls without blocking a worker.
+    """
+    def get_key(*args, **kwargs):
+        """
+        Return flight key of call.
+        """
+        return (func.__name__, repr(args), repr(sorted(kwargs.items())))
+
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        """
+        Inner function.
+        """
+        flights = self._flights  # pylint: disable=protected-access
+        return flights.do(get_key(*args, **kwargs), func, self, *args, **kwargs)
+
+    def join_flight(callback, priority, self, *args, **kwargs):
+        """
+        Join identical in-flight call without waiting for it (see :meth:`.SingleFlight.join`).
+        """
+        flights = self._flights  # pylint: disable=protected-access
+        return flights.join(get_key(*args, **kwargs), callback, priority)
+
+    wrapper.join_flight = join_flight
+    return wrapper
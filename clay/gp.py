@@ -4,299 +4,36 @@ Google Play Music integration via gmusicapi.
 # pylint: disable=broad-except
 # pylint: disable=protected-access
 from __future__ import print_function
-try:  # Python 3.x
-    from urllib.request import urlopen
-except ImportError:  # Python 2.x
-    from urllib import urlopen
-try:
-    from PIL import Image
-except ImportError:
-    Image = None
-from io import BytesIO
-from hashlib import sha1
-from threading import Thread, Lock
-from uuid import UUID
-
-from gmusicapi.clients import Mobileclient
-
+from threading import Lock, Timer
+from weakref import WeakValueDictionary
+import struct
+import time
+
+from clay.apicache import api_cache
+from clay.concurrency import asynchronous, synchronized, coalesced, keyed_lock, \
+    SingleFlight
 from clay.eventhook import EventHook
+from clay.library import TrackColumns, TrackIndex, sort_tracks
+from clay.librarysync import apply_library_changes, get_synced_at, get_updated_after, \
+    merge_tracks
 from clay.log import logger
+from clay.metrics import api_metrics
+from clay.mutations import MutationQueue, KIND_RATE, KIND_ADD, KIND_REMOVE
+from clay.playlist import LikedSongs, Playlist
+from clay.pool import worker_pool, PRIORITY_PLAYBACK, PRIORITY_INTERACTIVE, \
+    PRIORITY_BACKGROUND
+from clay.replay import CallRecorder, create_client
+from clay.searchindex import SearchIndex
 from clay.settings import settings
+from clay.snapshot import Snapshot, dump_snapshot
+from clay.streamcache import StreamURLCache
+from clay.track import Track
 
 STATION_FETCH_LEN = 50
-
-
-def asynchronous(func):
-    """
-    Decorates a function to become asynchronous.
-
-    Once called, runs original function in a new Thread.
-
-    Must be called with a 'callback' argument that will be called
-    once thread with original function finishes. Receives two args:
-    result and error.
-
-    - "result" contains function return value or None if there was an exception.
-    - "error" contains None or Exception if there was one.
-    """
-    def wrapper(*args, **kwargs):
-        """
-        Inner function.
-        """
-        callback = kwargs.pop('callback')
-        extra = kwargs.pop('extra', dict())
-
-        def process():
-            """
-            Thread body.
-            """
-            try:
-                result = func(*args, **kwargs)
-            except Exception as error:
-                callback(None, error, **extra)
-            else:
-                callback(result, None, **extra)
-
-        Thread(target=process).start()
-
-    return wrapper
-
-
-def synchronized(func):
-    """
-    Decorates a function to become thread-safe by preventing
-    it from being executed multiple times before previous calls end.
-
-    Lock is acquired on entrance and is released on return or Exception.
-    """
-    lock = Lock()
-
-    def wrapper(*args, **kwargs):
-        """
-        Inner function.
-        """
-        try:
-            lock.acquire()
-            return func(*args, **kwargs)
-        finally:
-            lock.release()
-
-    return wrapper
-
-
-class Track(object):
-    """
-    Model that represents single track from Google Play Music.
-    """
-    TYPE_UPLOADED = 'uploaded'
-    TYPE_STORE = 'store'
-
-    SOURCE_LIBRARY = 'library'
-    SOURCE_STATION = 'station'
-    SOURCE_PLAYLIST = 'playlist'
-    SOURCE_SEARCH = 'search'
-
-    def __init__(self, source, data):
-        # In playlist items and user uploaded songs the storeIds are missing so
-        self.store_id = (data['storeId'] if 'storeId' in data else data.get('id'))
-        self.playlist_item_id = (UUID(data['id']) if source == self.SOURCE_PLAYLIST else None)
-        self.library_id = (UUID(data['id']) if source == self.SOURCE_LIBRARY else None)
-
-        # To filter out the playlist items we need to reassign the store_id when fetching the track
-        if 'track' in data:
-            data = data['track']
-            self.store_id = data['storeId']
-
-        artist_art_ref = next(iter(sorted(
-            [
-                ref
-                for ref
-                in data.get('artistArtRef', [])
-            ],
-            key=lambda x: x['aspectRatio']
-        )), None)
-        self.title = data['title']
-        self.artist = data['artist']
-        self.duration = int(data['durationMillis'])
-        self.rating = (int(data['rating']) if 'rating' in data else 0)
-        self.source = source
-        self.cached_url = None
-        self.artist_art_url = None
-        self.artist_art_filename = None
-        if artist_art_ref is not None:
-            self.artist_art_url = artist_art_ref['url']
-            self.artist_art_filename = sha1(
-                self.artist_art_url.encode('utf-8')
-            ).hexdigest() + u'.jpg'
-        self.explicit_rating = (int(data['explicitType']))
-
-        if self.rating == 5:
-            gp.cached_liked_songs.add_liked_song(self)
-
-        # User uploaded songs miss a store_id
-        self.album_name = data['album']
-        self.album_url = (data['albumArtRef'][0]['url'] if 'albumArtRef' in data else "")
-
-        self.original_data = data
-
-    @property
-    def id(self):  # pylint: disable=invalid-name
-        """
-        Return ID for this track.
-        """
-        if self.library_id:
-            return self.library_id
-        return self.store_id
-
-    @property
-    def filename(self):
-        """
-        Return a filename for this track.
-        """
-        return self.store_id + '.mp3'
-
-    def __eq__(self, other):
-        return (
-            (self.library_id and self.library_id == other.library_id) or
-            (self.store_id and self.store_id == other.store_id) or
-            (self.playlist_item_id and self.playlist_item_id == other.playlist_item_id)
-        )
-
-    @classmethod
-    def from_data(cls, data, source, many=False):
-        """
-        Construct and return one or many :class:`.Track` instances
-        from Google Play Music API response.
-        """
-        if many:
-            return [track for track in
-                    [cls.from_data(one, source) for one in data]
-                    if track is not None]
-        try:
-            if source == cls.SOURCE_PLAYLIST and 'track' not in data:
-                track = gp.get_track_by_id(UUID(data['trackId']))
-            else:
-                track = Track(source, data)
-
-            return track
-        except Exception as error:  # pylint: disable=bare-except
-            logger.error(
-                'Failed to parse track data: %s, failing data: %s',
-                repr(error),
-                data
-            )
-            # TODO: Fix this.
-            # print('Failed to create track from data.')
-            # print('Failing payload was:')
-            # print(data)
-            # raise Exception(
-            #     'Failed to create track from data. Original error: {}. Payload: {}'.format(
-            #         str(error),
-            #         data
-            #     )
-            # )
-            return None
-
-        raise AssertionError()
-
-    def get_url(self, callback):
-        """
-        Gets playable stream URL for this track.
-
-        "callback" is called with "(url, error)" args after URL is fetched.
-
-        Keep in mind this URL is valid for a limited time.
-        """
-        def on_get_url(url, error):
-            """
-            Called when URL is fetched.
-            """
-            self.cached_url = url
-            callback(url, error, self)
-
-        if gp.is_subscribed:
-            track_id = self.store_id
-        else:
-            track_id = self.library_id
-        gp.get_stream_url_async(track_id, callback=on_get_url)
-
-    @synchronized
-    def get_artist_art_filename(self):
-        """
-        Return artist art filename, None if this track doesn't have any.
-        Downloads if necessary.
-        """
-        if self.artist_art_url is None:
-            return None
-
-        if not settings.get_is_file_cached(self.artist_art_filename):
-            response = urlopen(self.artist_art_url)
-            data = response.read()
-            if Image:
-                image = Image.open(BytesIO(data))
-                image.thumbnail((128, 128))
-                out = BytesIO()
-                image.save(out, format='JPEG')
-                data = out.getvalue()
-            settings.save_file_to_cache(self.artist_art_filename, data)
-
-        return settings.get_cached_file_path(self.artist_art_filename)
-
-    # get_artist_arg_filename_async = asynchronous(get_artist_art_filename)
-
-    @synchronized
-    def create_station(self):
-        """
-        Creates a new station from this :class:`.Track`.
-
-        Returns :class:`.Station` instance.
-        """
-        station_name = u'Station - {}'.format(self.title)
-        station_id = gp.mobile_client.create_station(
-            name=station_name,
-            track_id=self.store_id
-        )
-        station = Station(station_id, station_name)
-        station.load_tracks()
-        return station
-
-    create_station_async = asynchronous(create_station)
-
-    def add_to_my_library(self):
-        """
-        Add a track to my library.
-        """
-        return gp.add_to_my_library(self)
-
-    add_to_my_library_async = asynchronous(add_to_my_library)
-
-    def remove_from_my_library(self):
-        """
-        Remove a track from my library.
-        """
-        return gp.remove_from_my_library(self)
-
-    remove_from_my_library_async = asynchronous(remove_from_my_library)
-
-    def rate_song(self, rating):
-        """
-        Rate the song either 0 (no thumb), 1 (down thumb) or 5 (up thumb).
-        """
-        gp.mobile_client.rate_songs(self.original_data, rating)
-        self.original_data['rating'] = rating
-        self.rating = rating
-
-        if rating == 5:
-            gp.cached_liked_songs.add_liked_song(self)
-
-    def __str__(self):
-        return u'<Track "{} - {}" from {}>'.format(
-            self.artist,
-            self.title,
-            self.source
-        )
-
-    __repr__ = __str__
+SNAPSHOT_FILENAME = 'library.snapshot'
+SNAPSHOT_SAVE_DELAY = 5
+SNAPSHOT_CHUNK_LEN = 1000
+STREAM_QUALITY = 'hi'
 
 
 class Artist(object):
@@ -358,6 +95,32 @@ class Station(object):
 
     load_tracks_async = asynchronous(load_tracks)
 
+    def load_more(self, recently_played_ids=()):
+        """
+        Fetch next batch of tracks for this station.
+
+        *recently_played_ids* is a list of store IDs of tracks that were played
+        or queued recently. Server is asked to avoid them, and tracks that
+        are returned anyway are skipped.
+
+        Return a list of new :class:`Track` instances.
+        """
+        recently_played_ids = list(recently_played_ids)
+        # Responses must be fresh, cached feed would yield tracks that were already queued.
+        with api_cache.bypassed():
+            data = gp.mobile_client.get_station_tracks(
+                self.id, STATION_FETCH_LEN, recently_played_ids=recently_played_ids
+            )
+        seen_ids = set(recently_played_ids)
+        tracks = []
+        for track in Track.from_data(data, Track.SOURCE_STATION, many=True):
+            if track.store_id not in seen_ids:
+                seen_ids.add(track.store_id)
+                tracks.append(track)
+        return tracks
+
+    load_more_async = asynchronous(load_more, PRIORITY_BACKGROUND)
+
     def get_tracks(self):
         """
         Return a list of tracks in this station.
@@ -379,6 +142,12 @@ class Station(object):
             name=data['name']
         )
 
+    def to_data(self):
+        """
+        Return a compact API-like representation of this station.
+        """
+        return dict(id=self.id, name=self.name, inLibrary=True)
+
 
 class SearchResults(object):
     """
@@ -415,78 +184,6 @@ class SearchResults(object):
         return self.tracks
 
 
-class Playlist(object):
-    """
-    Model that represents remotely stored (Google Play Music) playlist.
-    """
-    def __init__(self, playlist_id, name, tracks):
-        self._id = playlist_id
-        self.name = name
-        self.tracks = tracks
-
-    @property
-    def id(self):  # pylint: disable=invalid-name
-        """
-        Playlist ID.
-        """
-        return self._id
-
-    @classmethod
-    def from_data(cls, data, many=False):
-        """
-        Construct and return one or many :class:`.Playlist` instances
-        from Google Play Music API response.
-        """
-        if many:
-            return [cls.from_data(one) for one in data]
-
-        return Playlist(
-            playlist_id=data['id'],
-            name=data['name'],
-            tracks=Track.from_data(data['tracks'], Track.SOURCE_PLAYLIST, many=True)
-        )
-
-
-class LikedSongs(object):
-    """
-    A local model that represents the songs that a user liked and displays them as a faux playlist.
-
-    This mirrors the "liked songs" generated playlist feature of the Google Play Music apps.
-    """
-    def __init__(self):
-        self._id = None  # pylint: disable=invalid-name
-        self.name = "Liked Songs"
-        self._tracks = []
-        self._sorted = False
-
-    @property
-    def tracks(self):
-        """
-        Get a sorted list of liked tracks.
-        """
-        if self._sorted:
-            tracks = self._tracks
-        else:
-            self._tracks.sort(key=lambda k: k.original_data.get('lastRatingChangeTimestamp', '0'),
-                              reverse=True)
-            self._sorted = True
-            tracks = self._tracks
-
-        return tracks
-
-    def add_liked_song(self, song):
-        """
-        Add a liked song to the list.
-        """
-        self._tracks.insert(0, song)
-
-    def remove_liked_song(self, song):
-        """
-        Remove a liked song from the list
-        """
-        self._tracks.remove(song)
-
-
 class _GP(object):
     """
     Interface to :class:`gmusicapi.Mobileclient`. Implements
@@ -498,73 +195,296 @@ class _GP(object):
     caches_invalidated = EventHook()
 
     def __init__(self):
-        # self.is_debug = os.getenv('CLAY_DEBUG')
-        self.mobile_client = Mobileclient()
+        self.mobile_client = create_client()
         self.mobile_client._make_call = self._make_call_proxy(
             self.mobile_client._make_call
         )
-        # if self.is_debug:
-        #     self.debug_file = open('/tmp/clay-api-log.json', 'w')
-        #     self._last_call_index = 0
-        self.cached_tracks = None
+        self.mobile_client.session.send = api_metrics.wrap_send(
+            self.mobile_client.session.send
+        )
+        self._cached_tracks = None
+        self._local_additions = {}
+        self._local_removals = {}
+        self._track_index = TrackIndex()
+        self._library_columns = TrackColumns()
+        self._search_index = SearchIndex()
         self.cached_liked_songs = LikedSongs()
+        # Identity map: store ID -> the only Track instance of this song.
+        self._shared_tracks = WeakValueDictionary()
+        self._shared_tracks_lock = Lock()
         self.cached_playlists = None
         self.cached_stations = None
+        self._flights = SingleFlight()
+        self._stream_urls = StreamURLCache()
+        self._mutations = MutationQueue({
+            KIND_RATE: self._send_ratings,
+            KIND_ADD: self._send_library_additions,
+            KIND_REMOVE: self._send_library_removals
+        })
+
+        self._library_synced_at = None
+
+        self._snapshot = None
+        self._use_snapshot = False
+        self._snapshot_lock = Lock()
+        self._snapshot_timer = None
 
         self.invalidate_caches()
 
         self.auth_state_changed = EventHook()
+        self.snapshot_loaded = EventHook()
+        self.library_updated = EventHook()
+        self.library_chunk_loaded = EventHook()
+        self.track_added = EventHook()
+        self.track_removed = EventHook()
+        self.playlists_updated = EventHook()
+        self.stations_updated = EventHook()
 
     def _make_call_proxy(self, func):
         """
-        Return a function that wraps *fn* and logs args & return values.
+        Return a function that wraps *fn*, logs args, records call metrics
+        & responses (see :mod:`clay.replay`) and serves cached responses
+        of read-only protocols.
         """
+        recorder = CallRecorder.from_env()
+        if recorder is not None:
+            func = recorder.wrap_call(func)
+        func = api_metrics.wrap_call(func)
+
         def _make_call(protocol, *args, **kwargs):
             """
             Wrapper function.
             """
-            logger.debug('GP::{}(*{}, **{})'.format(
-                protocol.__name__,
-                args,
-                kwargs
-            ))
-            result = func(protocol, *args, **kwargs)
-            # self._last_call_index += 1
-            # call_index = self._last_call_index
-            # self.debug_file.write(json.dumps([
-            #     call_index,
-            #     protocol.__name__, args, kwargs,
-            #     result
-            # ]) + '\n')
-            # self.debug_file.flush()
-            return result
+            # Arguments are formatted by logger once the message is read.
+            logger.debug('GP::%s(*%s, **%s)', protocol.__name__, args, kwargs)
+            return api_cache.call(func, protocol, *args, **kwargs)
         return _make_call
 
     def invalidate_caches(self):
         """
         Clear cached tracks & playlists & stations.
+
+        Library will be fully refetched next time it is requested.
+        Shared track instances are forgotten, so fresh library tracks replace them.
         """
         self.cached_tracks = None
+        self._search_index = SearchIndex()
+        # Store ID -> track added to or removed from library locally, but not by server yet.
+        self._local_additions = {}
+        self._local_removals = {}
+        with self._shared_tracks_lock:
+            self._shared_tracks.clear()
+        self.cached_liked_songs = LikedSongs()
         self.cached_playlists = None
         self.cached_stations = None
+        self._use_snapshot = False
+        self._flights.forget()
+        self._stream_urls.clear()
         self.caches_invalidated.fire()
 
-    @synchronized
+    def load_snapshot(self):
+        """
+        Open library snapshot saved during previous run (if any).
+
+        Until :meth:`.revalidate_caches` is called, caches are populated
+        from this snapshot instead of the server, so data can be displayed
+        before authentication completes.
+
+        Fires :attr:`.snapshot_loaded` and returns ``True`` on success.
+        """
+        path = settings.get_cached_file_path(SNAPSHOT_FILENAME)
+        if path is None:
+            return False
+        try:
+            self._snapshot = Snapshot(path)
+        except (EnvironmentError, ValueError, struct.error) as error:
+            logger.error('Failed to load library snapshot: %s', str(error))
+            return False
+        self._use_snapshot = True
+        self._library_synced_at = self._snapshot.get_meta().get('library_synced_at')
+        logger.info('Loaded library snapshot from %s', path)
+        self.snapshot_loaded.fire()
+        return True
+
+    def _get_snapshot_section(self, name):
+        """
+        Return snapshot section by name if caches should be populated from snapshot.
+        """
+        if not self._use_snapshot:
+            return None
+        return self._snapshot.get_section(name)
+
+    def _schedule_snapshot_save(self):
+        """
+        Save snapshot in background after a short delay.
+        Multiple requests made within this delay result in a single save.
+        """
+        with self._snapshot_lock:
+            if self._snapshot_timer is not None:
+                return
+            self._snapshot_timer = Timer(SNAPSHOT_SAVE_DELAY, self.save_snapshot)
+            self._snapshot_timer.daemon = True
+            self._snapshot_timer.start()
+
+    def save_snapshot(self):
+        """
+        Save cached library, playlists & stations into a snapshot file in cache dir.
+
+        Sections that are not cached at the moment are carried over
+        from the previous snapshot.
+        """
+        with self._snapshot_lock:
+            self._snapshot_timer = None
+
+        sections = {}
+        # Caches are modified by workers, so they are serialized under their locks.
+        with keyed_lock.hold('tracks'):
+            sections['meta'] = [dict(
+                saved_at=int(time.time()),
+                library_synced_at=self._library_synced_at
+            )]
+            if self.cached_tracks is not None:
+                # Tracks that are not added by server yet have no library IDs.
+                sections['tracks'] = [
+                    track.to_data() for track in self.cached_tracks if track.ids[0] is not None
+                ]
+                sections['search_index'] = self._search_index.to_records()
+        for name in ('playlists', 'stations'):
+            with keyed_lock.hold(name):
+                cache = getattr(self, 'cached_' + name)
+                if cache is not None:
+                    sections[name] = [item.to_data() for item in cache]
+        if self._snapshot is not None:
+            for name in ('tracks', 'search_index', 'playlists', 'stations'):
+                if name not in sections and self._snapshot.get_section(name) is not None:
+                    sections[name] = self._snapshot.get_section(name)
+
+        path = settings.save_file_to_cache(SNAPSHOT_FILENAME, dump_snapshot(sections))
+        self._snapshot = Snapshot(path)
+        logger.debug('Saved library snapshot to %s', path)
+
+    def _revalidate_in_background(self):
+        """
+        Start cache revalidation if caches are populated from snapshot.
+        """
+        if self._use_snapshot:
+            worker_pool.submit(self.revalidate_caches, priority=PRIORITY_BACKGROUND)
+
+    def revalidate_caches(self):
+        """
+        Fetch fresh library, playlists & stations from server and apply them
+        on top of caches that were populated from snapshot.
+
+        Fires :attr:`.library_updated` with lists of added & removed tracks,
+        :attr:`.playlists_updated` & :attr:`.stations_updated` if anything has changed.
+        """
+        self.sync_library()
+
+        playlists = Playlist.from_data(self.mobile_client.get_all_user_playlist_contents(), True)
+        self._add_liked_entries(playlists)
+        if self._replace_cache('playlists', playlists):
+            self.playlists_updated.fire()
+
+        with api_cache.bypassed():
+            stations = Station.from_data(self.mobile_client.get_all_stations(), True)
+        if self._replace_cache('stations', stations):
+            self.stations_updated.fire()
+
+        self._use_snapshot = False
+        self._schedule_snapshot_save()
+
+    def sync_library(self):
+        """
+        Fetch library entries that were changed or deleted since last sync
+        and merge them into cached tracks.
+
+        Falls back to fetching the whole library only if it was never synced.
+        Full refetch can be explicitly requested with :meth:`.invalidate_caches`.
+
+        Fires :attr:`.library_updated` with lists of added & removed tracks
+        if anything has changed. Returns the same lists.
+        """
+        self.get_all_tracks()
+        with keyed_lock.hold('tracks'):
+            if self._library_synced_at is None:
+                data = self.mobile_client.get_all_songs()
+                fresh_tracks = Track.from_data(
+                    data, Track.SOURCE_LIBRARY, True, self._library_columns, interned=False
+                )
+                self.cached_tracks, added, removed = merge_tracks(
+                    self.cached_tracks, fresh_tracks, self.intern_track
+                )
+                # Drop rows of the previous copy of library.
+                self._library_columns = self._library_columns.compact(self.cached_tracks)
+            else:
+                data = self.mobile_client.get_all_songs(
+                    include_deleted=True,
+                    updated_after=get_updated_after(self._library_synced_at)
+                )
+                self._cached_tracks, added, removed = apply_library_changes(
+                    self._cached_tracks, self._track_index, data, self._library_columns
+                )
+            self._library_synced_at = get_synced_at(data, self._library_synced_at)
+            added_tracks = set(id(track) for track in added)
+            for track in removed:
+                self._search_index.remove_track(track)
+                self.cached_liked_songs.remove_liked_song(track)
+                if id(track) not in added_tracks:
+                    track.detach()
+            for track in added:
+                self._search_index.add_track(track)
+                if track.rating == 5:
+                    self.cached_liked_songs.add_liked_song(track)
+
+        if added or removed:
+            self._invalidate_playlist_entries()
+            logger.info('Library synced: %d added, %d removed', len(added), len(removed))
+            self.library_updated.fire(added, removed)
+            self._schedule_snapshot_save()
+        return added, removed
+
+    def _invalidate_playlist_entries(self):
+        """
+        Make cached playlists resolve their entries that refer to library tracks again.
+        """
+        self._track_index.clear_entries()
+        for playlist in self.cached_playlists or ():
+            playlist.invalidate_entries()
+
+    def _replace_cache(self, name, items):
+        """
+        Replace cached playlists or stations with fresh *items*.
+        Return ``True`` if they differ from cached ones.
+        """
+        attr = 'cached_' + name
+        with keyed_lock.hold(name):
+            cached = getattr(self, attr)
+            is_changed = cached is None or \
+                [item.to_data() for item in cached] != [item.to_data() for item in items]
+            setattr(self, attr, items)
+        return is_changed
+
+    @synchronized('auth')
     def login(self, email, password, device_id, **_):
         """
         Log in into Google Play Music.
         """
         self.mobile_client.logout()
         self.invalidate_caches()
+        api_cache.clear()
         # prev_auth_state = self.is_authenticated
         result = self.mobile_client.login(email, password, device_id)
+        if self.is_authenticated:
+            api_cache.set_account(self.get_authtoken())
+            self.start_fetch_pipeline()
+            self._mutations.start()
         # if prev_auth_state != self.is_authenticated:
         self.auth_state_changed.fire(self.is_authenticated)
         return result
 
     login_async = asynchronous(login)
 
-    @synchronized
+    @synchronized('auth')
     def use_authtoken(self, authtoken, device_id):
         """
         Try to use cached token to log into Google Play Music.
@@ -575,9 +495,15 @@ class _GP(object):
         self.mobile_client.android_id = device_id
         del self.mobile_client.is_subscribed
         if self.mobile_client.is_subscribed:
+            # Responses cached on disk during previous runs are reused for the same account only.
+            api_cache.set_account(authtoken)
+            self.start_fetch_pipeline()
+            self._mutations.start()
             self.auth_state_changed.fire(True)
+            self._revalidate_in_background()
             return True
         del self.mobile_client.is_subscribed
+        api_cache.set_account(None)
         self.mobile_client.android_id = None
         self.mobile_client.session.is_authenticated = False
         self.auth_state_changed.fire(False)
@@ -585,6 +511,20 @@ class _GP(object):
 
     use_authtoken_async = asynchronous(use_authtoken)
 
+    def start_fetch_pipeline(self):
+        """
+        Start fetching library, playlists & stations concurrently.
+
+        Pages that request the same data while it is being fetched
+        join these requests instead of issuing new ones.
+        """
+        for func in (
+                self.get_all_tracks,
+                self.get_all_user_playlist_contents,
+                self.get_all_user_station_contents
+        ):
+            worker_pool.submit(func, priority=PRIORITY_INTERACTIVE)
+
     def get_authtoken(self):
         """
         Return currently active auth token.
@@ -592,85 +532,252 @@ class _GP(object):
         # pylint: disable=protected-access
         return self.mobile_client.session._authtoken
 
-    @synchronized
+    @coalesced
+    @synchronized('tracks')
     def get_all_tracks(self):
         """
         Cache and return all tracks from "My library".
 
         Each track will have "id" and "storeId" keys.
+
+        :attr:`.library_chunk_loaded` is fired with a list of tracks & total number
+        of tracks loaded so far for each page fetched from server (or chunk of snapshot).
         """
         if self.cached_tracks:
             return self.cached_tracks
-        data = self.mobile_client.get_all_songs()
-        self.cached_tracks = Track.from_data(data, Track.SOURCE_LIBRARY, True)
+        self._library_columns = TrackColumns()
+        snapshot_tracks = self._get_snapshot_section('tracks')
+        if snapshot_tracks is not None:
+            # Snapshot is decoded chunk by chunk, so first tracks are shown right away.
+            pages = snapshot_tracks.iter_chunks(SNAPSHOT_CHUNK_LEN)
+        else:
+            self._library_synced_at = None
+            pages = self.mobile_client.get_all_songs(incremental=True)
+        tracks = []
+        for page in pages:
+            chunk = Track.from_data(
+                page, Track.SOURCE_LIBRARY, True, self._library_columns
+            )
+            tracks.extend(chunk)
+            if snapshot_tracks is None:
+                self._library_synced_at = get_synced_at(page, self._library_synced_at)
+            self.library_chunk_loaded.fire(chunk, len(tracks))
+        self.cached_tracks = tracks
+
+        snapshot_index = self._get_snapshot_section('search_index')
+        if snapshot_tracks is not None and snapshot_index is not None:
+            self._search_index = SearchIndex.from_records(snapshot_index)
+        else:
+            self._search_index = SearchIndex.from_tracks(self.cached_tracks)
+        if snapshot_tracks is None:
+            self._schedule_snapshot_save()
 
         return self.cached_tracks
 
-    get_all_tracks_async = asynchronous(get_all_tracks)
+    get_all_tracks_async = asynchronous(get_all_tracks, PRIORITY_BACKGROUND)
+
+    def get_cached_stream_url(self, stream_id, quality=STREAM_QUALITY):
+        """
+        Return cached stream URL of track by id, ``None`` if it is missing or expires soon.
 
-    def get_stream_url(self, stream_id):
+        URLs that are close to expiry are refreshed in background.
+        """
+        url, is_due = self._stream_urls.get(stream_id, quality)
+        if is_due:
+            worker_pool.submit(
+                self.fetch_stream_url, (stream_id, quality), priority=PRIORITY_BACKGROUND
+            )
+        return url
+
+    @coalesced
+    def fetch_stream_url(self, stream_id, quality=STREAM_QUALITY):
+        """
+        Request playable stream URL of track by id from server and cache it.
+        """
+        url = self.mobile_client.get_stream_url(stream_id, quality=quality)
+        self._stream_urls.put(stream_id, quality, url)
+        return url
+
+    def get_stream_url(self, stream_id, quality=STREAM_QUALITY):
         """
         Returns playable stream URL of track by id.
+
+        Cached URL is returned if it does not expire soon.
         """
-        return self.mobile_client.get_stream_url(stream_id)
+        url = self.get_cached_stream_url(stream_id, quality)
+        if url is not None:
+            return url
+        return self.fetch_stream_url(stream_id, quality)
 
-    get_stream_url_async = asynchronous(get_stream_url)
+    get_stream_url_async = asynchronous(get_stream_url, PRIORITY_PLAYBACK)
 
-    @synchronized
+    @coalesced
+    @synchronized('stations')
     def get_all_user_station_contents(self, **_):
         """
               Return list of :class:`.Station` instances.
               """
         if self.cached_stations:
             return self.cached_stations
-        self.get_all_tracks()
+
+        snapshot_stations = self._get_snapshot_section('stations')
+        if snapshot_stations is not None:
+            self.cached_stations = Station.from_data(snapshot_stations, True)
+            return self.cached_stations
 
         self.cached_stations = Station.from_data(
             self.mobile_client.get_all_stations(),
             True
         )
+        self._schedule_snapshot_save()
         return self.cached_stations
 
     get_all_user_station_contents_async = (  # pylint: disable=invalid-name
-        asynchronous(get_all_user_station_contents)
+        asynchronous(get_all_user_station_contents, PRIORITY_BACKGROUND)
     )
 
-    @synchronized
+    @coalesced
+    @synchronized('playlists')
     def get_all_user_playlist_contents(self, **_):
         """
         Return list of :class:`.Playlist` instances.
+
+        Playlist tracks are not created until they are requested,
+        see :meth:`.Playlist.load_tracks`.
         """
         if self.cached_playlists:
             return [self.cached_liked_songs] + self.cached_playlists
 
-        self.get_all_tracks()
-
-        self.cached_playlists = Playlist.from_data(
-            self.mobile_client.get_all_user_playlist_contents(),
-            True
-        )
+        data = self._get_snapshot_section('playlists')
+        is_from_snapshot = data is not None
+        if not is_from_snapshot:
+            data = self.mobile_client.get_all_user_playlist_contents()
+
+        # Tracks of playlists are created on demand (see "Playlist.tracks"),
+        # so playlists do not wait for library to load.
+        self.cached_playlists = Playlist.from_data(data, True)
+        self._add_liked_entries(self.cached_playlists)
+        if not is_from_snapshot:
+            self._schedule_snapshot_save()
         return [self.cached_liked_songs] + self.cached_playlists
 
+    def _add_liked_entries(self, playlists):
+        """
+        Add liked entries of *playlists* into liked songs,
+        so that they show up there before their playlists are opened.
+        """
+        for playlist in playlists:
+            self.cached_liked_songs.add_entries(playlist.liked_entries_data)
+
     get_all_user_playlist_contents_async = (  # pylint: disable=invalid-name
-        asynchronous(get_all_user_playlist_contents)
+        asynchronous(get_all_user_playlist_contents, PRIORITY_BACKGROUND)
     )
 
+    @property
+    def cached_tracks(self):
+        """
+        List of cached library tracks, ``None`` if library is not loaded.
+
+        Assigning a new list rebuilds track indexes
+        and makes playlists resolve their entries again.
+        """
+        return self._cached_tracks
+
+    @cached_tracks.setter
+    def cached_tracks(self, tracks):
+        self._track_index = TrackIndex(tracks or ())
+        self._cached_tracks = tracks
+        self._invalidate_playlist_entries()
+
     def get_cached_tracks_map(self):
         """
-        Return a dictionary of tracks where keys are strings with track IDs
+        Return a dictionary of tracks where keys are strings with library IDs
         and values are :class:`.Track` instances.
+
+        The dictionary is a live index and must not be modified.
         """
-        return {track.id: track for track in self.cached_tracks}
+        return self._track_index.by_library_id
 
-    def get_track_by_id(self, any_id):
+    def get_library_stats(self):
         """
-        Return track by id or store_id.
+        Return a dict with number of tracks, total duration (in milliseconds)
+        and number of liked & disliked tracks in library.
         """
-        for track in self.cached_tracks:
-            if any_id in (track.library_id, track.store_id, track.playlist_item_id):
+        columns = self._library_columns
+        return dict(
+            tracks=columns.count_alive(),
+            duration=columns.total('duration'),
+            liked=columns.count('rating', 5),
+            disliked=columns.count('rating', 1)
+        )
+
+    def intern_track(self, track):
+        """
+        Return the shared :class:`.Track` instance of the song *track* represents
+        (songs are identified by store ID), registering *track* if there is none.
+
+        Library data takes precedence: if shared instance is not in library
+        or is a stale copy of the same library entry, it is rebound to the row
+        of library *track* (see :meth:`.Track.rebind`).
+        Other library entries of the same song are returned as is.
+        """
+        if track.store_id is None:
+            return track
+        with self._shared_tracks_lock:
+            shared = self._shared_tracks.get(track.store_id)
+            if shared is None:
+                self._shared_tracks[track.store_id] = track
+                shared = track
+            elif shared is track or not track.is_in_library:
+                return shared
+            elif shared.is_in_library and shared.library_id != track.library_id:
                 return track
-        return None
+            else:
+                self._rebind_shared_track(shared, track)
+        if shared.rating == 5:
+            self.cached_liked_songs.add_liked_song(shared)
+        return shared
 
+    def _rebind_shared_track(self, shared, track):
+        """
+        Rebind *shared* track to the row of library *track*, dropping its stale library row.
+        Must be called with shared tracks lock acquired.
+        """
+        if shared.is_in_library:
+            shared.detach()
+        shared.rebind(track)
+        if shared.rating != 5:
+            self.cached_liked_songs.remove_liked_song(shared)
+
+    def get_track_by_id(self, any_id):
+        """
+        Return cached library track by id or store_id,
+        or track of a resolved playlist entry by entry id.
+        """
+        return self._track_index.get(any_id)
+
+    def index_playlist_entries(self, entries):
+        """
+        Make tracks of playlist *entries* available by entry IDs.
+        """
+        self._track_index.add_entries(entries)
+
+    def search_library(self, query):
+        """
+        Find cached library tracks that match all words of *query* (as prefixes).
+        Works offline.
+
+        Return a list of :class:`.Track` instances sorted by title.
+        """
+        tracks_by_id = self._track_index.by_library_id
+        return sort_tracks([
+            tracks_by_id[key]
+            for key
+            in self._search_index.search(query)
+            if key in tracks_by_id
+        ], 'title')
+
+    @coalesced
     def search(self, query):
         """
         Find tracks and return an instance of :class:`.SearchResults`.
@@ -680,23 +787,199 @@ class _GP(object):
 
     search_async = asynchronous(search)
 
-    def add_to_my_library(self, track):
+    def rate_track(self, track, rating, callback=None):
         """
-        Add a track to my library.
+        Queue rating change of a track. Ratings are sent in background,
+        pending ratings are sent together.
+
+        *callback* is called with "(result, error)" args once rating is sent.
         """
-        result = self.mobile_client.add_store_tracks(track.id)
-        if result:
-            self.invalidate_caches()
-        return result
+        self._mutations.put(KIND_RATE, track.store_id, track.get_rating_data(rating), callback)
+
+    def add_to_my_library(self, track, callback=None):
+        """
+        Add a track to my library. Track is added to cached tracks right away
+        and sent to server in background. Pending removal of this track is cancelled instead.
 
-    def remove_from_my_library(self, track):
+        *callback* is called with "(result, error)" args once track is added.
         """
-        Remove a track from my library.
+        self._put_library_mutation(KIND_ADD, track, track.to_data(), callback)
+
+    def remove_from_my_library(self, track, callback=None):
         """
-        result = self.mobile_client.delete_songs(track.id)
-        if result:
-            self.invalidate_caches()
-        return result
+        Remove a track from my library. Track is removed from cached tracks right away
+        and sent to server in background. Pending addition of this track is cancelled instead.
+
+        *callback* is called with "(result, error)" args once track is removed.
+        """
+        # Library ID is unknown while addition of this track is being sent,
+        # it is filled in by _send_library_additions() then.
+        self._put_library_mutation(KIND_REMOVE, track, track.ids[0], callback)
+
+    def _put_library_mutation(self, kind, track, value, callback):
+        """
+        Apply addition or removal (*kind*) of *track* locally & queue it,
+        or cancel pending opposite mutation of the same track.
+        Local change is reverted if server rejects it.
+        """
+        reverts = {KIND_ADD: self._revert_track_addition, KIND_REMOVE: self._restore_removed_track}
+        opposite = KIND_REMOVE if kind == KIND_ADD else KIND_ADD
+        with keyed_lock.hold('tracks'):
+            is_cancelled = self._mutations.discard(opposite, track.store_id)
+            if is_cancelled:
+                reverts[opposite](track.store_id)
+            elif kind == KIND_ADD:
+                self._add_track_locally(track)
+            else:
+                self._revert_track_addition(track.store_id)
+                self._remove_track_locally(track)
+        if is_cancelled:
+            if callback is not None:
+                callback(True, None)
+            return
+
+        def on_sent(result, error):
+            """
+            Revert local change if server rejected it.
+            """
+            if error:
+                with keyed_lock.hold('tracks'):
+                    reverts[kind](track.store_id)
+            if callback is not None:
+                callback(result, error)
+
+        self._mutations.put(kind, track.store_id, value, on_sent)
+
+    def _add_track_locally(self, track):
+        """
+        Show *track* in cached library until its addition is sent.
+        Must be called with tracks lock acquired.
+        """
+        if self._cached_tracks is None or self._track_index.get(track.store_id) is not None:
+            return
+        self._local_additions[track.store_id] = track
+        self._cached_tracks.append(track)
+        self._track_index.add(track)
+        self.track_added.fire(track)
+
+    def _revert_track_addition(self, store_id):
+        """
+        Drop track that was added locally, but not by server.
+        Must be called with tracks lock acquired.
+        """
+        track = self._local_additions.pop(store_id, None)
+        if track is None or self._cached_tracks is None:
+            return
+        self._cached_tracks[:] = [item for item in self._cached_tracks if item is not track]
+        self._track_index.remove(track)
+        self.track_removed.fire(track)
+
+    def _remove_track_locally(self, track):
+        """
+        Hide library *track* from cached library until its removal is sent.
+        Track keeps its library ID, so that the removal can be reverted.
+        Must be called with tracks lock acquired.
+        """
+        if self._cached_tracks is None or not track.is_in_library:
+            return
+        self._local_removals[track.store_id] = track
+        self._cached_tracks[:] = [item for item in self._cached_tracks if item is not track]
+        self._track_index.remove(track)
+        self._search_index.remove_track(track)
+        self.cached_liked_songs.remove_liked_song(track)
+        self.track_removed.fire(track)
+
+    def _restore_removed_track(self, store_id):
+        """
+        Show track that was removed locally, but not by server, in cached library again.
+        Must be called with tracks lock acquired.
+        """
+        track = self._local_removals.pop(store_id, None)
+        if track is None or self._cached_tracks is None:
+            return
+        self._cached_tracks.append(track)
+        self._track_index.add(track)
+        self._search_index.add_track(track)
+        if track.rating == 5:
+            self.cached_liked_songs.add_liked_song(track)
+        self.track_added.fire(track)
+
+    def _send_ratings(self, tracks_data):
+        """
+        Send ratings of tracks, one API call per distinct rating.
+        """
+        by_rating = {}
+        for data in tracks_data:
+            by_rating.setdefault(data['rating'], []).append(data)
+        for rating, batch in sorted(by_rating.items()):
+            self.mobile_client.rate_songs(batch, rating)
+
+    def _send_library_additions(self, tracks_data):
+        """
+        Add store tracks to my library & bind their cached tracks to library rows.
+        Tracks that were not added locally (e.g. before restart) are added to cached tracks.
+        """
+        library_ids = self.mobile_client.add_store_tracks([
+            data['storeId'] for data in tracks_data
+        ])
+        with keyed_lock.hold('tracks'):
+            for data, library_id in zip(tracks_data, library_ids):
+                store_id = data['storeId']
+                if self._mutations.has_pending(KIND_REMOVE, store_id) and \
+                   self._mutations.get_pending(KIND_REMOVE, store_id) is None:
+                    # Track was removed while it was being added.
+                    self._mutations.put(KIND_REMOVE, store_id, library_id)
+                    continue
+                if self._cached_tracks is None or library_id in self._track_index.by_library_id:
+                    self._local_additions.pop(store_id, None)
+                    continue
+                track = Track.from_data(
+                    dict(data, id=library_id), Track.SOURCE_LIBRARY,
+                    columns=self._library_columns
+                )
+                if self._local_additions.get(store_id) is track:
+                    # Track that was added locally is now bound to its library row.
+                    del self._local_additions[store_id]
+                else:
+                    self._revert_track_addition(store_id)
+                    self._cached_tracks.append(track)
+                    self.track_added.fire(track)
+                self._track_index.add(track)
+                self._search_index.add_track(track)
+        self._invalidate_playlist_entries()
+        self._schedule_snapshot_save()
+
+    def _send_library_removals(self, library_ids):
+        """
+        Remove tracks from my library & detach their cached tracks.
+        Tracks that were not removed locally (e.g. before restart) are removed from cached tracks.
+        """
+        # Removals queued while additions were being sent have no library IDs yet,
+        # they are sent again once library IDs are known.
+        deleted_ids = self.mobile_client.delete_songs([
+            library_id for library_id in library_ids if library_id is not None
+        ])
+        with keyed_lock.hold('tracks'):
+            local_removals = dict(
+                (track.ids[0], track) for track in self._local_removals.values()
+            )
+            for library_id in deleted_ids:
+                track = self._track_index.by_library_id.get(library_id)
+                if track is not None:
+                    self._remove_track_locally(track)
+                track = track or local_removals.get(library_id)
+                if track is not None:
+                    self._local_removals.pop(track.store_id, None)
+                    track.detach()
+        self._invalidate_playlist_entries()
+        self._schedule_snapshot_save()
+
+    @property
+    def is_using_snapshot(self):
+        """
+        Return True if caches are populated from snapshot and were not revalidated yet.
+        """
+        return self._use_snapshot
 
     @property
     def is_authenticated(self):
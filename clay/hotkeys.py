@@ -115,7 +115,8 @@ class _HotkeyManager(object):
         for hotkey_name, hotkey_dict in hotkey_config.items():
             hotkeys[hotkey_name] = {}
             for action in hotkey_dict.keys():
-                key_seq = settings.get(action, 'hotkeys', 'clay_hotkeys', hotkey_name)
+                key_seq = settings.get(action, 'hotkeys', 'clay_hotkeys', hotkey_name) or \
+                    hotkey_dict[action]
 
                 for key in key_seq.split(', '):
                     hotkey = key.split(' + ')
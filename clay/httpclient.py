@@ -0,0 +1,175 @@
+"""
+Shared HTTP client for media & art downloads.
+"""
+from threading import Lock
+
+from requests import HTTPError, Session
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from clay import meta
+from clay.log import logger
+from clay.settings import settings
+
+# Number of hosts to keep connection pools for.
+MAX_HOSTS = 20
+
+
+class _ConnectionCounter(object):
+    """
+    Thread-safe counter of opened connections.
+    """
+    def __init__(self):
+        self.value = 0
+        self._lock = Lock()
+
+    def increment(self):
+        """
+        Increment counter by one.
+        """
+        with self._lock:
+            self.value += 1
+
+
+def _create_counting_pool_class(pool_class, connection_class, counter):
+    """
+    Return a subclass of urllib3 *pool_class* that increments *counter*
+    each time one of its connections connects to host (including reconnects).
+    """
+    class _CountingConnection(connection_class):
+        """
+        Connection that counts connects.
+        """
+        def connect(self):
+            """
+            Count connect & connect to host.
+            """
+            counter.increment()
+            return super(_CountingConnection, self).connect()
+
+    class _CountingPool(pool_class):
+        """
+        Pool of counting connections.
+        """
+        ConnectionCls = _CountingConnection
+
+    return _CountingPool
+
+
+class _CountingAdapter(HTTPAdapter):
+    """
+    Transport adapter whose connection pools count connects with *counter*.
+
+    Pools of direct & HTTP(S) proxy connections are counted.
+    Connections made through SOCKS proxies are not, since they use
+    pool classes of :mod:`urllib3.contrib.socks`.
+    """
+    def __init__(self, counter, **kwargs):
+        self._pool_classes_by_scheme = dict(
+            http=_create_counting_pool_class(HTTPConnectionPool, HTTPConnection, counter),
+            https=_create_counting_pool_class(HTTPSConnectionPool, HTTPSConnection, counter)
+        )
+        super(_CountingAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """
+        Create pool manager for direct connections.
+        """
+        super(_CountingAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self._pool_classes_by_scheme
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        """
+        Return pool manager for connections through *proxy*.
+        """
+        is_new = proxy not in self.proxy_manager
+        manager = super(_CountingAdapter, self).proxy_manager_for(proxy, **proxy_kwargs)
+        if is_new and not proxy.lower().startswith('socks'):
+            manager.pool_classes_by_scheme = self._pool_classes_by_scheme
+        return manager
+
+
+class _HTTPClient(object):
+    """
+    HTTP client that keeps connections alive and reuses them
+    for requests to the same host.
+
+    At most *connections_per_host* requests to a single host run at the same time,
+    other requests to this host wait for a free connection.
+
+    Singleton.
+    """
+    LOG_INTERVAL = 50
+
+    def __init__(self, connect_timeout, read_timeout, connections_per_host):
+        self.timeout = (connect_timeout, read_timeout)
+        self._connections = _ConnectionCounter()
+        self._adapter = _CountingAdapter(
+            self._connections,
+            pool_connections=MAX_HOSTS,
+            pool_maxsize=connections_per_host,
+            pool_block=True
+        )
+        self._session = Session()
+        self._session.headers['User-Agent'] = meta.USER_AGENT
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+        self._requests = 0
+        self._lock = Lock()
+
+    def get(self, url, stream=False):
+        """
+        Perform GET request & return :class:`requests.Response`.
+        Raises :class:`requests.HTTPError` if response status is not successful.
+
+        If *stream* is ``True``, response body is not read until accessed,
+        response must be closed by caller.
+        """
+        response = self._session.get(url, timeout=self.timeout, stream=stream)
+        with self._lock:
+            self._requests += 1
+            should_log = self._requests % _HTTPClient.LOG_INTERVAL == 0
+        if should_log:
+            stats = self.get_stats()
+            logger.info(
+                'HTTP client: %d requests, %d connections, %.0f%% reused',
+                stats['requests'], stats['connections'], stats['reuse_rate'] * 100
+            )
+        try:
+            response.raise_for_status()
+        except HTTPError:
+            response.close()
+            raise
+        return response
+
+    def read(self, url):
+        """
+        Return body of response to GET request.
+        """
+        response = self.get(url)
+        try:
+            return response.content
+        finally:
+            response.close()
+
+    def get_stats(self):
+        """
+        Return a dict with number of requests & connections made
+        and a share of requests that reused a kept-alive connection.
+        """
+        with self._lock:
+            requests = self._requests
+        connections = self._connections.value
+        return dict(
+            requests=requests,
+            connections=connections,
+            reuse_rate=max(1 - float(connections) / requests, 0.0) if requests else 0.0
+        )
+
+
+http_client = _HTTPClient(  # pylint: disable=invalid-name
+    settings.get('http_connect_timeout', 'clay_settings') or 5,
+    settings.get('http_read_timeout', 'clay_settings') or 30,
+    settings.get('http_connections_per_host', 'clay_settings') or 4
+)
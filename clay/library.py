@@ -0,0 +1,385 @@
+"""
+Data structures for the local library model.
+"""
+from array import array
+from itertools import compress
+from operator import attrgetter
+from threading import Lock
+
+from sortedcontainers import SortedList
+
+
+class TrackColumns(object):
+    """
+    Struct-of-arrays storage for track fields.
+
+    Each track is a row, each field is a column: text fields are kept
+    in lists, numeric fields in typed arrays. :class:`clay.track.Track`
+    instances are views over rows, so sorting & aggregates can run over
+    columns without touching track objects.
+    Aggregates over all alive rows stream values out of columns with
+    :func:`itertools.compress`, without building row lists or track views.
+
+    Rows are never moved or reused: removed rows are marked as dead,
+    so views of removed tracks remain readable.
+    """
+    TEXT_COLUMNS = (
+        'store_id', 'library_id',
+        'title', 'artist', 'album_name', 'album_url',
+        'rating_timestamp', 'artist_art'
+    )
+    NUMERIC_COLUMNS = (
+        ('duration', 'l'),
+        ('rating', 'b'),
+        ('explicit_rating', 'b')
+    )
+
+    def __init__(self):
+        self.columns = dict((name, []) for name in TrackColumns.TEXT_COLUMNS)
+        self.columns.update(
+            (name, array(typecode))
+            for name, typecode
+            in TrackColumns.NUMERIC_COLUMNS
+        )
+        self._alive = array('b')
+
+    def append(self, values):
+        """
+        Append a row with *values* (a dict with all column values).
+        Return row number.
+        """
+        for name, column in self.columns.items():
+            column.append(values[name])
+        self._alive.append(1)
+        return len(self._alive) - 1
+
+    def extend(self, columns):
+        """
+        Append rows from *columns* (a dict of column values,
+        see :func:`.parse_tracks_data`). Return number of the first appended row.
+        """
+        first_row = len(self._alive)
+        count = 0
+        for name, column in self.columns.items():
+            column.extend(columns[name])
+            count = len(columns[name])
+        self._alive.extend(array('b', [1]) * count)
+        return first_row
+
+    def remove(self, row):
+        """
+        Mark row as removed.
+        """
+        self._alive[row] = 0
+
+    def compact(self, tracks):
+        """
+        Return new columns that contain only the rows of *tracks*
+        (views over alive rows of these columns) and make *tracks* views over them.
+
+        Removed rows are never reused, so columns grow with each sync until compacted.
+        Other views (e.g. of removed tracks) keep reading these columns.
+        """
+        # pylint: disable=protected-access
+        tracks = [
+            track for track in tracks
+            if track._columns is self and self._alive[track._row]
+        ]
+        rows = [track._row for track in tracks]
+        compacted = TrackColumns()
+        for name, column in self.columns.items():
+            compacted.columns[name].extend([column[row] for row in rows])
+        compacted._alive.extend(array('b', [1]) * len(rows))
+        for row, track in enumerate(tracks):
+            track._columns = compacted
+            track._row = row
+        return compacted
+
+    def is_alive(self, row):
+        """
+        Return ``True`` if row was not removed.
+        """
+        return bool(self._alive[row])
+
+    def get_rows(self):
+        """
+        Return a list of rows that were not removed.
+        """
+        return list(compress(range(len(self._alive)), self._alive))
+
+    def count_alive(self):
+        """
+        Return number of rows that were not removed.
+        """
+        return sum(self._alive)
+
+    def argsort(self, name, rows=None, reverse=False):
+        """
+        Return *rows* (all alive rows by default) ordered by values of column *name*.
+        Sort is stable.
+        """
+        if rows is None:
+            rows = self.get_rows()
+        return sorted(rows, key=self.columns[name].__getitem__, reverse=reverse)
+
+    def _iter_values(self, name, rows):
+        """
+        Iterate over values of column *name* in *rows* (all alive rows if ``None``).
+        """
+        column = self.columns[name]
+        if rows is None:
+            return compress(column, self._alive)
+        return (column[row] for row in rows)
+
+    def total(self, name, rows=None):
+        """
+        Return sum of numeric column *name* over *rows* (all alive rows by default).
+        """
+        return sum(self._iter_values(name, rows))
+
+    def count(self, name, value, rows=None):
+        """
+        Return number of *rows* (all alive rows by default)
+        where column *name* equals *value*.
+        """
+        return sum(1 for item in self._iter_values(name, rows) if item == value)
+
+    def __len__(self):
+        return len(self._alive)
+
+
+# Payload fields read by "parse_track_data".
+TRACK_DATA_FIELDS = frozenset((
+    'id', 'storeId', 'title', 'artist', 'album', 'albumArtRef', 'durationMillis',
+    'rating', 'lastRatingChangeTimestamp', 'explicitType', 'artistArtRef'
+))
+
+
+def parse_track_data(data, id_column=None):
+    """
+    Return a dict of column values of a track from Google Play Music API payload.
+
+    *id_column* is a name of column that receives "id" field of payload
+    ("library_id" for library tracks, ``None`` if "id" is not a track ID).
+    Playlist entry IDs are kept in :class:`clay.playlist.PlaylistEntry` records.
+    """
+    # In playlist items and user uploaded songs the storeIds are missing so
+    store_id = (data['storeId'] if 'storeId' in data else data.get('id'))
+    # IDs are kept as strings and converted into UUIDs on access.
+    library_id = (data['id'] if id_column == 'library_id' else None)
+
+    # To filter out the playlist items we need to reassign the store_id when fetching the track
+    if 'track' in data:
+        data = data['track']
+        store_id = data['storeId']
+
+    return dict(
+        store_id=store_id,
+        library_id=library_id,
+        title=data['title'],
+        artist=data['artist'],
+        # User uploaded songs miss a store_id
+        album_name=data['album'],
+        album_url=(data['albumArtRef'][0]['url'] if 'albumArtRef' in data else ""),
+        duration=int(data['durationMillis']),
+        rating=(int(data['rating']) if 'rating' in data else 0),
+        rating_timestamp=data.get('lastRatingChangeTimestamp', '0'),
+        explicit_rating=(int(data['explicitType'])),
+        # Artist art refs are picked lazily, see "Track.artist_art_url".
+        artist_art=data.get('artistArtRef')
+    )
+
+
+def compact_playlist_entry(entry):
+    """
+    Return a copy of playlist entry payload without fields
+    that are not used by :func:`.parse_track_data`.
+    """
+    compact = dict((key, entry[key]) for key in ('id', 'trackId') if key in entry)
+    if 'track' in entry:
+        compact['track'] = dict(
+            (key, value)
+            for key, value
+            in entry['track'].items()
+            if key in TRACK_DATA_FIELDS
+        )
+    return compact
+
+
+def parse_tracks_data(items, id_column=None):
+    """
+    Parse a list of track payloads (see :func:`.parse_track_data`) into columns.
+
+    Return a tuple of three items:
+
+    - a dict where keys are column names and values are lists or arrays of values
+      (can be adopted by :meth:`.TrackColumns.extend`)
+    - a list of indexes of *items* that were parsed
+    - a list of tuples with index & error message of *items* that failed to parse
+    """
+    columns = TrackColumns()
+    indexes = []
+    errors = []
+    for index, data in enumerate(items):
+        try:
+            columns.append(parse_track_data(data, id_column))
+        except Exception as error:  # pylint: disable=broad-except
+            errors.append((index, repr(error)))
+        else:
+            indexes.append(index)
+    return columns.columns, indexes, errors
+
+
+def sort_tracks(tracks, name, reverse=False):
+    """
+    Return a new list of *tracks* sorted by field *name*.
+
+    If all tracks are views over the same :class:`.TrackColumns`,
+    sorting is performed over its column.
+    """
+    # pylint: disable=protected-access
+    columns = tracks[0]._columns if tracks else None
+    if columns is None or any(track._columns is not columns for track in tracks):
+        return sorted(tracks, key=attrgetter(name), reverse=reverse)
+    rows = [track._row for track in tracks]
+    tracks_by_row = dict(zip(rows, tracks))
+    return [tracks_by_row[row] for row in columns.argsort(name, rows, reverse)]
+
+
+class TrackIndex(object):
+    """
+    Hash indexes over library tracks by library ID and store ID
+    and over tracks of resolved playlist entries by entry ID.
+
+    IDs are indexed as strings, so UUIDs and their string forms are interchangeable.
+    If several tracks share the same ID, the first added one is indexed.
+    """
+    def __init__(self, tracks=()):
+        self._indexes = ({}, {}, {})
+        for track in tracks:
+            self.add(track)
+
+    def add(self, track):
+        """
+        Add track to indexes.
+        """
+        for value, index in zip(track.ids, self._indexes):
+            if value is not None:
+                index.setdefault(value, track)
+
+    def remove(self, track):
+        """
+        Remove track from indexes.
+        """
+        for value, index in zip(track.ids, self._indexes):
+            if value is not None and index.get(value) is track:
+                del index[value]
+
+    def add_entries(self, entries):
+        """
+        Add tracks of playlist *entries* (:class:`clay.playlist.PlaylistEntry` records)
+        to entry ID index.
+        """
+        index = self._indexes[2]
+        for entry in entries:
+            if entry.id is not None:
+                index.setdefault(str(entry.id), entry.track)
+
+    def clear_entries(self):
+        """
+        Forget all playlist entries.
+        """
+        self._indexes[2].clear()
+
+    def get(self, any_id):
+        """
+        Return track by library ID, store ID or playlist entry ID, ``None`` if not found.
+        """
+        any_id = str(any_id)
+        for index in self._indexes:
+            track = index.get(any_id)
+            if track is not None:
+                return track
+        return None
+
+    @property
+    def by_library_id(self):
+        """
+        Return a dict where keys are library IDs (strings) and values are tracks.
+        """
+        return self._indexes[0]
+
+    def __len__(self):
+        return len(self._indexes[0])
+
+
+class SortedTrackSet(object):
+    """
+    Set of tracks kept in order.
+
+    Tracks are de-duplicated by key returned by *get_key*
+    (adding a track with the same key replaces the previous one)
+    and ordered by value returned by *get_order* at the time of adding.
+
+    Order is kept in :class:`sortedcontainers.SortedList` (O(log n) insert & remove).
+    """
+    def __init__(self, get_key, get_order):
+        self._get_key = get_key
+        self._get_order = get_order
+        self._entries = {}
+        self._order = SortedList()
+        self._tracks = None
+        self._lock = Lock()
+
+    def add(self, track):
+        """
+        Add track (or replace a track with the same key).
+        """
+        key = self._get_key(track)
+        entry = (self._get_order(track), key)
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (entry, track)
+            self._order.add(entry)
+            self._tracks = None
+
+    def discard(self, track):
+        """
+        Remove track with the same key as *track* if it is present.
+        """
+        key = self._get_key(track)
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        """
+        Remove track by key. Must be called with lock acquired.
+        """
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        entry = item[0]
+        self._order.remove(entry)
+        self._tracks = None
+
+    @property
+    def tracks(self):
+        """
+        Return ordered list of tracks. The list is reused until the set changes.
+        """
+        with self._lock:
+            if self._tracks is None:
+                self._tracks = [self._entries[key][1] for _, key in self._order]
+            return self._tracks
+
+    def contains_key(self, key):
+        """
+        Return ``True`` if a track with *key* is present.
+        """
+        return key in self._entries
+
+    def __contains__(self, track):
+        return self._get_key(track) in self._entries
+
+    def __len__(self):
+        return len(self._entries)
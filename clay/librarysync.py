@@ -0,0 +1,170 @@
+"""
+Merging of fresh library data into cached library tracks.
+
+Changed tracks keep their :class:`clay.track.Track` instances (which are shared
+with other sources) and are rebound to fresh rows, see :meth:`clay.track.Track.rebind`.
+Removed tracks are not detached, since callers remove them from their own indexes
+by library ID first (see :meth:`clay.track.Track.detach`).
+"""
+from datetime import datetime
+
+from clay.track import Track
+
+
+def get_synced_at(data, synced_at=None):
+    """
+    Return the most recent modification timestamp found in raw library entries
+    or *synced_at* (previous timestamp) if it is more recent.
+    """
+    timestamps = [int(item.get('lastModifiedTimestamp', 0)) for item in data]
+    if synced_at is not None:
+        timestamps.append(synced_at)
+    return max(timestamps) if timestamps else None
+
+
+def get_updated_after(synced_at):
+    """
+    Return *synced_at* (microseconds since epoch) as ``updated_after`` argument
+    of :meth:`gmusicapi.Mobileclient.get_all_songs`.
+
+    gmusicapi turns it back into a timestamp with :func:`time.mktime`,
+    so it must be a naive datetime in local time.
+    """
+    seconds, microseconds = divmod(int(synced_at), 1000000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=microseconds)
+
+
+def _update_track(old_track, track):
+    """
+    Rebind *old_track* to the row of fresh *track* if its data has changed.
+    Return ``True`` if it has changed.
+    """
+    if old_track.to_data() == track.to_data():
+        track.detach()
+        return False
+    old_track.detach()
+    old_track.rebind(track)
+    return True
+
+
+def merge_tracks(current, fresh, intern_track):
+    """
+    Merge *fresh* tracks (full library, not interned) into *current* ones.
+    Instances of tracks that did not change are preserved,
+    new tracks are interned with *intern_track* (see :meth:`clay.gp._GP.intern_track`).
+
+    Return a tuple of merged tracks, added tracks & removed tracks.
+    Changed tracks keep their instances and are reported as both removed and added.
+    Tracks that are gone from library are reported as removed, but are not detached.
+    """
+    current_by_id = {track.ids: track for track in current}
+    merged = []
+    added = []
+    removed = []
+    for track in fresh:
+        old_track = current_by_id.pop(track.ids, None)
+        if old_track is None:
+            track = intern_track(track)
+            merged.append(track)
+            added.append(track)
+            continue
+        if _update_track(old_track, track):
+            added.append(old_track)
+            removed.append(old_track)
+        merged.append(old_track)
+    removed.extend(current_by_id.values())
+    return merged, added, removed
+
+
+def _remove_tracks(track_index, items):
+    """
+    Remove tracks of deleted library entries *items* from *track_index*.
+    Return removed tracks (not detached).
+    """
+    removed = []
+    for item in items:
+        track = track_index.by_library_id.get(item['id'])
+        if track is not None:
+            track_index.remove(track)
+            removed.append(track)
+    return removed
+
+
+def _update_tracks(track_index, items, columns):
+    """
+    Apply changed library entries *items* to tracks from *track_index*.
+    Return tracks that have changed.
+    """
+    updated = []
+    for item in items:
+        old_track = track_index.by_library_id[item['id']]
+        track = Track.from_data(item, Track.SOURCE_LIBRARY, columns=columns, interned=False)
+        if track is None:
+            continue
+        track_index.remove(old_track)
+        if _update_track(old_track, track):
+            updated.append(old_track)
+        track_index.add(old_track)
+    return updated
+
+
+def _add_tracks(track_index, items, columns):
+    """
+    Create tracks from new library entries *items* and add them into *track_index*.
+    Return added tracks.
+    """
+    added = Track.from_data(items, Track.SOURCE_LIBRARY, True, columns)
+    for track in added:
+        track_index.add(track)
+    return added
+
+
+def _split_changes(data, by_library_id):
+    """
+    Split raw library entries *data* into deleted, changed & new ones.
+    """
+    deleted = []
+    changed = []
+    new = []
+    for item in data:
+        if item.get('deleted'):
+            deleted.append(item)
+        elif item['id'] in by_library_id:
+            changed.append(item)
+        else:
+            new.append(item)
+    return deleted, changed, new
+
+
+def _replace_tracks(tracks, removed, added):
+    """
+    Return a copy of *tracks* without *removed* tracks and with *added* tracks at the end.
+    """
+    removed_tracks = set(id(track) for track in removed)
+    return [track for track in tracks if id(track) not in removed_tracks] + added
+
+
+def apply_library_changes(tracks, track_index, data, columns):
+    """
+    Merge raw changed & deleted library entries *data* into cached *tracks*
+    and *track_index* (:class:`clay.library.TrackIndex`).
+    New tracks are stored in *columns* (:class:`clay.library.TrackColumns`).
+
+    Entries are applied in three passes: removal of deleted tracks,
+    update of changed tracks & addition of new tracks.
+
+    Return a tuple of merged tracks, added tracks & removed tracks.
+    Changed tracks are reported as both removed and added.
+    Tracks of deleted entries are reported as removed, but are not detached.
+    """
+    deleted, changed, new = _split_changes(data, track_index.by_library_id)
+    removed = _remove_tracks(track_index, deleted)
+    updated = _update_tracks(track_index, changed, columns)
+    added = _add_tracks(track_index, new, columns)
+    if not (removed or updated or added):
+        return tracks, [], []
+    return (
+        _replace_tracks(tracks, removed + updated, updated + added),
+        updated + added,
+        removed + updated
+    )
@@ -2,8 +2,9 @@
 Logger implementation.
 """
 # pylint: disable=too-few-public-methods
-from threading import Lock
+from threading import Condition, Lock, Thread
 from datetime import datetime
+import atexit
 
 from clay.eventhook import EventHook
 
@@ -17,6 +18,7 @@ class _LoggerRecord(object):
         self._verbosity = verbosity
         self._message = message
         self._args = args
+        self._formatted_message = None
 
     @property
     def formatted_timestamp(self):
@@ -36,8 +38,12 @@ class _LoggerRecord(object):
     def formatted_message(self):
         """
         Return formatted message.
+        Message is formatted when it is read for the first time
+        and shared by all sinks that read it.
         """
-        return self._message % self._args
+        if self._formatted_message is None:
+            self._formatted_message = self._message % self._args
+        return self._formatted_message
 
 
 class _Logger(object):
@@ -45,6 +51,9 @@ class _Logger(object):
     Global logger.
 
     Allows subscribing to log events.
+
+    Records are written into log file by a background thread,
+    so callers never wait for messages to be formatted.
     """
 
     def __init__(self):
@@ -52,6 +61,13 @@ class _Logger(object):
         self.logfile = open('/tmp/clay.log', 'w')
 
         self._lock = Lock()
+        self._write_lock = Lock()
+        self._pending = []
+        self._has_pending = Condition(Lock())
+        self._writer = Thread(target=self._write_pending)
+        self._writer.daemon = True
+        self._writer.start()
+        atexit.register(self.flush)
 
         self.on_log_event = EventHook()
 
@@ -63,16 +79,43 @@ class _Logger(object):
         try:
             logger_record = _LoggerRecord(level, message, args)
             self.logs.append(logger_record)
-            self.logfile.write('{} {:8} {}\n'.format(
-                logger_record.formatted_timestamp,
-                logger_record.verbosity,
-                logger_record.formatted_message
-            ))
-            self.logfile.flush()
+            with self._has_pending:
+                self._pending.append(logger_record)
+                self._has_pending.notify()
             self.on_log_event.fire(logger_record)
         finally:
             self._lock.release()
 
+    def _write_pending(self):
+        """
+        Write records into log file as they come. Runs in a background thread.
+        """
+        while True:
+            with self._has_pending:
+                while not self._pending:
+                    self._has_pending.wait()
+            self.flush()
+
+    def flush(self):
+        """
+        Write all pending records into log file.
+        """
+        with self._write_lock:
+            with self._has_pending:
+                records, self._pending = self._pending, []
+            if not records:
+                return
+            self.logfile.write(''.join(
+                '{} {:8} {}\n'.format(
+                    logger_record.formatted_timestamp,
+                    logger_record.verbosity,
+                    logger_record.formatted_message
+                )
+                for logger_record
+                in records
+            ))
+            self.logfile.flush()
+
     def debug(self, message, *args):
         """
         Add debug log item.
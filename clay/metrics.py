@@ -0,0 +1,136 @@
+"""
+Per-protocol metrics of Google Play Music API calls.
+"""
+from collections import deque
+from threading import Lock, local
+import json
+import time
+
+DUMP_PATH = '/tmp/clay-metrics.json'
+
+
+def _percentile(samples, fraction):
+    """
+    Return percentile of sorted *samples* (nearest-rank method).
+    """
+    if not samples:
+        return 0.0
+    index = max(int(round(fraction * len(samples))) - 1, 0)
+    return samples[min(index, len(samples) - 1)]
+
+
+class _ProtocolMetrics(object):
+    """
+    Metrics of a single protocol.
+    """
+    SAMPLES = 1000
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.response_bytes = 0
+        self.latencies = deque(maxlen=_ProtocolMetrics.SAMPLES)
+
+    def get_stats(self):
+        """
+        Return a dict with call count, error rate, latency percentiles (in seconds)
+        of recent calls and average response size (in bytes).
+        """
+        latencies = sorted(self.latencies)
+        return dict(
+            count=self.count,
+            errors=self.errors,
+            error_rate=(float(self.errors) / self.count) if self.count else 0.0,
+            p50=_percentile(latencies, 0.5),
+            p95=_percentile(latencies, 0.95),
+            p99=_percentile(latencies, 0.99),
+            avg_response_bytes=(self.response_bytes // self.count) if self.count else 0
+        )
+
+
+class _APIMetrics(object):
+    """
+    Collects count, latency, response size & error rate of API calls per protocol.
+
+    Singleton.
+    """
+    def __init__(self):
+        self._protocols = {}
+        self._lock = Lock()
+        self._local = local()
+
+    def wrap_call(self, make_call):
+        """
+        Return a function that calls *make_call* (protocol, *args, **kwargs)
+        and records its metrics.
+        """
+        def measured_call(protocol, *args, **kwargs):
+            """
+            Wrapper function.
+            """
+            self._local.response_bytes = 0
+            started_at = time.time()
+            is_error = True
+            try:
+                result = make_call(protocol, *args, **kwargs)
+                is_error = False
+                return result
+            finally:
+                self._record(
+                    protocol.__name__,
+                    time.time() - started_at,
+                    self._local.response_bytes,
+                    is_error
+                )
+        return measured_call
+
+    def wrap_send(self, send):
+        """
+        Return a function that calls session's *send* method
+        and counts size of response it returns.
+        """
+        def measured_send(*args, **kwargs):
+            """
+            Wrapper function.
+            """
+            response = send(*args, **kwargs)
+            self._local.response_bytes = getattr(self._local, 'response_bytes', 0) + \
+                len(response.content or b'')
+            return response
+        return measured_send
+
+    def _record(self, name, latency, response_bytes, is_error):
+        """
+        Record a single call.
+        """
+        with self._lock:
+            if name not in self._protocols:
+                self._protocols[name] = _ProtocolMetrics()
+            metrics = self._protocols[name]
+            metrics.count += 1
+            metrics.errors += int(is_error)
+            metrics.response_bytes += response_bytes
+            metrics.latencies.append(latency)
+
+    def get_stats(self):
+        """
+        Return a dict where keys are protocol names and values are dicts
+        returned by :meth:`._ProtocolMetrics.get_stats`.
+        """
+        with self._lock:
+            return dict(
+                (name, metrics.get_stats())
+                for name, metrics
+                in self._protocols.items()
+            )
+
+    def dump(self, path=DUMP_PATH):
+        """
+        Write stats into a JSON file. Return path to this file.
+        """
+        with open(path, 'w') as dump_file:
+            dump_file.write(json.dumps(self.get_stats(), indent=4, sort_keys=True))
+        return path
+
+
+api_metrics = _APIMetrics()  # pylint: disable=invalid-name
@@ -0,0 +1,254 @@
+"""
+Write-behind queue of library mutations (track ratings, additions & removals).
+"""
+# pylint: disable=broad-except
+from collections import OrderedDict
+from itertools import groupby
+from threading import Lock, Timer
+import json
+
+from clay.log import logger
+from clay.settings import settings
+
+KIND_RATE = 'rate'
+KIND_ADD = 'add'
+KIND_REMOVE = 'remove'
+KINDS = (KIND_RATE, KIND_ADD, KIND_REMOVE)
+
+
+class MutationQueue(object):
+    """
+    Collects library mutations and sends them to server in background.
+
+    Mutations are keyed by kind & track ID. A newer mutation replaces
+    a pending one with the same key, e.g. only the last rating of a track is sent.
+    Pending mutations that are not being sent yet can be discarded,
+    e.g. when a track is removed before its addition is sent.
+    Mutations are sent in the order they were made (a replaced mutation counts
+    as made when it was replaced), so that e.g. removal & re-addition of a track
+    are applied by server in the same order. Consecutive mutations of the same kind
+    are sent together, in as few API calls as possible.
+
+    Failed batches are retried with exponential backoff, mutations that were made
+    after a failed batch wait for it.
+    Pending mutations are saved in cache dir by flush worker, so they survive restarts.
+    """
+    FILENAME = 'mutations.json'
+    FLUSH_DELAY = 1
+    RETRY_DELAY = 5
+    MAX_RETRY_DELAY = 300
+    MAX_ATTEMPTS = 8
+    MAX_BATCH_SIZE = 100
+
+    def __init__(self, senders):
+        """
+        *senders* is a dict that maps mutation kinds to functions
+        that send a list of mutation values to server.
+        """
+        self._senders = senders
+        self._pending = OrderedDict()
+        self._callbacks = {}
+        # Keys of mutations that are being sent.
+        self._sending = set()
+        self._attempts = dict((kind, 0) for kind in KINDS)
+        self._lock = Lock()
+        self._flush_lock = Lock()
+        self._timer = None
+        self._is_started = False
+        self._is_dirty = False
+        self._load()
+
+    def _load(self):
+        """
+        Load mutations that were pending when app was closed.
+        """
+        path = settings.get_cached_file_path(MutationQueue.FILENAME)
+        if path is None:
+            return
+        try:
+            with open(path, 'r') as mutations_file:
+                for kind, key, value in json.loads(mutations_file.read()):
+                    self._pending[(kind, key)] = value
+        except (EnvironmentError, ValueError, TypeError) as error:
+            logger.error('Failed to load pending mutations: %s', str(error))
+            return
+        logger.debug('Loaded %d pending mutations', len(self._pending))
+
+    def _save(self):
+        """
+        Write pending mutations into cache dir if they have changed since last save.
+        Must be called with flush lock acquired.
+        """
+        with self._lock:
+            if not self._is_dirty:
+                return
+            self._is_dirty = False
+            mutations = [
+                [kind, key, value]
+                for (kind, key), value
+                in self._pending.items()
+            ]
+        if not mutations:
+            settings.remove_file_from_cache(MutationQueue.FILENAME)
+            return
+        settings.save_file_to_cache(
+            MutationQueue.FILENAME, json.dumps(mutations).encode('utf-8')
+        )
+
+    def put(self, kind, key, value, callback=None):
+        """
+        Queue mutation of *kind* identified by *key*.
+        *value* is passed to the sender of this kind & must be JSON-serializable.
+
+        *callback* is called with "(result, error)" args once mutation
+        is sent or dropped after too many failed attempts.
+        """
+        with self._lock:
+            self._pending.pop((kind, key), None)
+            self._pending[(kind, key)] = value
+            if callback is not None:
+                self._callbacks.setdefault((kind, key), []).append(callback)
+            self._is_dirty = True
+        self._schedule_flush(MutationQueue.FLUSH_DELAY)
+
+    def get_pending(self, kind, key):
+        """
+        Return value of pending mutation, ``None`` if there is none.
+        """
+        with self._lock:
+            return self._pending.get((kind, key))
+
+    def has_pending(self, kind, key):
+        """
+        Return ``True`` if mutation of *kind* identified by *key* is pending.
+        """
+        with self._lock:
+            return (kind, key) in self._pending
+
+    def discard(self, kind, key):
+        """
+        Drop pending mutation unless it is being sent.
+        Return ``True`` if it was dropped. Callbacks of dropped mutation are not called.
+        """
+        with self._lock:
+            if (kind, key) not in self._pending or (kind, key) in self._sending:
+                return False
+            del self._pending[(kind, key)]
+            self._callbacks.pop((kind, key), None)
+            self._is_dirty = True
+            return True
+
+    def start(self):
+        """
+        Allow sending mutations (e.g. once user is authenticated)
+        and send mutations that are pending.
+        """
+        with self._lock:
+            self._is_started = True
+            has_pending = bool(self._pending)
+        if has_pending:
+            self._schedule_flush(MutationQueue.FLUSH_DELAY)
+
+    def _schedule_flush(self, delay):
+        """
+        Save & send pending mutations in background after *delay* seconds.
+        Mutations queued within this delay are saved & sent together.
+        """
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """
+        Save pending mutations and send them (if queue is started) in order, in batches.
+        Schedules a retry if some batch fails.
+        """
+        with self._lock:
+            self._timer = None
+            is_started = self._is_started
+        retry_delay = None
+        with self._flush_lock:
+            self._save()
+            if not is_started:
+                return
+            for kind, batch in self._get_batches():
+                retry_delay = self._send(kind, batch)
+                if retry_delay is not None:
+                    break
+            self._save()
+            with self._lock:
+                has_pending = bool(self._pending)
+        if retry_delay is not None:
+            self._schedule_flush(retry_delay)
+        elif has_pending:
+            self._schedule_flush(0)
+
+    def _get_batches(self):
+        """
+        Return a list of tuples with kind & batch of pending mutations,
+        where batches are runs of consecutive mutations of the same kind.
+        """
+        with self._lock:
+            mutations = list(self._pending.items())
+        batches = []
+        for kind, run in groupby(mutations, key=lambda mutation: mutation[0][0]):
+            run = [(key, value) for (_, key), value in run]
+            for start in range(0, len(run), MutationQueue.MAX_BATCH_SIZE):
+                batches.append((kind, run[start:start + MutationQueue.MAX_BATCH_SIZE]))
+        return batches
+
+    def _send(self, kind, batch):
+        """
+        Send a batch of mutations of single kind.
+        Return delay before next attempt if it failed, ``None`` otherwise.
+        """
+        logger.debug('Sending %d "%s" mutations', len(batch), kind)
+        with self._lock:
+            self._sending = set((kind, key) for key, _ in batch)
+        try:
+            self._senders[kind]([value for _, value in batch])
+        except Exception as error:
+            self._attempts[kind] += 1
+            logger.error(
+                'Failed to send "%s" mutations (attempt %d): %s',
+                kind, self._attempts[kind], str(error)
+            )
+            if self._attempts[kind] < MutationQueue.MAX_ATTEMPTS:
+                with self._lock:
+                    self._sending = set()
+                return min(
+                    MutationQueue.RETRY_DELAY * 2 ** (self._attempts[kind] - 1),
+                    MutationQueue.MAX_RETRY_DELAY
+                )
+            self._attempts[kind] = 0
+            self._complete(kind, batch, None, error)
+            return None
+        self._attempts[kind] = 0
+        self._complete(kind, batch, True, None)
+        return None
+
+    def _complete(self, kind, batch, result, error):
+        """
+        Remove sent (or dropped) mutations from queue & call their callbacks.
+        Mutations that were replaced while being sent remain pending.
+        """
+        callbacks = []
+        with self._lock:
+            self._sending = set()
+            for key, value in batch:
+                if self._pending.get((kind, key)) is not value:
+                    continue
+                del self._pending[(kind, key)]
+                callbacks.extend(self._callbacks.pop((kind, key), ()))
+                self._is_dirty = True
+        for callback in callbacks:
+            try:
+                callback(result, error)
+            except Exception as callback_error:
+                logger.error('Mutation callback failed: %s', repr(callback_error))
+
+    def __len__(self):
+        return len(self._pending)
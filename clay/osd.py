@@ -3,6 +3,7 @@ On-screen display stuff.
 """
 from threading import Thread
 
+from clay.art import art_manager
 from clay.notifications import notification_area
 from clay import meta
 
@@ -26,6 +27,7 @@ class _OSDManager(object):
     """
     def __init__(self):
         self._last_id = 0
+        self._last_track = None
 
         if IS_INIT:
             self.bus = SessionBus()
@@ -38,18 +40,43 @@ class _OSDManager(object):
     def notify(self, track):
         """
         Create new or update existing notification.
+
+        Never waits for art download: if art is not cached yet,
+        notification is shown without it and updated once art is fetched.
         """
-        if IS_INIT:
-            thread = Thread(target=self._notify, args=(track,))
-            thread.daemon = True
-            thread.start()
+        if not IS_INIT:
+            return
+        self._last_track = track
+        art_filename = track.get_cached_art_filename()
+        self._notify_async(track, art_filename)
+        if art_filename is None:
+            url = track.artist_art_url or track.album_url or None
+            if url is not None:
+                art_manager.fetch_async(
+                    url,
+                    callback=lambda path, error: self._art_ready(track, path)
+                )
+
+    def _art_ready(self, track, art_filename):
+        """
+        Called when art is fetched. Update notification if it still shows the same track.
+        """
+        if art_filename is not None and self._last_track is track:
+            self._notify_async(track, art_filename)
+
+    def _notify_async(self, track, art_filename):
+        """
+        Send notification in a separate thread.
+        """
+        thread = Thread(target=self._notify, args=(track, art_filename))
+        thread.daemon = True
+        thread.start()
 
-    def _notify(self, track):
-        artist_art_filename = track.get_artist_art_filename()
+    def _notify(self, track, art_filename):
         self._last_id = self.notify_interface.Notify(
             meta.APP_NAME,
             self._last_id,
-            artist_art_filename if artist_art_filename is not None else 'audio-headphones',
+            art_filename if art_filename is not None else 'audio-headphones',
             track.title,
             u'by {}\nfrom {}'.format(track.artist, track.album_name),
             [],
@@ -7,12 +7,36 @@ from clay.pages.page import AbstractPage
 from clay.log import logger
 from clay.clipboard import copy
 from clay.gp import gp
+from clay.metrics import api_metrics
+from clay.notifications import notification_area
+from clay.pool import worker_pool
 from clay.hotkeys import hotkey_manager
 
 
+class _LazyText(urwid.Text):
+    """
+    Text widget that calls *get_markup* to get its markup
+    only when it is rendered for the first time.
+    """
+    def __init__(self, get_markup):
+        self._get_markup = get_markup
+        super(_LazyText, self).__init__('')
+
+    def get_text(self):
+        """
+        Return text & attributes, get markup first if needed.
+        """
+        if self._get_markup is not None:
+            get_markup, self._get_markup = self._get_markup, None
+            self.set_text(get_markup())
+        return super(_LazyText, self).get_text()
+
+
 class DebugItem(urwid.AttrMap):
     """
     Represents a single debug log item.
+
+    Message is formatted only once the item is shown.
     """
     def selectable(self):
         return True
@@ -22,22 +46,20 @@ class DebugItem(urwid.AttrMap):
 
         self.columns = urwid.Columns([
             ('pack', urwid.Text(self.log_record.verbosity.ljust(8))),
-            urwid.Text(
-                (
-                    self.log_record.formatted_timestamp +
-                    '\n' +
-                    self.log_record.formatted_message
-                )
-            )
+            _LazyText(lambda: (
+                self.log_record.formatted_timestamp +
+                '\n' +
+                self.log_record.formatted_message
+            ))
         ])
 
         super(DebugItem, self).__init__(self.columns, 'line1', 'line1_focus')
 
     def keypress(self, _, key):
         """
-        Handle heypress.
+        Handle keypress. Hotkeys are handled by :class:`.DebugPage`.
         """
-        return hotkey_manager.keypress("debug_page", self, None, None, key)
+        return key
 
     def copy_message(self):
         """Copy the selected error message to the clipboard"""
@@ -61,7 +83,10 @@ class DebugPage(urwid.Pile, AbstractPage):
         super(DebugPage, self).__init__([
             ('pack', self.debug_data),
             ('pack', urwid.Text('')),
-            ('pack', urwid.Text('Hit "Enter" to copy selected message to clipboard.')),
+            ('pack', urwid.Text(
+                'Hit "Enter" to copy selected message to clipboard, '
+                '"Alt + M" to save API metrics into a file.'
+            )),
             ('pack', urwid.Divider(u'\u2550')),
             self.listbox
         ])
@@ -70,18 +95,71 @@ class DebugPage(urwid.Pile, AbstractPage):
 
         self.update()
 
+    def keypress(self, size, key):
+        """
+        Handle keypress.
+        """
+        return hotkey_manager.keypress("debug_page", self, super(DebugPage, self), size, key)
+
+    def copy_message(self):
+        """Copy the selected error message to the clipboard"""
+        if isinstance(self.listbox.focus, DebugItem):
+            self.listbox.focus.copy_message()
+
+    @staticmethod
+    def dump_metrics():
+        """Dump API metrics into a file"""
+        path = api_metrics.dump()
+        notification_area.notify('API metrics saved to {}'.format(path))
+
     def update(self, *_):
         """
         Update this widget.
         """
+        pool_stats = worker_pool.get_stats()
+        library_stats = gp.get_library_stats()
         self.debug_data.set_text(
             '- Is authenticated: {}\n'
-            '- Is subscribed: {}'.format(
+            '- Is subscribed: {}\n'
+            '- Workers busy: {}/{}, queued: {}, avg wait: {:.3f}s, max wait: {:.3f}s\n'
+            '- Library: {} tracks, {:.1f} hours, {} liked, {} disliked'.format(
                 gp.is_authenticated,
-                gp.is_subscribed if gp.is_authenticated else None
-            )
+                gp.is_subscribed if gp.is_authenticated else None,
+                pool_stats['busy'],
+                pool_stats['workers'],
+                pool_stats['queued'],
+                pool_stats['avg_wait'],
+                pool_stats['max_wait'],
+                library_stats['tracks'],
+                library_stats['duration'] / 3600000.0,
+                library_stats['liked'],
+                library_stats['disliked']
+            ) + self._format_api_metrics()
         )
 
+    @staticmethod
+    def _format_api_metrics():
+        """
+        Return API call metrics formatted as lines, most called protocols first.
+        """
+        lines = []
+        api_stats = api_metrics.get_stats()
+        for name in sorted(api_stats, key=lambda name: -api_stats[name]['count']):
+            stats = api_stats[name]
+            lines.append(
+                '\n- API {}: {} calls, {:.0f}/{:.0f}/{:.0f} ms p50/p95/p99, '
+                '{:.1f} KiB avg, {:.0%} errors'.format(
+                    name,
+                    stats['count'],
+                    stats['p50'] * 1000,
+                    stats['p95'] * 1000,
+                    stats['p99'] * 1000,
+                    stats['avg_response_bytes'] / 1024.0,
+                    stats['error_rate']
+                )
+            )
+        return ''.join(lines)
+
     def _append_log(self, log_record):
         """
         Add log record to list.
@@ -114,4 +192,4 @@ class DebugPage(urwid.Pile, AbstractPage):
         """
         Notify page that it is activated.
         """
-        pass
+        self.update()
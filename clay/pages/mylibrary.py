@@ -1,9 +1,12 @@
 """
 Library page.
 """
+from operator import attrgetter
+
 import urwid
 
 from clay.gp import gp
+from clay.library import sort_tracks
 from clay.songlist import SongListBox
 from clay.notifications import notification_area
 from clay.pages.page import AbstractPage
@@ -34,9 +37,15 @@ class MyLibraryPage(urwid.Columns, AbstractPage):
         self.app = app
         self.songlist = SongListBox(app)
         self.notification = None
+        self._is_loading_chunks = False
 
         gp.auth_state_changed += self.get_all_songs
         gp.caches_invalidated += self.get_all_songs
+        gp.snapshot_loaded += self.get_all_songs
+        gp.library_updated += self.library_updated
+        gp.library_chunk_loaded += self.library_chunk_loaded
+        gp.track_added += self.track_added
+        gp.track_removed += self.track_removed
 
         super(MyLibraryPage, self).__init__([
             self.songlist
@@ -47,19 +56,60 @@ class MyLibraryPage(urwid.Columns, AbstractPage):
         Called when all library songs are fetched from server.
         Populate song list.
         """
+        is_loading_chunks, self._is_loading_chunks = self._is_loading_chunks, False
         if error:
             notification_area.notify('Failed to load my library: {}'.format(str(error)))
             return
-        tracks.sort(key=lambda k: k.original_data['title'])
-        self.songlist.populate(tracks)
+        if is_loading_chunks and len(self.songlist.tracks) == len(tracks):
+            # All tracks were already merged into song list chunk by chunk.
+            return
+        self.songlist.populate(sort_tracks(tracks, 'title'))
+        self.app.redraw()
+
+    def library_chunk_loaded(self, tracks, loaded_count):
+        """
+        Called when a page of library tracks is fetched from server.
+        Merge these tracks into song list, so it is browsable before whole library is loaded.
+        """
+        tracks = sort_tracks(tracks, 'title')
+        if not self._is_loading_chunks or loaded_count == len(tracks):
+            self._is_loading_chunks = True
+            self.songlist.populate(tracks)
+        else:
+            self.songlist.merge_tracks(tracks, attrgetter('title'))
+        self.app.redraw()
+
+    def library_updated(self, *_):
+        """
+        Called when library is updated in background.
+        Repopulate song list.
+        """
+        self.on_get_all_songs(gp.cached_tracks, None)
+
+    def track_added(self, track):
+        """
+        Called when a track is added to library.
+        Insert it into song list, keeping it sorted by title.
+        """
+        self.songlist.insert_sorted_track(track, attrgetter('title'))
+        self.app.redraw()
+
+    def track_removed(self, track):
+        """
+        Called when a track is removed from library.
+        Remove it from song list.
+        """
+        self.songlist.tracks = [item for item in self.songlist.tracks if item is not track]
+        self.songlist.remove_track(track)
         self.app.redraw()
 
     def get_all_songs(self, *_):
         """
-        Called when auth state changes or GP caches are invalidated.
+        Called when auth state changes, GP caches are invalidated or library snapshot is loaded.
         """
-        if gp.is_authenticated:
-            self.songlist.set_placeholder(u'\n \uf01e Loading song list...')
+        if gp.is_authenticated or gp.is_using_snapshot:
+            if not self._is_loading_chunks:
+                self.songlist.set_placeholder(u'\n \uf01e Loading song list...')
 
             gp.get_all_tracks_async(callback=self.on_get_all_songs)
             self.app.redraw()
@@ -20,7 +20,7 @@ class MyPlaylistListItem(urwid.Columns):
         self.playlist = playlist
         self.text = urwid.SelectableIcon(u' \u2630 {} ({})'.format(
             self.playlist.name,
-            len(self.playlist.tracks)
+            self.playlist.track_count
         ), cursor_position=3)
         self.text.set_layout('left', 'clip', None)
         self.content = urwid.AttrWrap(
@@ -45,9 +45,10 @@ class MyPlaylistListItem(urwid.Columns):
 
     def get_tracks(self):
         """
-        Returns a list of :class:`clay.gp.Track` instances.
+        Returns a list of :class:`clay.track.Track` instances.
+        Playlist tracks must be loaded first (see :meth:`clay.playlist.Playlist.load_tracks`).
         """
-        return self.playlist.tracks
+        return self.playlist.get_tracks()
 
 
 class MyPlaylistListBox(urwid.ListBox):
@@ -65,6 +66,8 @@ class MyPlaylistListBox(urwid.ListBox):
         self.notification = None
 
         gp.auth_state_changed += self.auth_state_changed
+        gp.snapshot_loaded += self.load_playlists
+        gp.playlists_updated += self.load_playlists
 
         super(MyPlaylistListBox, self).__init__(self.walker)
 
@@ -74,11 +77,17 @@ class MyPlaylistListBox(urwid.ListBox):
         Requests fetching of playlists.
         """
         if is_auth:
-            self.walker[:] = [
-                urwid.Text(u'\n \uf01e Loading playlists...', align='center')
-            ]
+            self.load_playlists()
 
-            gp.get_all_user_playlist_contents_async(callback=self.on_get_playlists)
+    def load_playlists(self):
+        """
+        Request fetching of playlists.
+        """
+        self.walker[:] = [
+            urwid.Text(u'\n \uf01e Loading playlists...', align='center')
+        ]
+
+        gp.get_all_user_playlist_contents_async(callback=self.on_get_playlists)
 
     def on_get_playlists(self, playlists, error):
         """
@@ -138,6 +147,7 @@ class MyPlaylistsPage(urwid.Columns, AbstractPage):
         self.myplaylistlist = MyPlaylistListBox(app)
         self.songlist = SongListBox(app)
         self.songlist.set_placeholder('\n Select a playlist.')
+        self._playlist = None
 
         urwid.connect_signal(
             self.myplaylistlist, 'activate', self.myplaylistlistitem_activated
@@ -151,11 +161,31 @@ class MyPlaylistsPage(urwid.Columns, AbstractPage):
     def myplaylistlistitem_activated(self, myplaylistlistitem):
         """
         Called when specific playlist is selected.
-        Populates songlist with tracks from the selected playlist.
+        Requests loading of playlist tracks.
         """
-        self.songlist.populate(
-            myplaylistlistitem.get_tracks()
+        self._playlist = myplaylistlistitem.playlist
+        self.songlist.set_placeholder(u'\n \uf01e Loading playlist tracks...')
+        myplaylistlistitem.playlist.load_tracks_async(
+            callback=self.on_playlist_loaded,
+            extra=dict(playlist=myplaylistlistitem.playlist)
         )
 
+    def on_playlist_loaded(self, tracks, error, playlist):
+        """
+        Called when playlist tracks are loaded.
+        Populates songlist with tracks from the selected playlist.
+        Results for playlists that are no longer selected are dropped.
+        """
+        if playlist is not self._playlist:
+            return
+        if error:
+            notification_area.notify('Failed to load playlist {}: {}'.format(
+                playlist.name, str(error)
+            ))
+            return
+
+        self.songlist.populate(tracks)
+        self.app.redraw()
+
     def activate(self):
         pass
@@ -58,6 +58,8 @@ class MyStationListBox(urwid.ListBox):
         self.notification = None
 
         gp.auth_state_changed += self.auth_state_changed
+        gp.snapshot_loaded += self.load_stations
+        gp.stations_updated += self.load_stations
 
         super(MyStationListBox, self).__init__(self.walker)
 
@@ -67,11 +69,17 @@ class MyStationListBox(urwid.ListBox):
         Requests fetching of station.
         """
         if is_auth:
-            self.walker[:] = [
-                urwid.Text(u'\n \uf01e Loading stations...', align='center')
-            ]
+            self.load_stations()
 
-            gp.get_all_user_station_contents_async(callback=self.on_get_stations)
+    def load_stations(self):
+        """
+        Request fetching of stations.
+        """
+        self.walker[:] = [
+            urwid.Text(u'\n \uf01e Loading stations...', align='center')
+        ]
+
+        gp.get_all_user_station_contents_async(callback=self.on_get_stations)
 
     def on_get_stations(self, stations, error):
         """
@@ -158,7 +166,8 @@ class MyStationsPage(urwid.Columns, AbstractPage):
             notification_area.notify('Failed to get station tracks: {}'.format(str(error)))
 
         self.songlist.populate(
-            station.get_tracks()
+            station.get_tracks(),
+            station=station
         )
         self.app.redraw()
 
@@ -31,7 +31,7 @@ class QueuePage(urwid.Columns, AbstractPage):
         self.app = app
         self.songlist = SongListBox(app)
 
-        self.songlist.populate(player.get_queue_tracks())
+        self.songlist.populate(player.get_queue_tracks(), player.queue.station)
         player.queue_changed += self.queue_changed
         player.track_appended += self.track_appended
         player.track_removed += self.track_removed
@@ -45,7 +45,7 @@ class QueuePage(urwid.Columns, AbstractPage):
         Called when player queue is changed.
         Updates this queue widget.
         """
-        self.songlist.populate(player.get_queue_tracks())
+        self.songlist.populate(player.get_queue_tracks(), player.queue.station)
 
     def track_appended(self, track):
         """
@@ -71,6 +71,7 @@ class SearchPage(urwid.Pile, AbstractPage):
         self.songlist = SongListBox(app)
 
         self.search_box = SearchBox()
+        self._query = None
 
         urwid.connect_signal(self.search_box, 'search-requested', self.perform_search)
 
@@ -83,21 +84,51 @@ class SearchPage(urwid.Pile, AbstractPage):
     def perform_search(self, query):
         """
         Search tracks by query.
+
+        Matching library tracks are displayed immediately,
+        store tracks are appended once remote search completes.
         """
-        self.songlist.set_placeholder(u' \U0001F50D Searching for "{}"...'.format(
-            query
-        ))
-        gp.search_async(query, callback=self.search_finished)
+        self._query = query
+        local_tracks = gp.search_library(query)
+        if local_tracks:
+            self.songlist.populate(local_tracks)
+        elif gp.is_authenticated:
+            self.songlist.set_placeholder(u' \U0001F50D Searching for "{}"...'.format(
+                query
+            ))
+        else:
+            self.songlist.set_placeholder(u' \U0001F50D No results for "{}"'.format(query))
+        self.app.redraw()
+
+        if not gp.is_authenticated:
+            return
+
+        def search_finished(results, error):
+            """
+            Merge remote search results with local ones.
+            """
+            if query != self._query:
+                return
+            self.search_finished(results, error, local_tracks)
 
-    def search_finished(self, results, error):
+        gp.search_async(query, callback=search_finished)
+
+    def search_finished(self, results, error, local_tracks):
         """
-        Populate song list with search results.
+        Populate song list with local tracks followed by remote search results
+        that are not in local tracks.
         """
         if error:
             notification_area.notify('Failed to search: {}'.format(str(error)))
-        else:
-            self.songlist.populate(results.get_tracks())
-            self.app.redraw()
+            return
+        store_ids = set(track.store_id for track in local_tracks)
+        self.songlist.populate(local_tracks + [
+            track
+            for track
+            in results.get_tracks()
+            if track.store_id not in store_ids
+        ])
+        self.app.redraw()
 
     def activate(self):
         pass
@@ -156,6 +156,10 @@ class SettingsPage(urwid.Columns, AbstractPage):
             'Download tracks before playback',
             state=settings.get('download_tracks', 'play_settings') or False
         )
+        self.endless_stations = urwid.CheckBox(
+            'Keep playing stations endlessly',
+            state=settings.get('endless_stations', 'play_settings') or False
+        )
         self.equalizer = Equalizer()
         super(SettingsPage, self).__init__([urwid.ListBox(urwid.SimpleListWalker([
             urwid.Text('Settings'),
@@ -170,6 +174,7 @@ class SettingsPage(urwid.Columns, AbstractPage):
             urwid.AttrWrap(self.device_id, 'input', 'input_focus'),
             urwid.Divider(' '),
             self.download_tracks,
+            self.endless_stations,
             urwid.Divider(' '),
             urwid.AttrWrap(urwid.Button(
                 'Save', on_press=self.on_save
@@ -189,6 +194,7 @@ class SettingsPage(urwid.Columns, AbstractPage):
             config['play_settings']['password'] = self.password.edit_text
             config['play_settings']['device_id'] = self.device_id.edit_text
             config['play_settings']['download_tracks'] = self.download_tracks.state
+            config['play_settings']['endless_stations'] = self.endless_stations.state
 
         self.app.set_page('MyLibraryPage')
         self.app.log_in()
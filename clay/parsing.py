@@ -0,0 +1,169 @@
+"""
+Parsing of track payloads in a separate worker process.
+
+Parsing thousands of tracks is CPU-bound Python code that holds the GIL,
+so doing it in a thread makes UI stutter. Worker process parses payloads
+into columns (see :func:`clay.library.parse_tracks_data`), which are sent back
+as a compact pickle and adopted with :meth:`clay.library.TrackColumns.extend`.
+
+Worker is started on demand with ``python -m clay.parsing``
+and talks to app via length-prefixed pickles over stdin & stdout.
+Its stderr is forwarded into app log.
+"""
+from subprocess import Popen, PIPE
+from threading import Lock, Thread
+import os
+import pickle
+import struct
+import sys
+
+from clay.library import parse_tracks_data
+
+# Payloads are sent to worker in chunks of this size,
+# so that pickling a single chunk never blocks other threads for long.
+CHUNK_SIZE = 250
+_HEADER = struct.Struct('>I')
+
+
+class ParserError(Exception):
+    """
+    Raised when worker process fails.
+    """
+
+
+def _write_message(stream, message):
+    """
+    Write length-prefixed *message* (bytes) into *stream*.
+    """
+    stream.write(_HEADER.pack(len(message)))
+    stream.write(message)
+    stream.flush()
+
+
+def _read_exactly(stream, size):
+    """
+    Read *size* bytes from *stream*, ``None`` if stream ends earlier.
+    """
+    chunks = []
+    while size:
+        chunk = stream.read(size)
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _read_message(stream):
+    """
+    Read length-prefixed message from *stream*, ``None`` if stream has ended.
+    """
+    header = _read_exactly(stream, _HEADER.size)
+    if header is None:
+        return None
+    return _read_exactly(stream, _HEADER.unpack(header)[0])
+
+
+def _log_stderr(stream):
+    """
+    Forward lines from worker process *stream* (stderr) into app log until it ends.
+    """
+    # Imported here so that worker process never opens app log.
+    from clay.log import logger  # pylint: disable=import-outside-toplevel
+    for line in iter(stream.readline, b''):
+        logger.error('Parser process: %s', line.decode('utf-8', 'replace').rstrip())
+    stream.close()
+
+
+class _ParserProcess(object):
+    """
+    Client of the worker process.
+
+    Singleton.
+    """
+    def __init__(self):
+        self._process = None
+        self._lock = Lock()
+
+    def _ensure_started(self):
+        """
+        Start worker process if it is not running. Must be called with lock acquired.
+        """
+        if self._process is not None and self._process.poll() is None:
+            return
+        package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [package_root] + ([env['PYTHONPATH']] if env.get('PYTHONPATH') else [])
+        )
+        self._process = Popen(
+            [sys.executable, '-m', 'clay.parsing'],
+            stdin=PIPE, stdout=PIPE, stderr=PIPE, env=env
+        )
+        stderr_thread = Thread(target=_log_stderr, args=(self._process.stderr,))
+        stderr_thread.daemon = True
+        stderr_thread.start()
+
+    def parse(self, items, id_column=None):
+        """
+        Parse track payloads in worker process.
+        Returns the same tuple as :func:`clay.library.parse_tracks_data`.
+
+        Raises :class:`.ParserError` if worker process dies.
+        """
+        columns, indexes, errors = None, [], []
+        for offset in range(0, len(items), CHUNK_SIZE):
+            chunk_columns, chunk_indexes, chunk_errors = self._parse_chunk(
+                items[offset:offset + CHUNK_SIZE], id_column
+            )
+            if columns is None:
+                columns = chunk_columns
+            else:
+                for name, values in chunk_columns.items():
+                    columns[name].extend(values)
+            indexes.extend(offset + index for index in chunk_indexes)
+            errors.extend((offset + index, error) for index, error in chunk_errors)
+        if columns is None:
+            columns, _, _ = parse_tracks_data([])
+        return columns, indexes, errors
+
+    def _parse_chunk(self, items, id_column):
+        """
+        Send a single chunk of payloads to worker process & return parsed result.
+        """
+        message = pickle.dumps((items, id_column), pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._ensure_started()
+            try:
+                _write_message(self._process.stdin, message)
+                result = _read_message(self._process.stdout)
+            except (IOError, OSError) as error:
+                raise ParserError('Parser process failed: {}'.format(str(error)))
+            if result is None:
+                raise ParserError('Parser process exited with code {}'.format(
+                    self._process.wait()
+                ))
+        return pickle.loads(result)
+
+
+parser_process = _ParserProcess()  # pylint: disable=invalid-name
+
+
+def main():
+    """
+    Worker process entry point: parse payloads until stdin is closed.
+    """
+    stdin = getattr(sys.stdin, 'buffer', sys.stdin)
+    stdout = getattr(sys.stdout, 'buffer', sys.stdout)
+    while True:
+        message = _read_message(stdin)
+        if message is None:
+            break
+        items, id_column = pickle.loads(message)
+        _write_message(stdout, pickle.dumps(
+            parse_tracks_data(items, id_column), pickle.HIGHEST_PROTOCOL
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -4,22 +4,31 @@ Media player built using libVLC.
 # pylint: disable=too-many-instance-attributes
 # pylint: disable=too-many-public-methods
 from random import randint
+from threading import Lock
 from ctypes import CFUNCTYPE, c_void_p, c_int, c_char_p
 import json
 import os
 
-try:  # Python 3.x
-    from urllib.request import urlopen
-except ImportError:  # Python 2.x
-    from urllib2 import urlopen
+from requests import RequestException
 
 from clay import vlc, meta
+from clay.art import art_manager
 from clay.eventhook import EventHook
+from clay.httpclient import http_client
 from clay.notifications import notification_area
 from clay.osd import osd_manager
 from clay.settings import settings
 from clay.log import logger
 
+# Endless station queue is refilled once it has this many tracks left to play.
+STATION_REFILL_THRESHOLD = 5
+# Number of most recent queue tracks that station refills are de-duplicated against.
+STATION_RECENT_TRACKS = 200
+# Size of chunks tracks are downloaded in, stale downloads are abandoned between chunks.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+# Number of upcoming queue tracks to prefetch art for.
+ART_PREFETCH_COUNT = 3
+
 
 class _Queue(object):
     """
@@ -30,7 +39,7 @@ class _Queue(object):
 
     Queue handles shuffling & repeating.
 
-    Can be populated with :class:`clay.gp.Track` instances.
+    Can be populated with :class:`clay.track.Track` instances.
     """
     def __init__(self):
         self.random = False
@@ -39,14 +48,18 @@ class _Queue(object):
         self.tracks = []
         self._played_tracks = []
         self.current_track_index = None
+        self.station = None
 
-    def load(self, tracks, current_track_index=None):
+    def load(self, tracks, current_track_index=None, station=None):
         """
         Load list of tracks into queue.
 
         *current_track_index* can be either ``None`` or ``int`` (zero-indexed).
+
+        *station* is a :class:`clay.gp.Station` these tracks come from, if any.
         """
         self.tracks = tracks[:]
+        self.station = station
         if (current_track_index is None) and self.tracks:
             current_track_index = 0
         self.current_track_index = current_track_index
@@ -73,7 +86,7 @@ class _Queue(object):
 
     def get_current_track(self):
         """
-        Return current :class:`clay.gp.Track`
+        Return current :class:`clay.track.Track`
         """
         if self.current_track_index is None:
             return None
@@ -199,6 +212,11 @@ class _Player(object):
         self.media_player.set_equalizer(self.equalizer)
         self._create_station_notification = None
         self._is_loading = False
+        self._is_refilling = False
+        # Incremented on each playback request, results of stale requests are dropped.
+        self._play_generation = 0
+        self._play_task = None
+        self._play_lock = Lock()
         self.queue = _Queue()
 
     def enable_xorg_bindings(self):
@@ -267,17 +285,58 @@ class _Player(object):
             self.get_play_progress()
         )
 
-    def load_queue(self, data, current_index=None):
+    def load_queue(self, data, current_index=None, station=None):
         """
         Load queue & start playback.
         Fires :attr:`.queue_changed` event.
 
+        If *station* is given and endless stations are enabled,
+        queue is refilled with more tracks from this station when it runs low.
+
         See :meth:`._Queue.load`.
         """
-        self.queue.load(data, current_index)
+        self.queue.load(data, current_index, station)
         self.queue_changed.fire()
         self._play()
 
+    def _refill_station_queue(self):
+        """
+        Request more station tracks in background if queue is loaded from a station
+        and is about to run out of tracks.
+        """
+        station = self.queue.station
+        if station is None or self._is_refilling or \
+           not settings.get('endless_stations', 'play_settings'):
+            return
+        tracks_left = len(self.queue.tracks) - (self.queue.current_track_index or 0) - 1
+        if tracks_left > STATION_REFILL_THRESHOLD:
+            return
+
+        self._is_refilling = True
+
+        def on_load_more(tracks, error):
+            """
+            Called when more station tracks are fetched.
+            """
+            self._is_refilling = False
+            if error:
+                logger.error('Failed to refill station queue: %s', str(error))
+                return
+            if self.queue.station is not station:
+                return
+            logger.debug('Appending %d tracks from station %s', len(tracks), station.id)
+            for track in tracks:
+                self.append_to_queue(track)
+
+        station.load_more_async(
+            recently_played_ids=[
+                track.store_id
+                for track
+                in self.queue.tracks[-STATION_RECENT_TRACKS:]
+            ],
+            callback=on_load_more
+        )
+
     def append_to_queue(self, track):
         """
         Append track to queue.
@@ -324,7 +383,7 @@ class _Player(object):
             )
             return
 
-        self.load_queue(station.get_tracks())
+        self.load_queue(station.get_tracks(), station=station)
         self._create_station_notification.update('Station ready!')
 
     def get_is_random(self):
@@ -363,13 +422,25 @@ class _Player(object):
         """
         Pick current track from a queue and requests media stream URL.
         Completes in background.
+
+        Cancels previous request if it is still in progress,
+        so only the most recent track reaches libVLC.
         """
         track = self.queue.get_current_track()
         if track is None:
             return
+        with self._play_lock:
+            self._play_generation += 1
+            generation = self._play_generation
+            if self._play_task is not None:
+                self._play_task.cancel()
+                self._play_task = None
         self._is_loading = True
         self.broadcast_state()
         self.track_changed.fire(track)
+        self._refill_station_queue()
+        index = self.queue.current_track_index
+        art_manager.prefetch(self.queue.tracks[index:index + 1 + ART_PREFETCH_COUNT])
 
         if settings.get('download_tracks', 'play_settings') or \
            settings.get_is_file_cached(track.filename):
@@ -377,46 +448,93 @@ class _Player(object):
 
             if path is None:
                 logger.debug('Track %s not in cache, downloading...', track.store_id)
-                track.get_url(callback=self._download_track)
+                task = track.get_url(
+                    callback=lambda url, error, track: self._download_track(
+                        url, error, track, generation
+                    )
+                )
             else:
                 logger.debug('Track %s in cache, playing', track.store_id)
-                self._play_ready(path, None, track)
+                self._play_ready(path, None, track, generation)
+                return
         else:
             logger.debug('Starting to stream %s', track.store_id)
-            track.get_url(callback=self._play_ready)
-
-    def _download_track(self, url, error, track):
-        if error:
-            notification_area.notify('Failed to request media URL: {}'.format(str(error)))
-            logger.error(
-                'Failed to request media URL for track %s: %s',
-                track.original_data,
-                str(error)
+            task = track.get_url(
+                callback=lambda url, error, track: self._play_ready(
+                    url, error, track, generation
+                )
             )
-            return
-        response = urlopen(url)
-        path = settings.save_file_to_cache(track.filename, response.read())
-        self._play_ready(path, None, track)
 
-    def _play_ready(self, url, error, track):
+        with self._play_lock:
+            if generation == self._play_generation:
+                self._play_task = task
+
+    def _is_stale(self, generation):
+        """
+        Return ``True`` if playback request with given *generation*
+        was superseded by a newer one.
+        """
+        return generation != self._play_generation
+
+    def _download_track(self, url, error, track, generation):
         """
         Called once track's media stream URL request completes.
-        If *error* is ``None``, tell libVLC to play media by *url*.
+        If *error* is ``None``, download track into cache & play it.
+
+        Download is abandoned once another track is requested.
         """
-        self._is_loading = False
+        if self._is_stale(generation):
+            logger.debug('Dropping stale download of track %s', track.store_id)
+            return
         if error:
-            notification_area.notify('Failed to request media URL: {}'.format(str(error)))
-            logger.error(
-                'Failed to request media URL for track %s: %s',
-                track.original_data,
-                str(error)
-            )
+            self._play_ready(None, error, track, generation)
+            return
+        try:
+            response = http_client.get(url, stream=True)
+        except Exception as download_error:  # pylint: disable=broad-except
+            self._play_ready(None, download_error, track, generation)
             return
-        assert track
-        media = vlc.Media(url)
-        self.media_player.set_media(media)
+        chunks = []
+        try:
+            for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                if self._is_stale(generation):
+                    logger.debug('Abandoning download of track %s', track.store_id)
+                    return
+                chunks.append(chunk)
+        except (RequestException, IOError) as download_error:
+            self._play_ready(None, download_error, track, generation)
+            return
+        finally:
+            response.close()
+        path = settings.save_file_to_cache(track.filename, b''.join(chunks))
+        self._play_ready(path, None, track, generation)
 
-        self.media_player.play()
+    def _play_ready(self, url, error, track, generation):
+        """
+        Called once track's media stream URL request completes.
+        If *error* is ``None``, tell libVLC to play media by *url*.
+
+        Does nothing if request with given *generation* is stale.
+        """
+        with self._play_lock:
+            if self._is_stale(generation):
+                logger.debug('Dropping stale media URL of track %s', track.store_id)
+                return
+            self._play_task = None
+            self._is_loading = False
+            if error:
+                notification_area.notify('Failed to request media URL: {}'.format(str(error)))
+                logger.error(
+                    'Failed to request media URL for track %s: %s',
+                    track.original_data,
+                    str(error)
+                )
+                return
+            assert track
+            media = vlc.Media(url)
+            self.media_player.set_media(media)
+
+            self.media_player.play()
 
         osd_manager.notify(track)
 
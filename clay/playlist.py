@@ -0,0 +1,229 @@
+"""
+Playlist models.
+"""
+from operator import attrgetter
+from threading import Lock
+
+from clay.concurrency import asynchronous
+from clay.library import SortedTrackSet, compact_playlist_entry
+from clay.track import Track
+
+
+class PlaylistEntry(object):
+    """
+    Entry of a :class:`.Playlist`: ID of the entry & a shared :class:`.Track` instance.
+    """
+    __slots__ = ('id', 'track')
+
+    def __init__(self, entry_id, track):
+        self.id = entry_id  # pylint: disable=invalid-name
+        self.track = track
+
+
+class Playlist(object):
+    """
+    Model that represents remotely stored (Google Play Music) playlist.
+
+    Playlist keeps raw entries and turns them into :class:`.PlaylistEntry` records
+    only when its tracks are requested for the first time.
+    """
+    def __init__(self, playlist_id, name, entries):
+        self._id = playlist_id
+        self.name = name
+        self._entries_data = entries
+        self._entries = None
+        self._lock = Lock()
+
+    @property
+    def id(self):  # pylint: disable=invalid-name
+        """
+        Playlist ID.
+        """
+        return self._id
+
+    @property
+    def track_count(self):
+        """
+        Number of tracks in this playlist.
+        Does not require tracks to be loaded.
+        """
+        if self._entries is not None:
+            return len(self._entries)
+        return len(self._entries_data)
+
+    @property
+    def entries(self):
+        """
+        List of :class:`.PlaylistEntry` records, created from raw entries on first access.
+
+        Entries that refer to library tracks are resolved against cached library,
+        so library should be loaded first (see :meth:`.load_tracks`).
+        Entries are memoized only once library is loaded, until library changes
+        (see :meth:`.invalidate_entries`); memoized entries are indexed by their IDs
+        (see :meth:`clay.gp._GP.get_track_by_id`).
+        """
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from clay.gp import gp
+        with self._lock:
+            if self._entries is not None:
+                return self._entries
+            entries = []
+            for data in self._entries_data:
+                track = Track.from_data(data, Track.SOURCE_PLAYLIST)
+                if track is not None:
+                    entries.append(PlaylistEntry(data.get('id'), track))
+            if gp.cached_tracks is not None:
+                self._entries = entries
+                gp.index_playlist_entries(entries)
+            return entries
+
+    def invalidate_entries(self):
+        """
+        Forget memoized entries, so that they are resolved against library again.
+        """
+        with self._lock:
+            self._entries = None
+
+    @property
+    def liked_entries_data(self):
+        """
+        List of raw entries of liked tracks that are not library references.
+        """
+        return [
+            entry for entry in self._entries_data
+            if int(entry.get('track', {}).get('rating', 0)) == 5
+        ]
+
+    @property
+    def tracks(self):
+        """
+        List of :class:`.Track` instances in this playlist.
+        """
+        return [entry.track for entry in self.entries]
+
+    def load_tracks(self):
+        """
+        Wait for library to load & create tracks of this playlist.
+        """
+        # pylint: disable=import-outside-toplevel,cyclic-import
+        from clay.gp import gp
+        gp.get_all_tracks()
+        return self.tracks
+
+    load_tracks_async = asynchronous(load_tracks)
+
+    def get_tracks(self):
+        """
+        Return a list of tracks in this playlist.
+        """
+        return self.tracks
+
+    @classmethod
+    def from_data(cls, data, many=False):
+        """
+        Construct and return one or many :class:`.Playlist` instances
+        from Google Play Music API response.
+        """
+        if many:
+            return [cls.from_data(one) for one in data]
+
+        return Playlist(
+            playlist_id=data['id'],
+            name=data['name'],
+            entries=[compact_playlist_entry(entry) for entry in data['tracks']]
+        )
+
+    def to_data(self):
+        """
+        Return a compact API-like representation of this playlist.
+        """
+        return dict(id=self.id, name=self.name, tracks=self._entries_data)
+
+
+class LikedSongs(object):
+    """
+    A local model that represents the songs that a user liked and displays them as a faux playlist.
+
+    This mirrors the "liked songs" generated playlist feature of the Google Play Music apps.
+
+    Songs are de-duplicated by store ID and ordered by rating time, most recent first.
+
+    Liked playlist entries (see :meth:`.add_entries`) are turned into tracks
+    only when liked tracks are requested.
+    """
+    def __init__(self):
+        self._id = None  # pylint: disable=invalid-name
+        self.name = "Liked Songs"
+        self._tracks = SortedTrackSet(
+            attrgetter('store_id'),
+            lambda track: -int(track.rating_timestamp or 0)
+        )
+        # Store ID -> raw playlist entry of a liked track.
+        self._pending_entries = {}
+        self._lock = Lock()
+
+    def add_entries(self, entries):
+        """
+        Add raw playlist entries of liked tracks (see :attr:`.Playlist.liked_entries_data`).
+        """
+        with self._lock:
+            for entry in entries:
+                self._pending_entries[entry['track']['storeId']] = entry
+
+    def _create_pending_tracks(self):
+        """
+        Create tracks of pending playlist entries.
+        Liked tracks are added into this list once they are interned.
+        """
+        with self._lock:
+            entries = list(self._pending_entries.values())
+            self._pending_entries.clear()
+        if entries:
+            Track.from_data(entries, Track.SOURCE_PLAYLIST, many=True)
+
+    @property
+    def tracks(self):
+        """
+        Get a sorted list of liked tracks.
+        """
+        self._create_pending_tracks()
+        return self._tracks.tracks
+
+    @property
+    def track_count(self):
+        """
+        Number of liked tracks, including pending playlist entries.
+        """
+        with self._lock:
+            pending_count = sum(
+                1 for store_id in self._pending_entries
+                if not self._tracks.contains_key(store_id)
+            )
+        return len(self._tracks) + pending_count
+
+    def load_tracks(self):
+        """
+        Return a sorted list of liked tracks.
+        Liked tracks are always loaded, this method exists for parity with :class:`.Playlist`.
+        """
+        return self.tracks
+
+    load_tracks_async = asynchronous(load_tracks)
+
+    def get_tracks(self):
+        """
+        Return a sorted list of liked tracks.
+        """
+        return self.tracks
+
+    def add_liked_song(self, song):
+        """
+        Add a liked song to the list.
+        """
+        self._tracks.add(song)
+
+    def remove_liked_song(self, song):
+        """
+        Remove a liked song from the list
+        """
+        self._tracks.discard(song)
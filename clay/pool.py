@@ -0,0 +1,208 @@
+"""
+Shared worker pool for background jobs.
+"""
+# pylint: disable=broad-except
+from collections import deque
+from heapq import heappush, heappop
+from itertools import count
+from threading import Thread, Condition
+import time
+
+from clay.log import logger
+from clay.settings import settings
+
+PRIORITY_PLAYBACK = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BACKGROUND = 2
+
+
+class _Task(object):
+    """
+    Single job queued in :class:`._WorkerPool`.
+    """
+    def __init__(self, func, args, kwargs, priority):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.submitted_at = time.time()
+        self.cancelled = False
+
+    def cancel(self):
+        """
+        Prevent this task from running if it has not been started yet.
+        """
+        self.cancelled = True
+
+    def run(self):
+        """
+        Execute wrapped function.
+        """
+        self.func(*self.args, **self.kwargs)
+
+    def __str__(self):
+        return u'<Task {} (priority {})>'.format(
+            getattr(self.func, '__name__', self.func),
+            self.priority
+        )
+
+    __repr__ = __str__
+
+
+class _WorkerPool(object):
+    """
+    Executor with a bounded number of threads and priority lanes.
+
+    Tasks with lower priority values are picked first, tasks
+    with equal priorities are picked in submission order.
+    A number of workers is reserved for :data:`PRIORITY_PLAYBACK` tasks,
+    so stream URL requests never wait behind metadata & art jobs.
+
+    Singleton.
+    """
+    SATURATION_LOG_INTERVAL = 5
+    WAIT_SAMPLES = 100
+
+    def __init__(self, size, reserved=1):
+        self.size = max(size, reserved + 1)
+        self.reserved = reserved
+
+        self._queue = []
+        self._counter = count()
+        self._condition = Condition()
+        self._workers = []
+        self._busy = 0
+        self._waits = deque(maxlen=_WorkerPool.WAIT_SAMPLES)
+        self._last_saturation_log = 0
+
+    def submit(self, func, args=(), kwargs=None, priority=PRIORITY_INTERACTIVE):
+        """
+        Queue *func* for execution with *args* & *kwargs*.
+
+        Returns :class:`._Task` instance that can be cancelled.
+        """
+        task = self.create_task(func, args, kwargs, priority)
+        self.enqueue(task)
+        return task
+
+    @staticmethod
+    def create_task(func, args=(), kwargs=None, priority=PRIORITY_INTERACTIVE):
+        """
+        Return :class:`._Task` instance that is not queued yet.
+        It can be cancelled before it is queued with :meth:`.enqueue`.
+        """
+        return _Task(func, args, kwargs or {}, priority)
+
+    def enqueue(self, task):
+        """
+        Queue task that was created with :meth:`.create_task`.
+        """
+        task.submitted_at = time.time()
+        with self._condition:
+            self._ensure_workers()
+            heappush(self._queue, (task.priority, next(self._counter), task))
+            self._condition.notify_all()
+            self._check_saturation()
+
+    def _ensure_workers(self):
+        """
+        Start worker threads if they are not running yet.
+        """
+        while len(self._workers) < self.size:
+            thread = Thread(
+                target=self._work,
+                name='clay-worker-{}'.format(len(self._workers))
+            )
+            thread.daemon = True
+            thread.start()
+            self._workers.append(thread)
+
+    def _take(self):
+        """
+        Pop next runnable task from queue or return ``None``.
+
+        Must be called with condition acquired.
+        """
+        while self._queue:
+            _, _, task = self._queue[0]
+            if task.cancelled:
+                heappop(self._queue)
+                continue
+            if task.priority > PRIORITY_PLAYBACK and \
+               self._busy >= self.size - self.reserved:
+                return None
+            heappop(self._queue)
+            return task
+        return None
+
+    def _work(self):
+        """
+        Worker thread body.
+        """
+        while True:
+            with self._condition:
+                task = self._take()
+                while task is None:
+                    self._condition.wait()
+                    task = self._take()
+                self._busy += 1
+                self._waits.append(time.time() - task.submitted_at)
+
+            try:
+                task.run()
+            except Exception as error:
+                logger.error('Task %s failed: %s', task, repr(error))
+            finally:
+                with self._condition:
+                    self._busy -= 1
+                    self._condition.notify_all()
+
+    def _check_saturation(self):
+        """
+        Log a warning if all workers are busy and tasks keep piling up.
+
+        Must be called with condition acquired.
+        """
+        if len(self._queue) < self.size or self._busy < self.size - self.reserved:
+            return
+        now = time.time()
+        if now - self._last_saturation_log < _WorkerPool.SATURATION_LOG_INTERVAL:
+            return
+        self._last_saturation_log = now
+        stats = self._get_stats()
+        logger.warning(
+            'Worker pool is saturated: %d queued, %d/%d busy, avg wait %.3fs, max wait %.3fs',
+            stats['queued'], stats['busy'], stats['workers'],
+            stats['avg_wait'], stats['max_wait']
+        )
+
+    def _get_stats(self):
+        """
+        Collect stats. Must be called with condition acquired.
+        """
+        lanes = {}
+        for priority, _, task in self._queue:
+            if not task.cancelled:
+                lanes[priority] = lanes.get(priority, 0) + 1
+        waits = list(self._waits)
+        return dict(
+            workers=self.size,
+            busy=self._busy,
+            queued=sum(lanes.values()),
+            lanes=lanes,
+            avg_wait=(sum(waits) / len(waits)) if waits else 0.0,
+            max_wait=max(waits) if waits else 0.0
+        )
+
+    def get_stats(self):
+        """
+        Return a dict with pool size, busy worker count, queue depth (total & per priority)
+        and average & maximum wait time (in seconds) of recently started tasks.
+        """
+        with self._condition:
+            return self._get_stats()
+
+
+worker_pool = _WorkerPool(  # pylint: disable=invalid-name
+    settings.get('worker_threads', 'clay_settings') or 6
+)
@@ -0,0 +1,264 @@
+"""
+Recording & replaying of Google Play Music API calls.
+
+Set ``CLAY_RECORD`` environment variable to a file path to append every
+protocol call & its response to that file (one JSON object per line).
+
+Set ``CLAY_REPLAY`` environment variable to a recorded file to use
+:class:`.ReplayClient` instead of :class:`gmusicapi.Mobileclient`,
+so the app can run without network. Replay is tuned with:
+
+- ``CLAY_REPLAY_LATENCY`` - synthetic latency of each call in seconds (default: 0)
+- ``CLAY_REPLAY_MEDIA`` - audio file all stream URLs point to (default: a second of silence)
+- ``CLAY_REPLAY_LOOPBACK`` - set to ``0`` to use ``file://`` stream URLs
+  instead of serving media from a loopback HTTP server
+"""
+# pylint: disable=too-few-public-methods
+try:  # Python 3.x
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:  # Python 2.x
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+from threading import Lock, Thread
+import json
+import os
+import struct
+import tempfile
+import time
+import wave
+
+from gmusicapi.clients import Mobileclient
+from gmusicapi.exceptions import CallFailure
+
+from clay.log import logger
+
+# Responses served for protocols that are missing from recording.
+DEFAULT_RESPONSES = {
+    'Config': {'data': {'entries': [{'key': 'isNautilusUser', 'value': 'true'}]}},
+}
+
+
+def _get_call_key(name, args, kwargs):
+    """
+    Return a string that identifies protocol call with given arguments.
+    """
+    return json.dumps([name, args, kwargs], sort_keys=True, default=str)
+
+
+class CallRecorder(object):
+    """
+    Writes protocol calls & their responses into a file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        Return recorder that writes into file from ``CLAY_RECORD``
+        environment variable, ``None`` if it is not set.
+        """
+        path = os.getenv('CLAY_RECORD')
+        if not path:
+            return None
+        logger.info('Recording API calls into %s', path)
+        return cls(path)
+
+    def wrap_call(self, make_call):
+        """
+        Return a function that calls *make_call* (protocol, *args, **kwargs)
+        and records its response.
+        """
+        def recorded_call(protocol, *args, **kwargs):
+            """
+            Wrapper function.
+            """
+            response = make_call(protocol, *args, **kwargs)
+            self.record(protocol.__name__, args, kwargs, response)
+            return response
+        return recorded_call
+
+    def record(self, name, args, kwargs, response):
+        """
+        Write a single call into file.
+        """
+        line = json.dumps(
+            dict(protocol=name, args=args, kwargs=kwargs, response=response),
+            default=str
+        )
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+
+
+def _create_silence():
+    """
+    Write a second of silence into a temporary WAV file and return its path.
+    """
+    handle, path = tempfile.mkstemp(prefix='clay-silence-', suffix='.wav')
+    os.close(handle)
+    silence = wave.open(path, 'wb')
+    try:
+        silence.setnchannels(1)
+        silence.setsampwidth(2)
+        silence.setframerate(8000)
+        silence.writeframes(struct.pack('<h', 0) * 8000)
+    finally:
+        silence.close()
+    return path
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    HTTP server that handles each connection in a separate thread.
+    """
+    daemon_threads = True
+
+
+class _MediaServer(object):
+    """
+    Loopback HTTP server that serves the same media file for any path.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as media_file:
+            content = media_file.read()
+
+        class _Handler(BaseHTTPRequestHandler):
+            """
+            Request handler.
+            """
+            # Keep connections alive like real media servers do.
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):  # pylint: disable=invalid-name
+                """
+                Respond with media file.
+                """
+                self.send_response(200)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, *_):
+                """
+                Keep stderr clean.
+                """
+
+        self._server = _ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        thread = Thread(target=self._server.serve_forever, name='clay-replay-media')
+        thread.daemon = True
+        thread.start()
+
+    def get_url(self, name):
+        """
+        Return URL of media.
+        """
+        return 'http://127.0.0.1:{}/{}'.format(self._server.server_address[1], name)
+
+
+class ReplayClient(Mobileclient):
+    """
+    Stand-in for :class:`gmusicapi.Mobileclient` that serves responses
+    recorded by :class:`.CallRecorder` instead of calling the server.
+
+    Calls are matched by protocol & arguments, repeated calls get responses
+    in order they were recorded. If there is no exact match, responses recorded
+    for the same protocol are served in a round-robin fashion.
+    """
+    def __init__(self, path, latency=0.0, media_path=None, use_loopback=True):
+        super(ReplayClient, self).__init__(debug_logging=False, validate=False)
+        self.android_id = None
+        self.latency = latency
+        self.media_path = media_path or _create_silence()
+        self._media_server = _MediaServer(self.media_path) if use_loopback else None
+
+        self._responses = {}
+        self._protocol_responses = {}
+        self._positions = {}
+        self._lock = Lock()
+        with open(path, 'r') as recording:
+            for line in recording:
+                if not line.strip():
+                    continue
+                call = json.loads(line)
+                response = json.dumps(call['response'])
+                key = _get_call_key(call['protocol'], call['args'], call['kwargs'])
+                self._responses.setdefault(key, []).append(response)
+                self._protocol_responses.setdefault(call['protocol'], []).append(response)
+        logger.info('Replaying %d API calls from %s', len(self._responses), path)
+
+    @classmethod
+    def from_env(cls):
+        """
+        Return replay client configured with environment variables,
+        ``None`` if ``CLAY_REPLAY`` is not set.
+        """
+        path = os.getenv('CLAY_REPLAY')
+        if not path:
+            return None
+        return cls(
+            path,
+            latency=float(os.getenv('CLAY_REPLAY_LATENCY') or 0),
+            media_path=os.getenv('CLAY_REPLAY_MEDIA'),
+            use_loopback=os.getenv('CLAY_REPLAY_LOOPBACK') != '0'
+        )
+
+    def _pick(self, key, responses, cycle=False):
+        """
+        Return next response from *responses* (tracked by *key*).
+        Once responses are exhausted, they start over if *cycle* is ``True``,
+        otherwise the last one repeats. Must be called with lock acquired.
+        """
+        position = self._positions.get(key, 0)
+        self._positions[key] = position + 1
+        if cycle:
+            return responses[position % len(responses)]
+        return responses[min(position, len(responses) - 1)]
+
+    def _make_call(self, protocol, *args, **kwargs):
+        """
+        Return recorded response of protocol call.
+        """
+        if self.latency:
+            time.sleep(self.latency)
+        name = protocol.__name__
+        key = _get_call_key(name, args, kwargs)
+        with self._lock:
+            if key in self._responses:
+                return json.loads(self._pick(key, self._responses[key]))
+            if name in self._protocol_responses:
+                return json.loads(self._pick(name, self._protocol_responses[name], True))
+        if name in DEFAULT_RESPONSES:
+            return json.loads(json.dumps(DEFAULT_RESPONSES[name]))
+        raise CallFailure('No recorded response', name)
+
+    def login(self, email, password, android_id, *_, **__):
+        """
+        Pretend to log in.
+        """
+        # pylint: disable=unused-argument
+        self.android_id = android_id
+        self.session.is_authenticated = True
+        return True
+
+    def get_stream_url(self, song_id, device_id=None, quality='hi'):
+        """
+        Return URL of replay media that expires in a minute.
+        """
+        # pylint: disable=unused-argument
+        if self.latency:
+            time.sleep(self.latency)
+        if self._media_server is None:
+            return 'file://' + os.path.abspath(self.media_path)
+        return self._media_server.get_url('{}?expire={}'.format(song_id, int(time.time()) + 60))
+
+
+def create_client():
+    """
+    Return :class:`.ReplayClient` if ``CLAY_REPLAY`` environment variable is set,
+    :class:`gmusicapi.Mobileclient` otherwise.
+    """
+    return ReplayClient.from_env() or Mobileclient()
@@ -0,0 +1,137 @@
+"""
+Inverted index for local search over library tracks.
+"""
+from bisect import bisect_left
+from threading import Lock
+import re
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    """
+    Split text into a list of lowercase words.
+    """
+    return _TOKEN_RE.findall(text.lower()) if text else []
+
+
+class SearchIndex(object):
+    """
+    Inverted index that maps words of track titles, artist & album names
+    to track keys (library IDs).
+
+    Query words are matched as prefixes, all of them must match.
+    """
+    def __init__(self):
+        self._postings = {}
+        self._tokens = {}
+        self._sorted_tokens = None
+        self._lock = Lock()
+
+    def add(self, key, tokens):
+        """
+        Index *key* by *tokens*.
+        """
+        with self._lock:
+            self._remove(key)
+            tokens = set(tokens)
+            self._tokens[key] = tokens
+            for token in tokens:
+                if token not in self._postings:
+                    self._postings[token] = set()
+                    self._sorted_tokens = None
+                self._postings[token].add(key)
+
+    def add_track(self, track):
+        """
+        Index library track by its title, artist & album name.
+        """
+        key = track.ids[0]
+        if key is not None:
+            self.add(key, tokenize(track.title) + tokenize(track.artist) +
+                     tokenize(track.album_name))
+
+    def remove(self, key):
+        """
+        Remove *key* from index.
+        """
+        with self._lock:
+            self._remove(key)
+
+    def remove_track(self, track):
+        """
+        Remove library track from index.
+        """
+        self.remove(track.ids[0])
+
+    def _remove(self, key):
+        """
+        Remove *key* from index. Must be called with lock acquired.
+        """
+        for token in self._tokens.pop(key, ()):
+            keys = self._postings[token]
+            keys.discard(key)
+            if not keys:
+                del self._postings[token]
+                self._sorted_tokens = None
+
+    def _match_prefix(self, prefix):
+        """
+        Return a set of keys indexed by tokens that start with *prefix*.
+        Must be called with lock acquired.
+        """
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        keys = set()
+        index = bisect_left(self._sorted_tokens, prefix)
+        while index < len(self._sorted_tokens) and \
+                self._sorted_tokens[index].startswith(prefix):
+            keys.update(self._postings[self._sorted_tokens[index]])
+            index += 1
+        return keys
+
+    def search(self, query):
+        """
+        Return a set of keys that match all words of *query*.
+        """
+        words = tokenize(query)
+        if not words:
+            return set()
+        with self._lock:
+            keys = None
+            for word in sorted(words, key=len, reverse=True):
+                matches = self._match_prefix(word)
+                keys = matches if keys is None else keys & matches
+                if not keys:
+                    break
+            return keys
+
+    def to_records(self):
+        """
+        Return a list of records (key followed by tokens) for persisting.
+        """
+        with self._lock:
+            return [[key] + sorted(tokens) for key, tokens in self._tokens.items()]
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        Construct index from records returned by :meth:`.to_records`.
+        """
+        index = cls()
+        for record in records:
+            index.add(record[0], record[1:])
+        return index
+
+    @classmethod
+    def from_tracks(cls, tracks):
+        """
+        Construct index from library tracks.
+        """
+        index = cls()
+        for track in tracks:
+            index.add_track(track)
+        return index
+
+    def __len__(self):
+        return len(self._tokens)
@@ -5,11 +5,26 @@ from threading import Lock
 import os
 import copy
 import errno
+import tempfile
 import yaml
 import appdirs
 import pkg_resources
 
 
+def _replace_file(source, destination):
+    """
+    Rename *source* to *destination*, replacing it if it exists.
+    """
+    try:
+        os.rename(source, destination)
+    except OSError:
+        # Windows does not rename files over existing ones.
+        if not os.path.exists(destination):
+            raise
+        os.remove(destination)
+        os.rename(source, destination)
+
+
 class _SettingsEditor(dict):
     """
     Thread-safe settings editor context manager.
@@ -117,14 +132,15 @@ class _Settings(object):
         """
         Return their configuration key in a specified section
         By default it looks in play_settings.
-        """
-        section = self.get_section(*sections)
 
-        try:
-            return section.get(key)
-        except (KeyError, TypeError):
-            section = self.get_default_config_section(*sections)
-            return section.get(key)
+        Keys that are missing from user configuration are read from the default one.
+        """
+        for get_section in (self.get_section, self.get_default_config_section):
+            try:
+                return get_section(*sections)[key]
+            except (KeyError, TypeError):
+                pass
+        return None
 
     def _get_section(self, config, *sections):
         config = config.copy()
@@ -189,10 +205,42 @@ class _Settings(object):
         Save content into file in cache.
         """
         path = os.path.join(self._cache_dir, filename)
-        with open(path, 'wb') as cachefile:
-            cachefile.write(content)
+        # Write to a unique temporary file first so that readers never see partially
+        # written files and concurrent writers of the same file do not interleave.
+        handle, temp_path = tempfile.mkstemp(
+            prefix='.' + filename + '.', suffix='.part', dir=self._cache_dir
+        )
+        try:
+            with os.fdopen(handle, 'wb') as cachefile:
+                cachefile.write(content)
+            _replace_file(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
         self._cached_files.add(filename)
         return path
 
+    def remove_file_from_cache(self, filename):
+        """
+        Remove file from cache (if it exists).
+        """
+        self._cached_files.discard(filename)
+        try:
+            os.remove(os.path.join(self._cache_dir, filename))
+        except OSError as error:
+            if error.errno != errno.ENOENT:
+                raise
+
+    def get_cached_filenames(self, prefix=''):
+        """
+        Return a list of names of cached files that start with *prefix*.
+        """
+        return [
+            filename
+            for filename
+            in list(self._cached_files)
+            if filename.startswith(prefix)
+        ]
+
 
 settings = _Settings()  # pylint: disable=invalid-name
@@ -0,0 +1,161 @@
+"""
+Compact on-disk snapshots of library data.
+
+Snapshot is a single file that consists of named sections,
+each section holds a list of JSON records.
+All integers are unsigned 64-bit little-endian values::
+
+    header:   magic (8 bytes), version, section count
+    table:    section name (16 bytes, NUL-padded), section offset, record count
+    sections: (record count + 1) record offsets, UTF-8 encoded JSON records
+
+Snapshots are memory-mapped when read, so records are decoded
+only when they are accessed (e.g. chunk by chunk, see :meth:`._SnapshotSection.iter_chunks`).
+"""
+import json
+import mmap
+import struct
+
+MAGIC = b'CLAYSNAP'
+VERSION = 1
+
+_HEADER = struct.Struct('<8sQQ')
+_SECTION = struct.Struct('<16sQQ')
+_OFFSET = struct.Struct('<Q')
+
+
+def _pack_offsets(offsets):
+    """
+    Pack a list of offsets into bytes.
+    """
+    return struct.pack('<{}Q'.format(len(offsets)), *offsets)
+
+
+def _encode_section(records):
+    """
+    Encode a list of records (or a :class:`._SnapshotSection`) into section bytes.
+    Return a tuple of record count and section data.
+    """
+    if isinstance(records, _SnapshotSection):
+        encoded = list(records.iter_raw())
+    else:
+        encoded = [
+            json.dumps(record, separators=(',', ':')).encode('utf-8')
+            for record
+            in records
+        ]
+    offsets = [0]
+    for record in encoded:
+        offsets.append(offsets[-1] + len(record))
+    return len(encoded), _pack_offsets(offsets) + b''.join(encoded)
+
+
+def dump_snapshot(sections):
+    """
+    Serialize *sections* into snapshot bytes.
+
+    *sections* is a dict where keys are section names
+    and values are lists of JSON-serializable records.
+    Sections of another :class:`.Snapshot` can be passed as values too,
+    their records will be copied without decoding.
+    """
+    names = sorted(sections)
+    encoded = [_encode_section(sections[name]) for name in names]
+
+    position = _HEADER.size + _SECTION.size * len(names)
+    chunks = [_HEADER.pack(MAGIC, VERSION, len(names))]
+    for name, (count, data) in zip(names, encoded):
+        chunks.append(_SECTION.pack(name.encode('ascii'), position, count))
+        position += len(data)
+    chunks.extend(data for _, data in encoded)
+    return b''.join(chunks)
+
+
+class _SnapshotSection(object):
+    """
+    Lazy read-only sequence of records stored in a snapshot section.
+
+    Records are decoded on access.
+    """
+    def __init__(self, buf, offset, count):
+        self._buf = buf
+        self._count = count
+        self._offsets_at = offset
+        self._data_at = offset + _OFFSET.size * (count + 1)
+
+    def __len__(self):
+        return self._count
+
+    def _get_raw(self, index):
+        """
+        Return encoded record by index.
+        """
+        start, end = struct.unpack_from('<2Q', self._buf, self._offsets_at + _OFFSET.size * index)
+        return self._buf[self._data_at + start:self._data_at + end]
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('Snapshot record index out of range')
+        return json.loads(self._get_raw(index).decode('utf-8'))
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def iter_chunks(self, size):
+        """
+        Yield lists of up to *size* decoded records.
+        Each chunk is decoded only when it is requested.
+        """
+        for start in range(0, self._count, size):
+            yield [self[index] for index in range(start, min(start + size, self._count))]
+
+    def iter_raw(self):
+        """
+        Yield encoded records without decoding them.
+        """
+        for index in range(self._count):
+            yield self._get_raw(index)
+
+
+class Snapshot(object):
+    """
+    Memory-mapped snapshot reader.
+
+    Raises ``ValueError`` if file is not a valid snapshot.
+    """
+    def __init__(self, path):
+        with open(path, 'rb') as snapshot_file:
+            self._buf = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._buf) < _HEADER.size:
+            raise ValueError('Snapshot is truncated')
+        magic, version, section_count = _HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('Unsupported snapshot format')
+
+        self._sections = {}
+        for index in range(section_count):
+            name, offset, count = _SECTION.unpack_from(
+                self._buf, _HEADER.size + _SECTION.size * index
+            )
+            self._sections[name.rstrip(b'\0').decode('ascii')] = _SnapshotSection(
+                self._buf, offset, count
+            )
+
+    def get_section(self, name):
+        """
+        Return section by name as a lazy sequence of records, ``None`` if it is missing.
+        """
+        return self._sections.get(name)
+
+    def get_meta(self):
+        """
+        Return snapshot metadata (the first record of "meta" section) or an empty dict.
+        """
+        meta = self.get_section('meta')
+        if not meta:
+            return {}
+        return meta[0]
@@ -133,6 +133,7 @@ class SongListItem(urwid.Pile):
         """
         Update text of this item from the attached track.
         """
+        self.rating = self.RATING_ICONS[self.track.rating]
         self.line1_left.set_text(
             u'{index:3d} {icon} {title} [{minutes:02d}:{seconds:02d}]'.format(
                 index=self.index + 1,
@@ -188,12 +189,14 @@ class SongListItem(urwid.Pile):
         Thumb the currently selected song up.
         """
         self.track.rate_song((0 if self.track.rating == 5 else 5))
+        self.update_text()
 
     def thumbs_down(self):
         """
         Thumb the currently selected song down.
         """
         self.track.rate_song((0 if self.track.rating == 1 else 1))
+        self.update_text()
 
     def _send_signal(self, signal):
         urwid.emit_signal(self, signal, self)
@@ -346,7 +349,7 @@ class SongListBoxPopup(urwid.LineBox):
                 ))
             else:
                 notification_area.notify('Track added to library!')
-        self.songitem.track.add_to_my_library_async(callback=on_add_to_my_library)
+        self.songitem.track.add_to_my_library(callback=on_add_to_my_library)
         self.close()
 
     def remove_from_my_library(self, _):
@@ -363,7 +366,7 @@ class SongListBoxPopup(urwid.LineBox):
                 ))
             else:
                 notification_area.notify('Track removed from library!')
-        self.songitem.track.remove_from_my_library_async(callback=on_remove_from_my_library)
+        self.songitem.track.remove_from_my_library(callback=on_remove_from_my_library)
         self.close()
 
     def append_to_queue(self, _):
@@ -412,6 +415,7 @@ class SongListBox(urwid.Frame):
 
         self.current_item = None
         self.tracks = []
+        self.station = None
         self.walker = urwid.SimpleFocusListWalker([])
 
         player.track_changed += self.track_changed
@@ -548,7 +552,7 @@ class SongListBox(urwid.Frame):
         if songitem.is_currently_played:
             player.play_pause()
         else:
-            player.load_queue(self.tracks, songitem.index)
+            player.load_queue(self.tracks, songitem.index, self.station)
 
     @staticmethod
     def item_append_requested(songitem):
@@ -636,11 +640,14 @@ class SongListBox(urwid.Frame):
                 )
         self.app.redraw()
 
-    def populate(self, tracks):
+    def populate(self, tracks, station=None):
         """
         Display a list of :class:`clay.player.Track` instances in this song list.
+
+        *station* is a :class:`clay.gp.Station` these tracks come from, if any.
         """
         self.tracks = tracks
+        self.station = station
         self.walker[:], current_index = self.tracks_to_songlist(self.tracks)
         self.update_indexes()
         if current_index is not None:
@@ -648,6 +655,43 @@ class SongListBox(urwid.Frame):
         elif len(self.walker) >= 1:
             self.walker.set_focus(0)
 
+    def merge_tracks(self, tracks, key):
+        """
+        Merge a list of :class:`clay.player.Track` instances sorted by *key*
+        into this song list (which must be sorted by *key* as well).
+
+        Existing song items are kept, focus stays on the same item.
+        """
+        focus, _ = self.walker.get_focus()
+        old_items = [item for item in self.walker if isinstance(item, SongListItem)]
+        new_items, _ = self.tracks_to_songlist(tracks)
+        merged = []
+        first_new_index = None
+        old_index = new_index = 0
+        while old_index < len(old_items) and new_index < len(new_items):
+            if key(new_items[new_index].track) < key(old_items[old_index].track):
+                if first_new_index is None:
+                    first_new_index = len(merged)
+                merged.append(new_items[new_index])
+                new_index += 1
+            else:
+                merged.append(old_items[old_index])
+                old_index += 1
+        if first_new_index is None:
+            first_new_index = len(merged)
+        merged.extend(old_items[old_index:])
+        merged.extend(new_items[new_index:])
+
+        self.tracks = [item.track for item in merged]
+        self.walker[:] = merged
+        # Items before the first inserted one keep their indexes.
+        for index in range(first_new_index, len(merged)):
+            merged[index].set_index(index)
+        if isinstance(focus, SongListItem):
+            self.walker.set_focus(focus.index)
+        elif merged:
+            self.walker.set_focus(0)
+
     def append_track(self, track):
         """
         Convert a track into :class:`.SongListItem` instance and appends it into this song list.
@@ -656,21 +700,63 @@ class SongListBox(urwid.Frame):
         self.walker.append(tracks[0])
         self.update_indexes()
 
+    def insert_track(self, index, track):
+        """
+        Convert a track into :class:`.SongListItem` instance and insert it
+        into this song list at *index*.
+
+        If placeholder is shown, track is only inserted into :attr:`.tracks`.
+        """
+        self.tracks.insert(index, track)
+        if self.is_placeholder_shown:
+            return
+        items, _ = self.tracks_to_songlist([track])
+        self.walker.insert(index, items[0])
+        self.update_indexes(index)
+
+    def insert_sorted_track(self, track, key):
+        """
+        Insert a track into this song list (which must be sorted by *key*)
+        after items with the same key.
+        """
+        value = key(track)
+        low, high = 0, len(self.tracks)
+        while low < high:
+            middle = (low + high) // 2
+            if value < key(self.tracks[middle]):
+                high = middle
+            else:
+                low = middle + 1
+        self.insert_track(low, track)
+
     def remove_track(self, track):
         """
         Remove a song item that matches *track* from this song list (if found).
         """
-        for songlistitem in self.walker:
+        if self.is_placeholder_shown:
+            return
+        for index, songlistitem in enumerate(self.walker):
             if songlistitem.track == track:
-                self.walker.remove(songlistitem)
-        self.update_indexes()
+                del self.walker[index]
+                self.update_indexes(index)
+                return
 
-    def update_indexes(self):
+    @property
+    def is_placeholder_shown(self):
+        """
+        Return ``True`` if placeholder is shown instead of song items
+        (see :meth:`.set_placeholder`).
         """
-        Update indexes of all song items in this song list.
+        return bool(self.walker) and not isinstance(self.walker[0], SongListItem)
+
+    def update_indexes(self, start=0):
         """
-        for i, songlistitem in enumerate(self.walker):
-            songlistitem.set_index(i)
+        Update indexes of song items in this song list, starting from *start*.
+        """
+        if self.is_placeholder_shown:
+            return
+        for i in range(start, len(self.walker)):
+            self.walker[i].set_index(i)
 
     def keypress(self, size, key):
         if key in ascii_letters + digits + ' _-.,?!()[]/':
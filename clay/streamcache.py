@@ -0,0 +1,78 @@
+"""
+Cache of signed stream URLs.
+"""
+from collections import OrderedDict
+from threading import Lock
+import time
+try:  # Python 3.x
+    from urllib.parse import urlparse, parse_qs
+except ImportError:  # Python 2.x
+    from urlparse import urlparse, parse_qs
+
+
+class StreamURLCache(object):
+    """
+    LRU cache of signed stream URLs keyed by track ID & quality.
+
+    Signed URLs carry their expiry time in "expire" query parameter.
+    URLs that expire within *refresh_margin* seconds are not served at all,
+    URLs that expire within *refresh_ahead* seconds are served,
+    but are reported as due for refresh (once per URL).
+    """
+    def __init__(self, size=200, default_ttl=60, refresh_margin=30, refresh_ahead=300):
+        self.size = size
+        self.default_ttl = default_ttl
+        self.refresh_margin = refresh_margin
+        self.refresh_ahead = refresh_ahead
+
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get_expiry(self, url):
+        """
+        Return expiry timestamp of signed *url*.
+        Falls back to *default_ttl* from now if URL has no "expire" parameter.
+        """
+        try:
+            return int(parse_qs(urlparse(url).query)['expire'][0])
+        except (KeyError, IndexError, ValueError):
+            return time.time() + self.default_ttl
+
+    def get(self, track_id, quality):
+        """
+        Return a tuple of cached URL (``None`` on miss) and a boolean
+        that tells whether this URL should be refreshed in background.
+        """
+        key = (str(track_id), quality)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                return None, False
+            url, expires_at, is_refresh_requested = entry
+            if expires_at - now < self.refresh_margin:
+                return None, False
+            is_due = not is_refresh_requested and expires_at - now < self.refresh_ahead
+            self._entries[key] = (url, expires_at, is_refresh_requested or is_due)
+            return url, is_due
+
+    def put(self, track_id, quality, url):
+        """
+        Store *url* for track.
+        """
+        key = (str(track_id), quality)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (url, self.get_expiry(url), False)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all cached URLs.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,460 @@
+"""
+Track model.
+"""
+# pylint: disable=protected-access
+from uuid import UUID
+import time
+
+from clay.art import art_manager, get_filename as get_art_filename
+from clay.concurrency import asynchronous, synchronized
+from clay.library import TrackColumns, parse_track_data
+from clay.log import logger
+from clay.parsing import parser_process, ParserError
+from clay.pool import worker_pool, PRIORITY_PLAYBACK
+from clay.settings import settings
+
+# Payloads with fewer tracks are always parsed in app process.
+PARSE_IN_PROCESS_MIN_TRACKS = 500
+
+
+def _get_gp():
+    """
+    Return :data:`clay.gp.gp`.
+    Imported on first use, since :mod:`clay.gp` imports this module.
+    """
+    from clay.gp import gp  # pylint: disable=import-outside-toplevel,cyclic-import
+    return gp
+
+
+def _column_property(name, doc):
+    """
+    Return a property that reads & writes track field *name*
+    from the row of :class:`clay.library.TrackColumns` the track is a view of.
+    """
+    def getter(track):
+        """
+        Read field value.
+        """
+        return track._columns.columns[name][track._row]
+
+    def setter(track, value):
+        """
+        Write field value.
+        """
+        track._columns.columns[name][track._row] = value
+
+    return property(getter, setter, doc=doc)
+
+
+class Track(object):
+    """
+    Model that represents single track from Google Play Music.
+
+    Track fields are stored in :class:`clay.library.TrackColumns`,
+    track instance is a lightweight view over a single row.
+
+    Tracks are interned: all sources share a single instance per song
+    (see :meth:`clay.gp._GP.intern_track`), so tracks are compared by identity.
+    """
+    TYPE_UPLOADED = 'uploaded'
+    TYPE_STORE = 'store'
+
+    SOURCE_LIBRARY = 'library'
+    SOURCE_STATION = 'station'
+    SOURCE_PLAYLIST = 'playlist'
+    SOURCE_SEARCH = 'search'
+
+    # Names of columns that receive "id" field of payloads from different sources.
+    ID_COLUMNS = {
+        SOURCE_LIBRARY: 'library_id'
+    }
+
+    __slots__ = (
+        '_columns', '_row', 'source', 'cached_url', '_original_data', '__weakref__'
+    )
+
+    keep_original_data = bool(settings.get('keep_track_data', 'clay_settings'))
+    parse_in_process = bool(settings.get('parse_in_process', 'clay_settings'))
+
+    store_id = _column_property('store_id', 'Store ID.')
+    _library_id = _column_property('library_id', 'Library ID as a string.')
+    title = _column_property('title', 'Track title.')
+    artist = _column_property('artist', 'Artist name.')
+    album_name = _column_property('album_name', 'Album name.')
+    album_url = _column_property('album_url', 'Album art URL.')
+    duration = _column_property('duration', 'Duration in milliseconds.')
+    rating = _column_property('rating', 'Rating: 0 (no thumb), 1 (down thumb) or 5 (up thumb).')
+    rating_timestamp = _column_property('rating_timestamp', 'Timestamp of last rating change.')
+    explicit_rating = _column_property('explicit_rating', 'Explicit type.')
+    _artist_art = _column_property('artist_art', 'Artist art refs or picked artist art URL.')
+
+    def __init__(self, source, data, keep_original_data=None, columns=None, row=None):
+        """
+        Create track from API payload *data* and append it into *columns*.
+
+        If *row* is given, track becomes a view over this (already parsed) row of *columns*.
+        """
+        self._columns = columns if columns is not None else TrackColumns()
+        if row is None:
+            row = self._columns.append(parse_track_data(data, Track.ID_COLUMNS.get(source)))
+        self._row = row
+        if 'track' in data:
+            data = data['track']
+        self.source = source
+        self.cached_url = None
+
+        if keep_original_data is None:
+            keep_original_data = Track.keep_original_data
+        self._original_data = data if keep_original_data else None
+
+    def detach(self):
+        """
+        Mark the row of this track as removed from its columns
+        and forget its library ID, so that the track becomes a store track.
+        Other fields remain readable.
+
+        Track must be removed from indexes keyed by library ID first.
+        """
+        self._columns.remove(self._row)
+        self._library_id = None
+
+    def rebind(self, track):
+        """
+        Make this track a view over the row of *track* (another instance of the same song),
+        so that fresh data becomes visible to everyone who holds this instance.
+        """
+        # pylint: disable=protected-access
+        self._columns = track._columns
+        self._row = track._row
+        self.source = track.source
+        self._original_data = track._original_data
+
+    @property
+    def is_in_library(self):
+        """
+        Return ``True`` if this track is in my library and was not removed from it.
+        """
+        return self._library_id is not None and self._columns.is_alive(self._row)
+
+    @property
+    def library_id(self):
+        """
+        Return library ID (``UUID``) of this track, ``None`` if track is not from library.
+        """
+        if self._library_id is None:
+            return None
+        return UUID(self._library_id)
+
+    @property
+    def ids(self):
+        """
+        Return a tuple of library ID & store ID as strings
+        (missing IDs are ``None``). Unlike other ID properties, this does not parse UUIDs.
+        """
+        return (self._library_id, self.store_id)
+
+    @property
+    def artist_art_url(self):
+        """
+        Return URL of artist art with the smallest aspect ratio, ``None`` if there is no art.
+        """
+        if isinstance(self._artist_art, list):
+            refs = sorted(self._artist_art, key=lambda ref: ref['aspectRatio'])
+            self._artist_art = refs[0]['url'] if refs else None
+        return self._artist_art
+
+    @property
+    def artist_art_filename(self):
+        """
+        Return cache filename for artist art, ``None`` if there is no art.
+        """
+        url = self.artist_art_url
+        if url is None:
+            return None
+        return get_art_filename(url)
+
+    @property
+    def original_data(self):
+        """
+        Return API payload this track was created from if it was retained
+        (see ``keep_track_data`` setting), otherwise a compact representation
+        from :meth:`.to_data`.
+        """
+        if self._original_data is not None:
+            return self._original_data
+        return self.to_data()
+
+    @property
+    def id(self):  # pylint: disable=invalid-name
+        """
+        Return ID for this track.
+        """
+        if self._library_id:
+            return self.library_id
+        return self.store_id
+
+    @property
+    def filename(self):
+        """
+        Return a filename for this track.
+        """
+        return self.store_id + '.mp3'
+
+    def to_data(self):
+        """
+        Return a compact API-like representation of this track
+        that can be fed back into :meth:`.from_data`.
+        """
+        data = dict(
+            storeId=self.store_id,
+            title=self.title,
+            artist=self.artist,
+            album=self.album_name,
+            durationMillis=self.duration,
+            rating=self.rating,
+            explicitType=self.explicit_rating
+        )
+        if self._library_id is not None:
+            data['id'] = self._library_id
+        if self.artist_art_url is not None:
+            data['artistArtRef'] = [dict(url=self.artist_art_url, aspectRatio='1')]
+        if self.album_url:
+            data['albumArtRef'] = [dict(url=self.album_url)]
+        if self.rating_timestamp != '0':
+            data['lastRatingChangeTimestamp'] = self.rating_timestamp
+        return data
+
+    @classmethod
+    def from_data(cls, data, source, many=False, columns=None, interned=True):
+        """
+        Construct and return one or many :class:`.Track` instances
+        from Google Play Music API response.
+
+        Tracks are stored in *columns* (:class:`clay.library.TrackColumns`).
+        If omitted, new columns are created (one for all tracks if *many* is ``True``).
+
+        Returned tracks are interned (see :meth:`clay.gp._GP.intern_track`)
+        unless *interned* is ``False`` (e.g. when library sync compares them to cached ones).
+        """
+        if many:
+            return cls._from_data_many(data, source, columns, interned)
+        try:
+            if cls._is_reference(data, source):
+                return _get_gp().get_track_by_id(data['trackId'])
+            track = Track(source, data, columns=columns)
+            return _get_gp().intern_track(track) if interned else track
+        except Exception as error:  # pylint: disable=broad-except
+            logger.error(
+                'Failed to parse track data: %s, failing data: %s',
+                repr(error),
+                data
+            )
+            return None
+
+    @staticmethod
+    def _is_reference(data, source):
+        """
+        Return ``True`` if *data* is a playlist entry that refers to a library track.
+        """
+        return source == Track.SOURCE_PLAYLIST and 'track' not in data
+
+    @classmethod
+    def _from_data_many(cls, data, source, columns, interned):
+        """
+        Construct :class:`.Track` instances from a list of payloads, skip invalid ones.
+        """
+        if columns is None:
+            columns = TrackColumns()
+        if Track.parse_in_process and len(data) >= PARSE_IN_PROCESS_MIN_TRACKS:
+            try:
+                return cls._from_data_in_process(data, source, columns, interned)
+            except ParserError as error:
+                logger.error('Falling back to parsing tracks in app: %s', str(error))
+        tracks = (
+            cls.from_data(one, source, columns=columns, interned=interned) for one in data
+        )
+        return [track for track in tracks if track is not None]
+
+    @classmethod
+    def _from_data_in_process(cls, data, source, columns, interned):
+        """
+        Construct :class:`.Track` instances from a list of payloads
+        parsed in worker process (see :mod:`clay.parsing`).
+        """
+        to_parse = [
+            index
+            for index, one
+            in enumerate(data)
+            if not cls._is_reference(one, source)
+        ]
+        parsed = cls._create_parsed(
+            [data[index] for index in to_parse], source, columns, interned
+        )
+        tracks_by_index = dict(
+            (to_parse[position], track) for position, track in parsed.items()
+        )
+        tracks = (
+            _get_gp().get_track_by_id(one['trackId'])
+            if cls._is_reference(one, source)
+            else tracks_by_index.get(index)
+            for index, one
+            in enumerate(data)
+        )
+        return [track for track in tracks if track is not None]
+
+    @classmethod
+    def _create_parsed(cls, items, source, columns, interned):
+        """
+        Parse *items* in worker process, append them into *columns*
+        and return a dict where keys are indexes of *items* and values are tracks
+        (interned if *interned* is ``True``).
+        """
+        parsed_columns, indexes, errors = parser_process.parse(
+            items, cls.ID_COLUMNS.get(source)
+        )
+        for index, error in errors:
+            logger.error(
+                'Failed to parse track data: %s, failing data: %s',
+                error,
+                items[index]
+            )
+        first_row = columns.extend(parsed_columns)
+        tracks = dict(
+            (index, Track(source, items[index], columns=columns, row=row))
+            for row, index
+            in enumerate(indexes, first_row)
+        )
+        if interned:
+            for index, track in tracks.items():
+                tracks[index] = _get_gp().intern_track(track)
+        return tracks
+
+    def get_url(self, callback):
+        """
+        Gets playable stream URL for this track.
+
+        "callback" is called with "(url, error)" args after URL is fetched.
+
+        Returns a task that can be cancelled. "callback" is always called from
+        :data:`clay.pool.worker_pool`, even if cached URL was used, since callers
+        may do blocking work (e.g. download the track) in it.
+
+        Keep in mind this URL is valid for a limited time.
+        """
+        def on_get_url(url, error):
+            """
+            Called when URL is fetched.
+            """
+            self.cached_url = url
+            callback(url, error, self)
+
+        if _get_gp().is_subscribed:
+            track_id = self.store_id
+        else:
+            track_id = self.library_id
+
+        url = _get_gp().get_cached_stream_url(track_id)
+        if url is not None:
+            return worker_pool.submit(on_get_url, (url, None), priority=PRIORITY_PLAYBACK)
+        return _get_gp().get_stream_url_async(track_id, callback=on_get_url)
+
+    def get_cached_art_filename(self):
+        """
+        Return filename of artist art (or album art if there is no artist art)
+        if it is already downloaded, ``None`` otherwise. Never blocks on network.
+        """
+        return art_manager.get_cached_filename(self.artist_art_url) or \
+            art_manager.get_cached_filename(self.album_url or None)
+
+    @synchronized(lambda track: ('station', track.store_id))
+    def create_station(self):
+        """
+        Creates a new station from this :class:`.Track`.
+
+        Returns :class:`clay.gp.Station` instance.
+        """
+        station_name = u'Station - {}'.format(self.title)
+        station_id = _get_gp().mobile_client.create_station(
+            name=station_name,
+            track_id=self.store_id
+        )
+        from clay.gp import Station  # pylint: disable=import-outside-toplevel
+        station = Station(station_id, station_name)
+        station.load_tracks()
+        return station
+
+    create_station_async = asynchronous(create_station)
+
+    def add_to_my_library(self, callback=None):
+        """
+        Add a track to my library. Completes in background.
+
+        See :meth:`._GP.add_to_my_library`.
+        """
+        _get_gp().add_to_my_library(self, callback)
+
+    def remove_from_my_library(self, callback=None):
+        """
+        Remove a track from my library. Completes in background.
+
+        See :meth:`._GP.remove_from_my_library`.
+        """
+        _get_gp().remove_from_my_library(self, callback)
+
+    def get_rating_data(self, rating):
+        """
+        Return a payload that sets rating of this track.
+        """
+        data = dict(self.original_data)
+        # Store tracks are identified by "nid" & "trackType".
+        data.setdefault('nid', self.store_id)
+        if self._library_id is None:
+            data.setdefault('trackType', '7')
+        data['rating'] = str(rating)
+        return data
+
+    def set_rating(self, rating):
+        """
+        Update rating of this track locally (without sending it to server).
+        """
+        if self.rating == rating:
+            return
+        was_liked = self.rating == 5
+        self.rating = rating
+        self.rating_timestamp = str(int(time.time() * 1000000))
+        if self._original_data is not None:
+            self._original_data['rating'] = str(rating)
+            self._original_data['lastRatingChangeTimestamp'] = self.rating_timestamp
+
+        if rating == 5:
+            _get_gp().cached_liked_songs.add_liked_song(self)
+        elif was_liked:
+            _get_gp().cached_liked_songs.remove_liked_song(self)
+
+    def rate_song(self, rating):
+        """
+        Rate the song either 0 (no thumb), 1 (down thumb) or 5 (up thumb).
+
+        Rating is applied locally right away and sent to server in background.
+        Local rating is reverted if server rejects it.
+        """
+        previous_rating = self.rating
+
+        def on_rated(_, error):
+            """
+            Called once rating is sent.
+            """
+            if error and self.rating == rating:
+                self.set_rating(previous_rating)
+
+        self.set_rating(rating)
+        _get_gp().rate_track(self, rating, callback=on_rated)
+
+    def __str__(self):
+        return u'<Track "{} - {}" from {}>'.format(
+            self.artist,
+            self.title,
+            self.source
+        )
+
+    __repr__ = __str__
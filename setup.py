@@ -16,7 +16,10 @@ setup(
         'gmusicapi',
         'PyYAML',
         'urwid',
-        'codename'
+        'codename',
+        'requests',
+        'urllib3',
+        'sortedcontainers'
     ],
     packages=find_packages(),
     entry_points={
@@ -0,0 +1,18 @@
+"""
+Helpers shared by tests.
+"""
+import time
+
+# Seconds to wait for background work before failing.
+TIMEOUT = 5
+
+
+def wait_until(condition):
+    """
+    Wait until *condition* returns ``True``, fail after timeout.
+    """
+    deadline = time.time() + TIMEOUT
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('Timed out')
+        time.sleep(0.01)
@@ -0,0 +1,228 @@
+"""
+Tests for API response cache (see :mod:`clay.apicache`).
+"""
+import shutil
+import tempfile
+import unittest
+
+from clay.apicache import _APICache, DISK_CACHE_PREFIX
+from clay.settings import settings
+
+
+# pylint: disable=too-few-public-methods
+class Search(object):
+    """
+    Cached protocol.
+    """
+
+
+class ListStations(object):
+    """
+    Cached protocol invalidated by :class:`BatchMutateStations`.
+    """
+
+
+class BatchMutateStations(object):
+    """
+    Mutating protocol.
+    """
+
+
+class Expired(object):
+    """
+    Protocol whose responses expire immediately.
+    """
+
+
+class APICacheTestCase(unittest.TestCase):
+    """
+    Expiry, eviction & invalidation of cached responses.
+    """
+    def setUp(self):
+        _APICache.TTLS['Expired'] = -1
+        self.cache = _APICache(size=2)
+        self.cache.use_disk = False
+        self.calls = []
+
+    def tearDown(self):
+        del _APICache.TTLS['Expired']
+
+    def _make_call(self, protocol, *args, **kwargs):
+        """
+        Record call & return fresh response.
+        """
+        self.calls.append((protocol.__name__, args, kwargs))
+        return dict(protocol=protocol.__name__, args=list(args), call=len(self.calls))
+
+    def test_hit(self):
+        """
+        Same call is served from cache, response copies are independent.
+        """
+        response = self.cache.call(self._make_call, Search, 'query', max_results=10)
+        response['args'].append('modified')
+
+        self.assertEqual(
+            self.cache.call(self._make_call, Search, 'query', max_results=10)['args'],
+            ['query']
+        )
+        self.assertEqual(len(self.calls), 1)
+        self.cache.call(self._make_call, Search, 'query', max_results=20)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_uncached_protocol(self):
+        """
+        Protocols without TTL are always called.
+        """
+        self.cache.call(self._make_call, BatchMutateStations)
+        self.cache.call(self._make_call, BatchMutateStations)
+
+        self.assertEqual(len(self.calls), 2)
+
+    def test_expiry(self):
+        """
+        Expired responses are not served.
+        """
+        self.cache.call(self._make_call, Expired)
+        self.cache.call(self._make_call, Expired)
+
+        self.assertEqual(len(self.calls), 2)
+
+    def test_lru_eviction(self):
+        """
+        Least recently used response is evicted when cache is full.
+        """
+        for query in ('first', 'second'):
+            self.cache.call(self._make_call, Search, query)
+        self.cache.call(self._make_call, Search, 'first')
+        self.cache.call(self._make_call, Search, 'third')
+        self.assertEqual(len(self.calls), 3)
+
+        self.cache.call(self._make_call, Search, 'first')
+        self.assertEqual(len(self.calls), 3)
+        self.cache.call(self._make_call, Search, 'second')
+        self.assertEqual(len(self.calls), 4)
+
+    def test_invalidation(self):
+        """
+        Mutating protocols drop responses of protocols they affect.
+        """
+        self.cache.call(self._make_call, ListStations)
+        self.cache.call(self._make_call, Search, 'query')
+        self.cache.call(self._make_call, BatchMutateStations)
+
+        self.cache.call(self._make_call, ListStations)
+        self.cache.call(self._make_call, Search, 'query')
+
+        self.assertEqual(
+            [name for name, _, _ in self.calls],
+            ['ListStations', 'Search', 'BatchMutateStations', 'ListStations']
+        )
+
+    def test_bypassed(self):
+        """
+        Bypassed lookups call API & refresh cached response.
+        """
+        self.cache.call(self._make_call, Search, 'query')
+        with self.cache.bypassed():
+            response = self.cache.call(self._make_call, Search, 'query')
+
+        self.assertEqual(response['call'], 2)
+        self.assertEqual(self.cache.call(self._make_call, Search, 'query')['call'], 2)
+
+    def test_accounts_are_isolated(self):
+        """
+        Responses cached for one account are not served to another one.
+        """
+        self.cache.set_account('first')
+        self.cache.call(self._make_call, Search, 'query')
+        self.cache.set_account('second')
+        self.cache.call(self._make_call, Search, 'query')
+        self.cache.set_account('second')
+        self.cache.call(self._make_call, Search, 'query')
+
+        self.assertEqual(len(self.calls), 2)
+
+
+class APIDiskCacheTestCase(unittest.TestCase):
+    """
+    Responses kept in cache dir.
+    """
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = settings._cache_dir  # pylint: disable=protected-access
+        self.cached_files = settings._cached_files  # pylint: disable=protected-access
+        settings._cache_dir = self.temp_dir  # pylint: disable=protected-access
+        settings._cached_files = set()  # pylint: disable=protected-access
+        self.calls = []
+
+    def tearDown(self):
+        settings._cache_dir = self.cache_dir  # pylint: disable=protected-access
+        settings._cached_files = self.cached_files  # pylint: disable=protected-access
+        shutil.rmtree(self.temp_dir)
+
+    def _create_cache(self, **kwargs):
+        """
+        Return cache that uses cache dir.
+        """
+        cache = _APICache(**kwargs)
+        cache.use_disk = True
+        cache.set_account('account')
+        return cache
+
+    def _make_call(self, protocol, *args):
+        """
+        Record call & return fresh response.
+        """
+        self.calls.append(protocol.__name__)
+        return dict(args=list(args))
+
+    def test_evicted_response_is_read_from_disk(self):
+        """
+        Responses evicted from memory are served from cache dir.
+        """
+        cache = self._create_cache(size=1)
+        cache.call(self._make_call, Search, 'first')
+        cache.call(self._make_call, Search, 'second')
+
+        self.assertEqual(cache.call(self._make_call, Search, 'first'), dict(args=['first']))
+        self.assertEqual(len(self.calls), 2)
+
+    def test_responses_survive_restart(self):
+        """
+        New cache instance serves responses stored by previous one.
+        """
+        self._create_cache().call(self._make_call, Search, 'query')
+
+        cache = self._create_cache()
+        self.assertEqual(cache.call(self._make_call, Search, 'query'), dict(args=['query']))
+        self.assertEqual(len(self.calls), 1)
+
+        cache.set_account('other')
+        cache.call(self._make_call, Search, 'query')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_disk_eviction(self):
+        """
+        Only *disk_size* files are kept.
+        """
+        cache = self._create_cache(disk_size=2)
+        for query in ('first', 'second', 'third'):
+            cache.call(self._make_call, Search, query)
+
+        self.assertEqual(len(settings.get_cached_filenames(DISK_CACHE_PREFIX)), 2)
+
+    def test_invalidation_removes_files(self):
+        """
+        Invalidated responses are removed from cache dir.
+        """
+        cache = self._create_cache()
+        cache.call(self._make_call, ListStations)
+        cache.call(self._make_call, BatchMutateStations)
+
+        self.assertEqual(settings.get_cached_filenames(DISK_CACHE_PREFIX), [])
+        self._create_cache().call(self._make_call, ListStations)
+        self.assertEqual(self.calls, ['ListStations', 'BatchMutateStations', 'ListStations'])
+
+
+if __name__ == '__main__':
+    unittest.main()
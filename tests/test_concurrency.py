@@ -0,0 +1,238 @@
+"""
+Tests for concurrency helpers (see :mod:`clay.concurrency`).
+"""
+from threading import Event, Thread
+import time
+import unittest
+
+from clay.concurrency import SingleFlight, keyed_lock, synchronized
+
+from helpers import TIMEOUT, wait_until
+
+
+def run_in_threads(func, count):
+    """
+    Start *count* threads that call *func*. Return started threads.
+    """
+    threads = [Thread(target=func) for _ in range(count)]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    return threads
+
+
+class SingleFlightTestCase(unittest.TestCase):
+    """
+    Coalescing of concurrent identical calls.
+    """
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.gate = Event()
+        self.calls = []
+
+    def _slow_call(self, value):
+        """
+        Record call, wait for gate & return *value*.
+        """
+        self.calls.append(value)
+        self.gate.wait(TIMEOUT)
+        return value
+
+    def test_concurrent_calls_are_coalesced(self):
+        """
+        Concurrent calls with the same key share a single execution and result.
+        """
+        results = []
+
+        def call():
+            """
+            Call through single flight.
+            """
+            results.append(self.flights.do('key', self._slow_call, 'result'))
+
+        threads = run_in_threads(call, 5)
+        wait_until(lambda: len(self.calls) == 1)
+        time.sleep(0.05)
+        self.gate.set()
+        for thread in threads:
+            thread.join(TIMEOUT)
+
+        self.assertEqual(self.calls, ['result'])
+        self.assertEqual(results, ['result'] * 5)
+
+    def test_different_keys_are_not_coalesced(self):
+        """
+        Calls with different keys run independently.
+        """
+        self.gate.set()
+
+        self.assertEqual(self.flights.do('first', self._slow_call, 1), 1)
+        self.assertEqual(self.flights.do('second', self._slow_call, 2), 2)
+        self.assertEqual(self.calls, [1, 2])
+
+    def test_sequential_calls_are_not_cached(self):
+        """
+        Finished call is not reused by later calls.
+        """
+        self.gate.set()
+
+        self.flights.do('key', self._slow_call, 1)
+        self.flights.do('key', self._slow_call, 2)
+
+        self.assertEqual(self.calls, [1, 2])
+
+    def test_error_is_shared(self):
+        """
+        Error of the leader is raised in every joined caller.
+        """
+        errors = []
+
+        def fail():
+            """
+            Wait for gate & fail.
+            """
+            self.calls.append('fail')
+            self.gate.wait(TIMEOUT)
+            raise ValueError('Failed')
+
+        def call():
+            """
+            Call through single flight & record error.
+            """
+            try:
+                self.flights.do('key', fail)
+            except ValueError as error:
+                errors.append(error)
+
+        threads = run_in_threads(call, 3)
+        wait_until(lambda: len(self.calls) == 1)
+        time.sleep(0.05)
+        self.gate.set()
+        for thread in threads:
+            thread.join(TIMEOUT)
+
+        self.assertEqual(self.calls, ['fail'])
+        self.assertEqual(len(errors), 3)
+
+    def test_forget(self):
+        """
+        Calls made after forget() do not join calls that were in flight.
+        """
+        thread = run_in_threads(lambda: self.flights.do('key', self._slow_call, 'old'), 1)[0]
+        wait_until(lambda: len(self.calls) == 1)
+
+        self.flights.forget()
+        self.assertEqual(self.flights.do('key', lambda: 'new'), 'new')
+
+        self.gate.set()
+        thread.join(TIMEOUT)
+        self.assertEqual(self.calls, ['old'])
+
+    def test_join(self):
+        """
+        Joined callers receive result without waiting, only while call is in flight.
+        """
+        results = []
+        self.assertIsNone(self.flights.join('key', None, 0))
+
+        thread = run_in_threads(lambda: self.flights.do('key', self._slow_call, 42), 1)[0]
+        wait_until(lambda: len(self.calls) == 1)
+        task = self.flights.join(
+            'key', lambda result, error: results.append((result, error)), 0
+        )
+        self.assertIsNotNone(task)
+        self.gate.set()
+        thread.join(TIMEOUT)
+
+        wait_until(lambda: results == [(42, None)])
+        self.assertIsNone(self.flights.join('key', None, 0))
+
+
+def hold_and_record(key, events, name):
+    """
+    Hold lock for *key* & append *name* to *events* while holding it.
+    """
+    with keyed_lock.hold(key):
+        events.append(name)
+
+
+class KeyedLockTestCase(unittest.TestCase):
+    """
+    Reentrant locks handed out by key.
+    """
+    def test_same_key_is_exclusive(self):
+        """
+        Second holder of the same key waits for the first one.
+        """
+        events = []
+        gate = Event()
+
+        def hold():
+            """
+            Hold the lock until gate is set.
+            """
+            with keyed_lock.hold('key'):
+                events.append('first')
+                gate.wait(TIMEOUT)
+                events.append('first released')
+
+        thread = run_in_threads(hold, 1)[0]
+        wait_until(lambda: events == ['first'])
+        waiter = run_in_threads(lambda: hold_and_record('key', events, 'second'), 1)[0]
+        time.sleep(0.05)
+        self.assertEqual(events, ['first'])
+
+        gate.set()
+        thread.join(TIMEOUT)
+        waiter.join(TIMEOUT)
+        self.assertEqual(events, ['first', 'first released', 'second'])
+
+    def test_different_keys_run_concurrently(self):
+        """
+        Holding one key does not block another one.
+        """
+        events = []
+        with keyed_lock.hold('first'):
+            thread = run_in_threads(lambda: hold_and_record('second', events, 'second'), 1)[0]
+            thread.join(TIMEOUT)
+            self.assertEqual(events, ['second'])
+
+    def test_reentrant(self):
+        """
+        The same thread can hold the same key several times.
+        """
+        with keyed_lock.hold('key'):
+            with keyed_lock.hold('key'):
+                pass
+
+    def test_locks_are_dropped(self):
+        """
+        Locks are forgotten once nobody holds them.
+        """
+        with keyed_lock.hold(('unique', 'key')):
+            self.assertIn(('unique', 'key'), keyed_lock._locks)  # pylint: disable=protected-access
+        self.assertNotIn(('unique', 'key'), keyed_lock._locks)  # pylint: disable=protected-access
+
+    def test_synchronized_with_callable_key(self):
+        """
+        Key of synchronized function can depend on its arguments.
+        """
+        keys = []
+
+        @synchronized(lambda value: ('value', value))
+        def func(value):
+            """
+            Record keys that are held.
+            """
+            keys.extend(
+                key for key in keyed_lock._locks  # pylint: disable=protected-access
+                if isinstance(key, tuple) and key[0] == 'value'
+            )
+            return value
+
+        self.assertEqual(func(1), 1)
+        self.assertEqual(keys, [('value', 1)])
+
+
+if __name__ == '__main__':
+    unittest.main()
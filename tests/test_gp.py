@@ -0,0 +1,355 @@
+"""
+Tests for shared track instances (see :meth:`clay.gp._GP.intern_track`)
+& library deltas.
+"""
+import unittest
+from uuid import UUID
+
+from clay.gp import gp
+from clay.mutations import KIND_ADD, KIND_REMOVE
+from clay.playlist import Playlist
+from clay.settings import settings
+from clay.track import Track
+
+from test_mutations import _MutationQueue
+
+
+def make_track_data(index, **kwargs):
+    """
+    Return a library track payload.
+    """
+    data = {
+        'id': str(UUID(int=index + 1)),
+        'storeId': 'T{:026d}'.format(index),
+        'title': 'Title #{}'.format(index),
+        'artist': 'Artist #{}'.format(index),
+        'album': 'Album #{}'.format(index),
+        'durationMillis': '180000',
+        'rating': '0',
+        'explicitType': '2',
+    }
+    data.update(kwargs)
+    return data
+
+
+def make_station_track_data(index, **kwargs):
+    """
+    Return a station track payload (station tracks have no library ID).
+    """
+    data = make_track_data(index, **kwargs)
+    del data['id']
+    return data
+
+
+class SharedTracksTestCase(unittest.TestCase):
+    """
+    Library refetch & lookups of tracks from other sources.
+    """
+    def setUp(self):
+        self.library = [make_track_data(index) for index in range(3)]
+        gp.mobile_client.get_all_songs = self._get_all_songs
+        gp._schedule_snapshot_save = lambda: None  # pylint: disable=protected-access
+        gp.invalidate_caches()
+
+    def tearDown(self):
+        del gp.mobile_client.get_all_songs
+        del gp._schedule_snapshot_save  # pylint: disable=protected-access
+        gp.invalidate_caches()
+
+    def _get_all_songs(self, incremental=False, **_):
+        """
+        Return fake library.
+        """
+        if incremental:
+            return iter([list(self.library)])
+        return list(self.library)
+
+    def test_station_lookup_after_refetch(self):
+        """
+        Station track is the refetched library track.
+        """
+        old_track = gp.get_all_tracks()[1]
+        gp.invalidate_caches()
+        self.library[1] = make_track_data(1, title='New title')
+        fresh_track = gp.get_all_tracks()[1]
+
+        station_track = Track.from_data(make_station_track_data(1), Track.SOURCE_STATION)
+
+        self.assertIsNot(fresh_track, old_track)
+        self.assertIs(station_track, fresh_track)
+        self.assertTrue(station_track.is_in_library)
+        self.assertEqual(station_track.title, 'New title')
+
+    def test_liked_songs_after_refetch(self):
+        """
+        Liked songs contain refetched library tracks only.
+        """
+        self.library[0] = make_track_data(0, rating='5')
+        gp.get_all_tracks()
+        gp.invalidate_caches()
+        fresh_tracks = gp.get_all_tracks()
+
+        station_track = Track.from_data(
+            make_station_track_data(0, rating='5'), Track.SOURCE_STATION
+        )
+
+        self.assertIs(station_track, fresh_tracks[0])
+        self.assertEqual(gp.cached_liked_songs.tracks, [fresh_tracks[0]])
+
+    def test_library_entry_rebinds_shared_track(self):
+        """
+        Fresh copy of library entry updates the shared track.
+        """
+        track = gp.get_all_tracks()[2]
+
+        fresh_track = Track.from_data(
+            make_track_data(2, title='New title'),
+            Track.SOURCE_LIBRARY,
+            columns=gp._library_columns  # pylint: disable=protected-access
+        )
+
+        self.assertIs(fresh_track, track)
+        self.assertEqual(track.title, 'New title')
+        self.assertEqual(gp.get_library_stats()['tracks'], 3)
+
+
+class LibraryDeltasTestCase(unittest.TestCase):
+    """
+    Local application of tracks added to & removed from library.
+    """
+    def setUp(self):
+        self.library = [make_track_data(index) for index in range(3)]
+        gp.mobile_client.get_all_songs = lambda incremental=False, **_: iter([self.library])
+        gp.mobile_client.add_store_tracks = lambda store_ids: [
+            str(UUID(int=100 + index)) for index, _ in enumerate(store_ids)
+        ]
+        gp.mobile_client.delete_songs = lambda library_ids: library_ids
+        gp._schedule_snapshot_save = lambda: None  # pylint: disable=protected-access
+        gp.invalidate_caches()
+        self.tracks = list(gp.get_all_tracks())
+        self.playlist = Playlist('playlist', 'Playlist', [
+            dict(id='entry', trackId=self.library[0]['id'])
+        ])
+        gp.cached_playlists = [self.playlist]
+
+    def tearDown(self):
+        del gp.mobile_client.get_all_songs
+        del gp.mobile_client.add_store_tracks
+        del gp.mobile_client.delete_songs
+        del gp._schedule_snapshot_save  # pylint: disable=protected-access
+        gp.invalidate_caches()
+
+    def test_removed_track_becomes_store_track(self):
+        """
+        Removed track forgets its library ID & can be added again by store ID.
+        """
+        track = self.tracks[0]
+        library_id = self.library[0]['id']
+        self.assertEqual([entry.track for entry in self.playlist.entries], [track])
+        self.assertIs(gp.get_track_by_id('entry'), track)
+
+        gp._send_library_removals([library_id])  # pylint: disable=protected-access
+
+        self.assertIsNone(track.library_id)
+        self.assertEqual(track.id, track.store_id)
+        self.assertIsNone(gp.get_track_by_id(library_id))
+        self.assertEqual(gp.cached_tracks, self.tracks[1:])
+        self.assertEqual(gp.search_library('title #0'), [])
+        self.assertIs(
+            Track.from_data(make_station_track_data(0), Track.SOURCE_STATION), track
+        )
+        # Memoized entry of removed library track is resolved again & dropped.
+        self.assertIsNone(gp.get_track_by_id('entry'))
+        self.assertEqual(self.playlist.entries, [])
+
+        gp._send_library_additions([track.to_data()])  # pylint: disable=protected-access
+
+        self.assertTrue(track.is_in_library)
+        self.assertEqual(str(track.library_id), str(UUID(int=100)))
+        self.assertIs(gp.get_track_by_id(track.library_id), track)
+
+
+
+class OptimisticLibraryChangesTestCase(unittest.TestCase):
+    """
+    Additions & removals that are applied locally before they are sent.
+    """
+    def setUp(self):
+        self.library = [make_track_data(index) for index in range(2)]
+        self.sent = []
+        self.failures = 0
+        self.results = []
+        self.on_add = None
+        gp.mobile_client.get_all_songs = lambda incremental=False, **_: iter([self.library])
+        gp.mobile_client.add_store_tracks = self._add_store_tracks
+        gp.mobile_client.delete_songs = self._delete_songs
+        gp._schedule_snapshot_save = lambda: None  # pylint: disable=protected-access
+        settings.get_cached_file_path = lambda filename: None
+        settings.save_file_to_cache = lambda filename, content: None
+        settings.remove_file_from_cache = lambda filename: None
+        self.mutations = gp._mutations  # pylint: disable=protected-access
+        gp._mutations = _MutationQueue(dict(  # pylint: disable=protected-access
+            (kind, getattr(gp, sender)) for kind, sender in (
+                (KIND_ADD, '_send_library_additions'),
+                (KIND_REMOVE, '_send_library_removals')
+            )
+        ))
+        gp._mutations.start()  # pylint: disable=protected-access
+        gp.invalidate_caches()
+        self.tracks = list(gp.get_all_tracks())
+        self.store_track = Track.from_data(make_station_track_data(5), Track.SOURCE_STATION)
+
+    def tearDown(self):
+        gp._mutations = self.mutations  # pylint: disable=protected-access
+        del gp.mobile_client.get_all_songs
+        del gp.mobile_client.add_store_tracks
+        del gp.mobile_client.delete_songs
+        del gp._schedule_snapshot_save  # pylint: disable=protected-access
+        del settings.get_cached_file_path
+        del settings.save_file_to_cache
+        del settings.remove_file_from_cache
+        gp.invalidate_caches()
+
+    def _add_store_tracks(self, store_ids):
+        """
+        Record added tracks & return their library IDs.
+        """
+        self._fail_if_requested()
+        if self.on_add is not None:
+            self.on_add()
+        self.sent.append(('add', store_ids))
+        return [str(UUID(int=100 + index)) for index, _ in enumerate(store_ids)]
+
+    def _delete_songs(self, library_ids):
+        """
+        Record removed tracks.
+        """
+        self._fail_if_requested()
+        self.sent.append(('remove', library_ids))
+        return library_ids
+
+    def _fail_if_requested(self):
+        """
+        Raise an error if failures are requested.
+        """
+        if self.failures:
+            self.failures -= 1
+            raise ValueError('Server error')
+
+    def _record_result(self, result, error):
+        """
+        Record callback args.
+        """
+        self.results.append((result, error))
+
+    def test_addition(self):
+        """
+        Added track shows up right away & is bound to its library row once sent.
+        """
+        gp.add_to_my_library(self.store_track, self._record_result)
+
+        self.assertEqual(gp.cached_tracks, self.tracks + [self.store_track])
+        self.assertIs(gp.get_track_by_id(self.store_track.store_id), self.store_track)
+        self.assertEqual(self.sent, [])
+
+        gp._mutations.flush()  # pylint: disable=protected-access
+
+        self.assertEqual(self.sent, [('add', [self.store_track.store_id])])
+        self.assertEqual(self.results, [(True, None)])
+        self.assertEqual(gp.cached_tracks, self.tracks + [self.store_track])
+        self.assertTrue(self.store_track.is_in_library)
+        self.assertIs(gp.get_track_by_id(UUID(int=100)), self.store_track)
+
+    def test_failed_addition_is_reverted(self):
+        """
+        Track is dropped from library if server rejects its addition.
+        """
+        gp.add_to_my_library(self.store_track, self._record_result)
+        self.failures = _MutationQueue.MAX_ATTEMPTS
+
+        for _ in range(_MutationQueue.MAX_ATTEMPTS):
+            gp._mutations.flush()  # pylint: disable=protected-access
+
+        self.assertEqual(gp.cached_tracks, self.tracks)
+        self.assertIsNone(gp.get_track_by_id(self.store_track.store_id))
+        self.assertIsInstance(self.results[0][1], ValueError)
+
+    def test_removal(self):
+        """
+        Removed track disappears right away & its library ID is sent.
+        """
+        track = self.tracks[0]
+        gp.remove_from_my_library(track, self._record_result)
+
+        self.assertEqual(gp.cached_tracks, self.tracks[1:])
+        self.assertIsNone(gp.get_track_by_id(self.library[0]['id']))
+
+        gp._mutations.flush()  # pylint: disable=protected-access
+
+        self.assertEqual(self.sent, [('remove', [self.library[0]['id']])])
+        self.assertEqual(self.results, [(True, None)])
+        self.assertIsNone(track.library_id)
+
+    def test_failed_removal_is_reverted(self):
+        """
+        Track is shown in library again if server rejects its removal.
+        """
+        track = self.tracks[0]
+        gp.remove_from_my_library(track, self._record_result)
+        self.failures = _MutationQueue.MAX_ATTEMPTS
+
+        for _ in range(_MutationQueue.MAX_ATTEMPTS):
+            gp._mutations.flush()  # pylint: disable=protected-access
+
+        self.assertEqual(gp.cached_tracks, self.tracks[1:] + [track])
+        self.assertIs(gp.get_track_by_id(self.library[0]['id']), track)
+        self.assertTrue(track.is_in_library)
+
+    def test_addition_and_removal_cancel_out(self):
+        """
+        Removal of a track whose addition is pending cancels both.
+        """
+        gp.add_to_my_library(self.store_track)
+        gp.remove_from_my_library(self.store_track, self._record_result)
+        gp._mutations.flush()  # pylint: disable=protected-access
+
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.results, [(True, None)])
+        self.assertEqual(gp.cached_tracks, self.tracks)
+        self.assertIsNone(gp.get_track_by_id(self.store_track.store_id))
+
+    def test_removal_during_addition(self):
+        """
+        Track removed while its addition is being sent is removed by library ID afterwards.
+        """
+        self.on_add = lambda: gp.remove_from_my_library(self.store_track, self._record_result)
+        gp.add_to_my_library(self.store_track)
+
+        gp._mutations.flush()  # pylint: disable=protected-access
+        self.assertEqual(gp.cached_tracks, self.tracks)
+        gp._mutations.flush()  # pylint: disable=protected-access
+
+        self.assertEqual(self.sent, [
+            ('add', [self.store_track.store_id]), ('remove', [str(UUID(int=100))])
+        ])
+        self.assertEqual(self.results, [(True, None)])
+        self.assertEqual(gp.cached_tracks, self.tracks)
+        self.assertFalse(self.store_track.is_in_library)
+
+    def test_removal_and_addition_cancel_out(self):
+        """
+        Addition of a track whose removal is pending cancels both.
+        """
+        track = self.tracks[0]
+        gp.remove_from_my_library(track)
+        gp.add_to_my_library(track, self._record_result)
+        gp._mutations.flush()  # pylint: disable=protected-access
+
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.results, [(True, None)])
+        self.assertEqual(gp.cached_tracks, self.tracks[1:] + [track])
+        self.assertIs(gp.get_track_by_id(self.library[0]['id']), track)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Tests for columnar track storage & track collections (see :mod:`clay.library`).
+"""
+from operator import attrgetter
+import unittest
+from uuid import UUID
+
+from clay.library import SortedTrackSet, TrackColumns, TrackIndex
+from clay.playlist import PlaylistEntry
+from clay.track import Track
+
+from test_gp import make_track_data
+
+
+class TrackIndexTestCase(unittest.TestCase):
+    """
+    Lookups of tracks by library, store & playlist entry IDs.
+    """
+    def setUp(self):
+        self.tracks = Track.from_data(
+            [make_track_data(index) for index in range(3)],
+            Track.SOURCE_LIBRARY, True, TrackColumns(), interned=False
+        )
+        self.index = TrackIndex(self.tracks)
+
+    def test_lookup(self):
+        """
+        Tracks are found by library ID (string or UUID) & store ID.
+        """
+        track = self.tracks[1]
+
+        self.assertIs(self.index.get(track.library_id), track)
+        self.assertIs(self.index.get(str(track.library_id)), track)
+        self.assertIs(self.index.get(track.store_id), track)
+        self.assertIsNone(self.index.get('missing'))
+        self.assertEqual(len(self.index), 3)
+        self.assertIs(self.index.by_library_id[str(UUID(int=2))], track)
+
+    def test_remove(self):
+        """
+        Removed tracks are not found, other tracks are.
+        """
+        track = self.tracks[0]
+
+        self.index.remove(track)
+
+        self.assertIsNone(self.index.get(track.library_id))
+        self.assertIsNone(self.index.get(track.store_id))
+        self.assertIs(self.index.get(self.tracks[1].store_id), self.tracks[1])
+        self.assertEqual(len(self.index), 2)
+
+    def test_rebuild_after_removal(self):
+        """
+        Index rebuilt from remaining tracks does not contain removed ones.
+        """
+        removed = self.tracks.pop(0)
+
+        index = TrackIndex(self.tracks)
+
+        self.assertIsNone(index.get(removed.library_id))
+        self.assertIsNone(index.get(removed.store_id))
+        for track in self.tracks:
+            self.assertIs(index.get(track.library_id), track)
+            self.assertIs(index.get(track.store_id), track)
+
+    def test_playlist_entries(self):
+        """
+        Tracks of playlist entries are found by entry ID until entries are cleared.
+        """
+        self.index.add_entries([
+            PlaylistEntry('entry', self.tracks[2]), PlaylistEntry(None, self.tracks[0])
+        ])
+
+        self.assertIs(self.index.get('entry'), self.tracks[2])
+
+        self.index.clear_entries()
+
+        self.assertIsNone(self.index.get('entry'))
+        self.assertIs(self.index.get(self.tracks[2].store_id), self.tracks[2])
+
+
+class SortedTrackSetTestCase(unittest.TestCase):
+    """
+    Ordering & de-duplication of tracks by store ID, most recently rated first.
+    """
+    def setUp(self):
+        self.set = SortedTrackSet(
+            attrgetter('store_id'),
+            lambda track: -int(track.rating_timestamp or 0)
+        )
+
+    @staticmethod
+    def make_track(index, rated_at):
+        """
+        Return a track rated at *rated_at*.
+        """
+        return Track.from_data(
+            make_track_data(index, lastRatingChangeTimestamp=str(rated_at)),
+            Track.SOURCE_LIBRARY, interned=False
+        )
+
+    def test_ordering(self):
+        """
+        Tracks are ordered regardless of insertion order.
+        """
+        tracks = [self.make_track(0, 20), self.make_track(1, 30), self.make_track(2, 10)]
+        for track in tracks:
+            self.set.add(track)
+
+        self.assertEqual(self.set.tracks, [tracks[1], tracks[0], tracks[2]])
+        self.assertEqual(len(self.set), 3)
+
+    def test_deduplication(self):
+        """
+        Track with the same key replaces the previous one & takes its new position.
+        """
+        old_track = self.make_track(0, 10)
+        other_track = self.make_track(1, 20)
+        new_track = self.make_track(0, 30)
+        self.set.add(old_track)
+        self.set.add(other_track)
+
+        self.set.add(new_track)
+
+        self.assertEqual(self.set.tracks, [new_track, other_track])
+        self.assertIn(old_track, self.set)
+        self.assertTrue(self.set.contains_key(new_track.store_id))
+
+    def test_remove(self):
+        """
+        Discarded tracks are gone, discarding absent tracks does nothing.
+        """
+        tracks = [self.make_track(index, index) for index in range(3)]
+        for track in tracks:
+            self.set.add(track)
+        listed = self.set.tracks
+
+        self.set.discard(tracks[1])
+        self.set.discard(self.make_track(5, 0))
+
+        self.assertEqual(self.set.tracks, [tracks[2], tracks[0]])
+        self.assertNotIn(tracks[1], self.set)
+        self.assertEqual(len(self.set), 2)
+        # Previously returned list is not modified.
+        self.assertEqual(len(listed), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
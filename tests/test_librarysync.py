@@ -0,0 +1,205 @@
+"""
+Tests for incremental library sync (see :mod:`clay.librarysync` & :meth:`clay.gp._GP.sync_library`).
+"""
+import time
+import unittest
+from uuid import UUID
+
+from clay.gp import gp
+from clay.library import TrackColumns, TrackIndex
+from clay.librarysync import apply_library_changes, get_synced_at, get_updated_after, \
+    merge_tracks
+from clay.track import Track
+
+from test_gp import make_track_data
+
+
+class LibraryChangesTestCase(unittest.TestCase):
+    """
+    Merging of changed & deleted library entries into cached tracks.
+    """
+    def setUp(self):
+        gp.invalidate_caches()
+        self.columns = TrackColumns()
+        self.tracks = Track.from_data(
+            [make_track_data(index) for index in range(3)],
+            Track.SOURCE_LIBRARY, True, self.columns
+        )
+        self.index = TrackIndex(self.tracks)
+
+    def tearDown(self):
+        gp.invalidate_caches()
+
+    def test_get_synced_at(self):
+        """
+        The most recent modification timestamp is picked.
+        """
+        data = [dict(lastModifiedTimestamp='20'), dict(lastModifiedTimestamp='10'), dict()]
+
+        self.assertEqual(get_synced_at(data), 20)
+        self.assertEqual(get_synced_at(data, 30), 30)
+        self.assertEqual(get_synced_at([], 30), 30)
+        self.assertIsNone(get_synced_at([]))
+
+    def test_get_updated_after(self):
+        """
+        Timestamp survives conversion to local datetime & back (as done by gmusicapi).
+        """
+        synced_at = 1500000000123456
+
+        updated_after = get_updated_after(synced_at)
+
+        self.assertIsNone(updated_after.tzinfo)
+        self.assertEqual(
+            int(time.mktime(updated_after.timetuple())) * 1000000 + updated_after.microsecond,
+            synced_at
+        )
+
+    def test_deleted_track(self):
+        """
+        Deleted entries are removed from tracks & index, but are left for caller to detach.
+        """
+        deleted = dict(make_track_data(1), deleted=True)
+
+        tracks, added, removed = apply_library_changes(
+            self.tracks, self.index, [deleted], self.columns
+        )
+
+        self.assertEqual(tracks, [self.tracks[0], self.tracks[2]])
+        self.assertEqual(added, [])
+        self.assertEqual(removed, [self.tracks[1]])
+        self.assertEqual(self.tracks[1].library_id, UUID(deleted['id']))
+        self.assertIsNone(self.index.get(deleted['id']))
+
+    def test_updated_track(self):
+        """
+        Updated entries keep their track instances, which are reported as removed & added.
+        """
+        updated = make_track_data(1, title='New title')
+
+        tracks, added, removed = apply_library_changes(
+            self.tracks, self.index, [updated], self.columns
+        )
+
+        self.assertEqual(added, [self.tracks[1]])
+        self.assertEqual(removed, [self.tracks[1]])
+        self.assertIn(self.tracks[1], tracks)
+        self.assertEqual(self.tracks[1].title, 'New title')
+        self.assertTrue(self.tracks[1].is_in_library)
+        self.assertIs(self.index.get(updated['id']), self.tracks[1])
+
+    def test_unchanged_track(self):
+        """
+        Entries that did not change are not reported.
+        """
+        tracks, added, removed = apply_library_changes(
+            self.tracks, self.index, [make_track_data(2)], self.columns
+        )
+
+        self.assertIs(tracks, self.tracks)
+        self.assertEqual((added, removed), ([], []))
+
+    def test_new_track(self):
+        """
+        New entries are appended.
+        """
+        new = make_track_data(5)
+
+        tracks, added, removed = apply_library_changes(
+            self.tracks, self.index, [new], self.columns
+        )
+
+        self.assertEqual(len(tracks), 4)
+        self.assertEqual(added, [tracks[-1]])
+        self.assertEqual(removed, [])
+        self.assertIs(self.index.get(new['id']), tracks[-1])
+
+    def test_merge_full_library(self):
+        """
+        Full refetch keeps instances of unchanged & changed tracks.
+        """
+        fresh = Track.from_data(
+            [make_track_data(0), make_track_data(1, title='New title'), make_track_data(3)],
+            Track.SOURCE_LIBRARY, True, self.columns, interned=False
+        )
+
+        merged, added, removed = merge_tracks(self.tracks, fresh, gp.intern_track)
+
+        self.assertEqual(merged[:2], self.tracks[:2])
+        self.assertEqual(merged[1].title, 'New title')
+        self.assertEqual(added, [self.tracks[1], merged[2]])
+        self.assertEqual(removed, [self.tracks[1], self.tracks[2]])
+        self.assertTrue(self.tracks[2].is_in_library)
+
+
+class SyncLibraryTestCase(unittest.TestCase):
+    """
+    Incremental sync of cached library.
+    """
+    def setUp(self):
+        self.library = [make_track_data(index, lastModifiedTimestamp='100') for index in range(3)]
+        self.changes = []
+        self.requests = []
+        gp.mobile_client.get_all_songs = self._get_all_songs
+        gp._schedule_snapshot_save = lambda: None  # pylint: disable=protected-access
+        gp.invalidate_caches()
+
+    def tearDown(self):
+        del gp.mobile_client.get_all_songs
+        del gp._schedule_snapshot_save  # pylint: disable=protected-access
+        gp.invalidate_caches()
+
+    def _get_all_songs(self, incremental=False, updated_after=None, **_):
+        """
+        Return fake library or changes made after *updated_after*.
+        """
+        self.requests.append(updated_after)
+        if updated_after is not None:
+            return list(self.changes)
+        if incremental:
+            return iter([list(self.library)])
+        return list(self.library)
+
+    def test_incremental_sync(self):
+        """
+        Only changes since last sync are requested & applied.
+        Tracks of deleted entries become store tracks.
+        """
+        tracks = list(gp.get_all_tracks())
+        deleted_id = tracks[0].library_id
+        self.changes = [
+            dict(make_track_data(0), deleted=True, lastModifiedTimestamp='200'),
+            make_track_data(1, title='Renamed', rating='5', lastModifiedTimestamp='300'),
+            make_track_data(7, title='Added', lastModifiedTimestamp='400')
+        ]
+
+        added, removed = gp.sync_library()
+
+        self.assertEqual(self.requests[-1], get_updated_after(100))
+        self.assertEqual(removed, [tracks[0], tracks[1]])
+        self.assertEqual(added[0], tracks[1])
+        self.assertEqual(added[1].title, 'Added')
+        self.assertEqual(gp.cached_tracks, [tracks[2], tracks[1], added[1]])
+        self.assertIsNone(gp.get_track_by_id(deleted_id))
+        self.assertIsNone(tracks[0].library_id)
+        self.assertEqual(tracks[0].id, tracks[0].store_id)
+        self.assertFalse(tracks[0].is_in_library)
+        self.assertEqual(gp.cached_liked_songs.tracks, [tracks[1]])
+        self.assertEqual(
+            [track.title for track in gp.search_library('renamed')], ['Renamed']
+        )
+        self.assertEqual(gp.search_library('title #0'), [])
+        self.assertEqual(gp._library_synced_at, 400)  # pylint: disable=protected-access
+
+    def test_sync_without_changes(self):
+        """
+        Empty changes leave cached tracks as they are.
+        """
+        tracks = gp.get_all_tracks()
+
+        self.assertEqual(gp.sync_library(), ([], []))
+        self.assertIs(gp.cached_tracks, tracks)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests for logger (see :mod:`clay.log`).
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from clay.log import logger
+
+
+class LoggerTestCase(unittest.TestCase):
+    """
+    Recording of log records & writing them into log file.
+    """
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'clay.log')
+        logger.flush()
+        with logger._write_lock:  # pylint: disable=protected-access
+            self.logfile = logger.logfile
+            logger.logfile = open(self.path, 'w')
+        self.records = []
+        logger.on_log_event += self.records.append
+
+    def tearDown(self):
+        logger.on_log_event -= self.records.append
+        logger.flush()
+        with logger._write_lock:  # pylint: disable=protected-access
+            logger.logfile.close()
+            logger.logfile = self.logfile
+        shutil.rmtree(self.temp_dir)
+
+    def test_debug_is_recorded(self):
+        """
+        Debug records reach subscribers & log file.
+        """
+        logger.debug('Called %s(%s)', 'Search', {'query': 'song'})
+        logger.flush()
+
+        self.assertEqual(len(self.records), 1)
+        self.assertEqual(self.records[0].verbosity, 'DEBUG')
+        self.assertIn(self.records[0], logger.get_logs())
+        with open(self.path) as log_file:
+            self.assertIn("DEBUG    Called Search({'query': 'song'})", log_file.read())
+
+    def test_message_is_formatted_once(self):
+        """
+        Message is formatted on first read and reused afterwards.
+        """
+        formatted = []
+
+        class Argument(object):
+            """
+            Argument that counts its formatting.
+            """
+            def __str__(self):
+                formatted.append(self)
+                return 'argument'
+
+        logger.info('Value: %s', Argument())
+        logger.flush()
+
+        self.assertEqual(self.records[0].formatted_message, 'Value: argument')
+        self.assertEqual(len(formatted), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
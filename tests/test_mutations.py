@@ -0,0 +1,193 @@
+"""
+Tests for write-behind library mutations (see :mod:`clay.mutations`).
+"""
+import os
+import tempfile
+import unittest
+
+from clay.mutations import MutationQueue, KIND_RATE, KIND_ADD, KIND_REMOVE
+from clay.settings import settings
+
+
+class _MutationQueue(MutationQueue):
+    """
+    Queue that is flushed by tests instead of timers.
+    """
+    def __init__(self, senders):
+        self.flush_delays = []
+        super(_MutationQueue, self).__init__(senders)
+
+    def _schedule_flush(self, delay):
+        self.flush_delays.append(delay)
+
+
+class MutationQueueTestCase(unittest.TestCase):
+    """
+    Ordering, coalescing & retries of mutations.
+    """
+    def setUp(self):
+        self.sent = []
+        self.failures = 0
+        settings.get_cached_file_path = lambda filename: None
+        settings.save_file_to_cache = lambda filename, content: None
+        settings.remove_file_from_cache = lambda filename: None
+        self.queue = _MutationQueue(dict(
+            (kind, self._make_sender(kind)) for kind in (KIND_RATE, KIND_ADD, KIND_REMOVE)
+        ))
+        self.queue.start()
+
+    def tearDown(self):
+        del settings.get_cached_file_path
+        del settings.save_file_to_cache
+        del settings.remove_file_from_cache
+
+    def _make_sender(self, kind):
+        """
+        Return a sender that records batches of *kind*.
+        """
+        def send(values):
+            """
+            Record batch or fail if failures are requested.
+            """
+            if self.failures:
+                self.failures -= 1
+                raise ValueError('Server error')
+            self.sent.append((kind, values))
+        return send
+
+    def test_user_order(self):
+        """
+        Removal & re-addition of a track are sent in the order they were made.
+        """
+        self.queue.put(KIND_REMOVE, 'library-id', 'library-id')
+        self.queue.put(KIND_ADD, 'store-id', dict(storeId='store-id'))
+        self.queue.put(KIND_RATE, 'store-id', dict(rating='5'))
+
+        self.queue.flush()
+
+        self.assertEqual(self.sent, [
+            (KIND_REMOVE, ['library-id']),
+            (KIND_ADD, [dict(storeId='store-id')]),
+            (KIND_RATE, [dict(rating='5')])
+        ])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_consecutive_mutations_are_batched(self):
+        """
+        Consecutive mutations of the same kind are sent together.
+        """
+        for index in range(3):
+            self.queue.put(KIND_RATE, str(index), dict(rating=str(index)))
+        self.queue.put(KIND_ADD, 'store-id', dict(storeId='store-id'))
+
+        self.queue.flush()
+
+        self.assertEqual([(kind, len(values)) for kind, values in self.sent], [
+            (KIND_RATE, 3), (KIND_ADD, 1)
+        ])
+
+    def test_newer_mutation_replaces_pending_one(self):
+        """
+        Only the last rating of a track is sent, in the position it was made.
+        """
+        self.queue.put(KIND_RATE, 'store-id', dict(rating='5'))
+        self.queue.put(KIND_ADD, 'other-id', dict(storeId='other-id'))
+        self.queue.put(KIND_RATE, 'store-id', dict(rating='1'))
+
+        self.queue.flush()
+
+        self.assertEqual(self.sent, [
+            (KIND_ADD, [dict(storeId='other-id')]),
+            (KIND_RATE, [dict(rating='1')])
+        ])
+
+    def test_failed_batch_blocks_later_ones(self):
+        """
+        Mutations made after a failed batch are not sent before it, callbacks get results.
+        """
+        results = []
+        self.queue.put(
+            KIND_REMOVE, 'library-id', 'library-id',
+            lambda result, error: results.append((result, error))
+        )
+        self.queue.put(KIND_ADD, 'store-id', dict(storeId='store-id'))
+        self.failures = 1
+
+        self.queue.flush()
+
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.queue.flush_delays[-1], MutationQueue.RETRY_DELAY)
+        self.assertEqual(len(self.queue), 2)
+
+        self.queue.flush()
+
+        self.assertEqual([kind for kind, _ in self.sent], [KIND_REMOVE, KIND_ADD])
+        self.assertEqual(results, [(True, None)])
+
+    def test_dropped_after_max_attempts(self):
+        """
+        Mutation is dropped & its callback receives the error after too many failures.
+        """
+        results = []
+        self.queue.put(
+            KIND_RATE, 'store-id', dict(rating='5'),
+            lambda result, error: results.append((result, error))
+        )
+        self.failures = MutationQueue.MAX_ATTEMPTS
+
+        for _ in range(MutationQueue.MAX_ATTEMPTS):
+            self.queue.flush()
+
+        self.assertEqual(len(self.queue), 0)
+        self.assertEqual(len(results), 1)
+        self.assertIsNone(results[0][0])
+        self.assertIsInstance(results[0][1], ValueError)
+
+    def test_discard(self):
+        """
+        Discarded mutation is not sent & its callbacks are not called.
+        """
+        results = []
+        self.queue.put(
+            KIND_ADD, 'store-id', dict(storeId='store-id'),
+            lambda result, error: results.append((result, error))
+        )
+
+        self.assertTrue(self.queue.discard(KIND_ADD, 'store-id'))
+        self.assertFalse(self.queue.discard(KIND_ADD, 'store-id'))
+        self.queue.flush()
+
+        self.assertEqual(self.sent, [])
+        self.assertEqual(results, [])
+
+    def test_mutation_being_sent_is_not_discarded(self):
+        """
+        Mutation cannot be discarded while it is being sent.
+        """
+        discarded = []
+        self.queue._senders[KIND_ADD] = (  # pylint: disable=protected-access
+            lambda values: discarded.append(self.queue.discard(KIND_ADD, 'store-id'))
+        )
+        self.queue.put(KIND_ADD, 'store-id', dict(storeId='store-id'))
+
+        self.queue.flush()
+
+        self.assertEqual(discarded, [False])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_unreadable_file(self):
+        """
+        Mutations file that cannot be read is ignored.
+        """
+        temp_dir = tempfile.mkdtemp()
+        try:
+            settings.get_cached_file_path = lambda filename: temp_dir
+            queue = _MutationQueue({})
+        finally:
+            os.rmdir(temp_dir)
+
+        self.assertEqual(len(queue), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+"""
+Tests for cancellation of superseded playback requests (see :class:`clay.player._Player`).
+"""
+import unittest
+
+from requests import ConnectionError as RequestsConnectionError
+
+from clay.httpclient import http_client
+from clay.notifications import notification_area
+from clay.osd import osd_manager
+from clay.settings import settings
+from clay.track import Track
+try:
+    from clay.player import player
+except (ImportError, NameError, OSError):  # libVLC is not available
+    player = None
+
+from test_gp import make_station_track_data
+
+
+class _MediaPlayer(object):
+    """
+    Media player that records played media.
+    """
+    def __init__(self):
+        self.media = []
+
+    def set_media(self, media):
+        """
+        Record media.
+        """
+        self.media.append(media)
+
+    def play(self):
+        """
+        Do nothing.
+        """
+
+
+class _Response(object):
+    """
+    Streamed response that yields *chunks* and calls *on_chunk* before each one.
+    """
+    def __init__(self, chunks, on_chunk=lambda: None):
+        self.chunks = chunks
+        self.on_chunk = on_chunk
+        self.closed = False
+
+    def iter_content(self, _):
+        """
+        Yield chunks.
+        """
+        for chunk in self.chunks:
+            self.on_chunk()
+            yield chunk
+
+    def close(self):
+        """
+        Mark response as closed.
+        """
+        self.closed = True
+
+
+@unittest.skipIf(player is None, 'libVLC is not available')
+class PlayGenerationTestCase(unittest.TestCase):
+    """
+    Downloads of tracks that are no longer requested never reach libVLC.
+    """
+    def setUp(self):
+        self.track = Track.from_data(
+            make_station_track_data(0), Track.SOURCE_STATION, interned=False
+        )
+        self.response = _Response([b'ab', b'cd'])
+        self.requests = []
+        self.saved = []
+        self.notifications = []
+        self.media_player = player.media_player
+        player.media_player = _MediaPlayer()
+        http_client.get = self._get
+        settings.save_file_to_cache = self._save_file_to_cache
+        notification_area.notify = self.notifications.append
+        osd_manager.notify = lambda track: None
+        player._is_loading = True  # pylint: disable=protected-access
+
+    def tearDown(self):
+        player.media_player = self.media_player
+        player._is_loading = False  # pylint: disable=protected-access
+        del http_client.get
+        del settings.save_file_to_cache
+        del notification_area.notify
+        del osd_manager.notify
+
+    def _get(self, url, **_):
+        """
+        Record requested URL & return fake response.
+        """
+        self.requests.append(url)
+        return self.response
+
+    def _save_file_to_cache(self, filename, content):
+        """
+        Record saved file & return its path.
+        """
+        self.saved.append((filename, content))
+        return '/cache/' + filename
+
+    @staticmethod
+    def supersede():
+        """
+        Simulate a newer playback request.
+        """
+        player._play_generation += 1  # pylint: disable=protected-access
+
+    def test_current_download_is_played(self):
+        """
+        Download of the most recent request is cached & played.
+        """
+        generation = player._play_generation  # pylint: disable=protected-access
+
+        player._download_track('url', None, self.track, generation)  # pylint: disable=protected-access
+
+        self.assertEqual(self.saved, [(self.track.filename, b'abcd')])
+        self.assertEqual(len(player.media_player.media), 1)
+        self.assertFalse(player.is_loading)
+        self.assertTrue(self.response.closed)
+
+    def test_stale_download_is_not_started(self):
+        """
+        Media URL of a superseded request is not downloaded.
+        """
+        generation = player._play_generation  # pylint: disable=protected-access
+        self.supersede()
+
+        player._download_track('url', None, self.track, generation)  # pylint: disable=protected-access
+
+        self.assertEqual(self.requests, [])
+        self.assertEqual(player.media_player.media, [])
+        self.assertTrue(player.is_loading)
+
+    def test_download_is_abandoned_once_superseded(self):
+        """
+        Download is abandoned between chunks once a newer request is made.
+        """
+        generation = player._play_generation  # pylint: disable=protected-access
+        self.response = _Response([b'ab', b'cd'], self.supersede)
+
+        player._download_track('url', None, self.track, generation)  # pylint: disable=protected-access
+
+        self.assertEqual(self.requests, ['url'])
+        self.assertEqual(self.saved, [])
+        self.assertEqual(player.media_player.media, [])
+        self.assertTrue(self.response.closed)
+
+    def test_stale_media_url_is_not_played(self):
+        """
+        Streamed media URL of a superseded request is dropped.
+        """
+        generation = player._play_generation  # pylint: disable=protected-access
+        self.supersede()
+
+        player._play_ready('url', None, self.track, generation)  # pylint: disable=protected-access
+
+        self.assertEqual(player.media_player.media, [])
+
+    def test_failed_download_stops_loading(self):
+        """
+        Connection error during download is reported & loading state is cleared.
+        """
+        def fail():
+            """
+            Drop connection.
+            """
+            raise RequestsConnectionError('Connection reset')
+        generation = player._play_generation  # pylint: disable=protected-access
+        self.response = _Response([b'ab'], fail)
+
+        player._download_track('url', None, self.track, generation)  # pylint: disable=protected-access
+
+        self.assertFalse(player.is_loading)
+        self.assertEqual(len(self.notifications), 1)
+        self.assertEqual(player.media_player.media, [])
+        self.assertTrue(self.response.closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""
+Tests for the shared worker pool (see :mod:`clay.pool`).
+"""
+from threading import Event, Lock
+import time
+import unittest
+
+from clay.concurrency import asynchronous, coalesced, SingleFlight
+from clay.pool import worker_pool, _WorkerPool, PRIORITY_PLAYBACK, PRIORITY_INTERACTIVE, \
+    PRIORITY_BACKGROUND
+
+from helpers import TIMEOUT, wait_until
+
+
+class WorkerPoolTestCase(unittest.TestCase):
+    """
+    Priority lanes, reserved workers & cancellation.
+    """
+    def setUp(self):
+        self.pool = _WorkerPool(2, reserved=1)
+        self.order = []
+        self.lock = Lock()
+
+    def _record(self, name):
+        """
+        Record task name.
+        """
+        with self.lock:
+            self.order.append(name)
+
+    def _block(self):
+        """
+        Occupy the only non-reserved worker until returned event is set.
+        """
+        gate = Event()
+        self.pool.submit(gate.wait, (TIMEOUT,))
+        wait_until(lambda: self.pool.get_stats()['busy'] == 1)
+        return gate
+
+    def test_priority_order(self):
+        """
+        Queued tasks run by priority, then in submission order.
+        """
+        gate = self._block()
+        self.pool.submit(self._record, ('background',), priority=PRIORITY_BACKGROUND)
+        self.pool.submit(self._record, ('interactive 1',), priority=PRIORITY_INTERACTIVE)
+        self.pool.submit(self._record, ('interactive 2',), priority=PRIORITY_INTERACTIVE)
+
+        self.assertEqual(self.pool.get_stats()['lanes'], {
+            PRIORITY_INTERACTIVE: 2, PRIORITY_BACKGROUND: 1
+        })
+        gate.set()
+        wait_until(lambda: len(self.order) == 3)
+
+        self.assertEqual(self.order, ['interactive 1', 'interactive 2', 'background'])
+
+    def test_reserved_worker(self):
+        """
+        Playback tasks do not wait for busy workers.
+        """
+        gate = self._block()
+        self.pool.submit(self._record, ('interactive',))
+        self.pool.submit(self._record, ('playback',), priority=PRIORITY_PLAYBACK)
+
+        wait_until(lambda: self.order == ['playback'])
+        gate.set()
+        wait_until(lambda: len(self.order) == 2)
+
+    def test_cancel(self):
+        """
+        Cancelled tasks never run.
+        """
+        gate = self._block()
+        task = self.pool.submit(self._record, ('cancelled',))
+        self.pool.submit(self._record, ('done',))
+        task.cancel()
+        gate.set()
+
+        wait_until(lambda: self.order == ['done'])
+        self.assertEqual(self.pool.get_stats()['queued'], 0)
+
+    def test_failing_task(self):
+        """
+        Errors of tasks do not stop workers.
+        """
+        self.pool.submit(lambda: 1 / 0)
+        self.pool.submit(self._record, ('done',))
+
+        wait_until(lambda: self.order == ['done'])
+
+
+class _Client(object):
+    """
+    Object with a coalesced slow method.
+    """
+    def __init__(self):
+        self._flights = SingleFlight()
+        self.gate = Event()
+        self.calls = 0
+
+    @coalesced
+    def fetch(self, value):
+        """
+        Wait for gate & return *value*.
+        """
+        self.calls += 1
+        self.gate.wait(TIMEOUT)
+        return value
+
+    fetch_async = asynchronous(fetch)
+
+
+class JoinedCallTestCase(unittest.TestCase):
+    """
+    Asynchronous calls that join in-flight coalesced calls.
+    """
+    def test_joined_calls_do_not_occupy_workers(self):
+        """
+        Joined calls receive leader's result without blocking workers.
+        """
+        client = _Client()
+        results = []
+        busy = worker_pool.get_stats()['busy']
+
+        client.fetch_async(42, callback=lambda result, error: results.append(result))
+        wait_until(lambda: client.calls == 1)
+        for _ in range(3):
+            client.fetch_async(42, callback=lambda result, error: results.append(result))
+
+        self.assertEqual(worker_pool.get_stats()['busy'], busy + 1)
+        client.gate.set()
+        wait_until(lambda: len(results) == 4)
+
+        self.assertEqual(results, [42] * 4)
+        self.assertEqual(client.calls, 1)
+
+    def test_cancel_joined_call(self):
+        """
+        Cancelled joined call does not receive result.
+        """
+        client = _Client()
+        results = []
+
+        client.fetch_async(1, callback=lambda result, error: results.append('leader'))
+        wait_until(lambda: client.calls == 1)
+        task = client.fetch_async(1, callback=lambda result, error: results.append('joined'))
+        task.cancel()
+        client.gate.set()
+
+        wait_until(lambda: results == ['leader'])
+        time.sleep(0.05)
+        self.assertEqual(results, ['leader'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for local search index (see :mod:`clay.searchindex`).
+"""
+import unittest
+
+from clay.searchindex import SearchIndex, tokenize
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    """
+    Prefix matching, updates & persistence of search index.
+    """
+    def setUp(self):
+        self.index = SearchIndex()
+        self.index.add('1', tokenize(u'Hey Jude') + tokenize(u'The Beatles'))
+        self.index.add('2', tokenize(u'Heroes') + tokenize(u'David Bowie'))
+        self.index.add('3', tokenize(u'Señorita') + tokenize(u'Ünlü Şarkıcı'))
+
+    def test_tokenize(self):
+        """
+        Text is split into lowercase words.
+        """
+        self.assertEqual(tokenize(u'Hey, Jude!'), [u'hey', u'jude'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_prefix_match(self):
+        """
+        Query words match prefixes of indexed words.
+        """
+        self.assertEqual(self.index.search(u'he'), set(['1', '2']))
+        self.assertEqual(self.index.search(u'HERO'), set(['2']))
+        self.assertEqual(self.index.search(u'jude hey'), set(['1']))
+
+    def test_all_words_must_match(self):
+        """
+        Keys that do not match every query word are skipped.
+        """
+        self.assertEqual(self.index.search(u'he bowie'), set(['2']))
+        self.assertEqual(self.index.search(u'hey bowie'), set())
+        self.assertEqual(self.index.search(u'  '), set())
+
+    def test_unicode(self):
+        """
+        Non-ASCII words are matched.
+        """
+        self.assertEqual(self.index.search(u'SEÑ'), set(['3']))
+        self.assertEqual(self.index.search(u'ünlü'), set(['3']))
+
+    def test_update_and_remove(self):
+        """
+        Re-added keys are matched by new words only, removed keys are not matched.
+        """
+        self.index.add('1', tokenize(u'Let It Be'))
+        self.assertEqual(self.index.search(u'he'), set(['2']))
+        self.assertEqual(self.index.search(u'let'), set(['1']))
+
+        self.index.remove('2')
+        self.index.remove('missing')
+        self.assertEqual(self.index.search(u'he'), set())
+        self.assertEqual(len(self.index), 2)
+
+    def test_records_round_trip(self):
+        """
+        Index restored from records matches the same keys.
+        """
+        index = SearchIndex.from_records(self.index.to_records())
+
+        self.assertEqual(len(index), 3)
+        for query in (u'he', u'bowie', u'señ', u'the beatles'):
+            self.assertEqual(index.search(query), self.index.search(query))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for library snapshots (see :mod:`clay.snapshot`).
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from clay.snapshot import Snapshot, dump_snapshot
+
+
+class SnapshotTestCase(unittest.TestCase):
+    """
+    Snapshot serialization & memory-mapped reading.
+    """
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, sections, name='library.snapshot'):
+        """
+        Dump *sections* into a file and return its snapshot.
+        """
+        path = os.path.join(self.temp_dir, name)
+        with open(path, 'wb') as snapshot_file:
+            snapshot_file.write(dump_snapshot(sections))
+        return Snapshot(path)
+
+    def test_round_trip(self):
+        """
+        Records are read back as they were written.
+        """
+        tracks = [dict(title=u'Title #{}'.format(index), rating=index) for index in range(5)]
+        snapshot = self._write(dict(meta=[dict(saved_at=1)], tracks=tracks, stations=[]))
+
+        self.assertEqual(list(snapshot.get_section('tracks')), tracks)
+        self.assertEqual(snapshot.get_section('tracks')[-1], tracks[-1])
+        self.assertEqual(len(snapshot.get_section('stations')), 0)
+        self.assertIsNone(snapshot.get_section('playlists'))
+        self.assertEqual(snapshot.get_meta(), dict(saved_at=1))
+
+    def test_iter_chunks(self):
+        """
+        Records are decoded in chunks of requested size.
+        """
+        records = [dict(index=index) for index in range(7)]
+        section = self._write(dict(tracks=records)).get_section('tracks')
+
+        chunks = list(section.iter_chunks(3))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [3, 3, 1])
+        self.assertEqual(sum(chunks, []), records)
+
+    def test_copy_section(self):
+        """
+        Sections of previous snapshot are carried over into a new one.
+        """
+        records = [dict(name=u'é #{}'.format(index)) for index in range(3)]
+        previous = self._write(dict(playlists=records), 'previous.snapshot')
+
+        snapshot = self._write(dict(
+            meta=[dict(saved_at=2)],
+            playlists=previous.get_section('playlists')
+        ))
+
+        self.assertEqual(list(snapshot.get_section('playlists')), records)
+        self.assertEqual(snapshot.get_meta(), dict(saved_at=2))
+
+    def test_index_out_of_range(self):
+        """
+        Reading past the end of a section raises IndexError.
+        """
+        section = self._write(dict(tracks=[dict(index=0)])).get_section('tracks')
+
+        with self.assertRaises(IndexError):
+            section[1]  # pylint: disable=pointless-statement
+
+    def test_invalid_file(self):
+        """
+        Files that are not snapshots are rejected.
+        """
+        path = os.path.join(self.temp_dir, 'broken.snapshot')
+        with open(path, 'wb') as snapshot_file:
+            snapshot_file.write(b'NOTASNAPSHOT' * 4)
+
+        with self.assertRaises(ValueError):
+            Snapshot(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+"""
+Tests for incremental updates of song lists (see :class:`clay.songlist.SongListBox`).
+"""
+from operator import attrgetter
+import unittest
+
+from clay.track import Track
+try:
+    from clay.player import player
+    from clay.songlist import SongListBox, SongListItem
+except (ImportError, NameError, OSError):  # libVLC is not available
+    SongListBox = None
+
+from test_gp import make_station_track_data
+
+
+def make_tracks(*indexes):
+    """
+    Return tracks titled "Title #<index>".
+    """
+    return [
+        Track.from_data(make_station_track_data(index), Track.SOURCE_STATION, interned=False)
+        for index in indexes
+    ]
+
+
+@unittest.skipIf(SongListBox is None, 'libVLC is not available')
+class SongListBoxTestCase(unittest.TestCase):
+    """
+    Merging & sorted insertion of tracks into a list sorted by title.
+    """
+    def setUp(self):
+        self.songlist = SongListBox(None)
+        self.key = attrgetter('title')
+
+    def tearDown(self):
+        player.track_changed -= self.songlist.track_changed
+        player.media_state_changed -= self.songlist.media_state_changed
+
+    def get_items(self):
+        """
+        Return song items of the list.
+        """
+        return [item for item in self.songlist.walker if isinstance(item, SongListItem)]
+
+    def test_merge_tracks(self):
+        """
+        New tracks are merged in order, existing items are kept & keep focus.
+        """
+        self.songlist.populate(make_tracks(0, 2, 4))
+        old_items = self.get_items()
+        self.songlist.walker.set_focus(1)
+        new_tracks = make_tracks(1, 3, 5)
+
+        self.songlist.merge_tracks(new_tracks, self.key)
+
+        items = self.get_items()
+        self.assertEqual(
+            [item.track.title for item in items],
+            ['Title #{}'.format(index) for index in range(6)]
+        )
+        self.assertEqual([items[0], items[2], items[4]], old_items)
+        self.assertEqual(self.songlist.tracks, [item.track for item in items])
+        self.assertEqual([item.index for item in items], list(range(6)))
+        self.assertIs(self.songlist.walker.get_focus()[0], old_items[1])
+
+    def test_merge_tracks_into_empty_list(self):
+        """
+        Merging into an empty list shows merged tracks.
+        """
+        tracks = make_tracks(0, 1)
+
+        self.songlist.merge_tracks(tracks, self.key)
+
+        self.assertEqual([item.track for item in self.get_items()], tracks)
+        self.assertEqual(self.songlist.walker.get_focus()[1], 0)
+
+    def test_insert_sorted_track(self):
+        """
+        Tracks are inserted after items with the same key, indexes are updated.
+        """
+        tracks = make_tracks(0, 2)
+        self.songlist.populate(list(tracks))
+        middle, duplicate = make_tracks(1, 2)
+
+        self.songlist.insert_sorted_track(middle, self.key)
+        self.songlist.insert_sorted_track(duplicate, self.key)
+
+        items = self.get_items()
+        expected = [tracks[0], middle, tracks[1], duplicate]
+        self.assertEqual([item.track for item in items], expected)
+        self.assertEqual(self.songlist.tracks, expected)
+        self.assertEqual([item.index for item in items], list(range(4)))
+
+    def test_insert_sorted_track_under_placeholder(self):
+        """
+        While placeholder is shown, tracks are only inserted into the track list.
+        """
+        tracks = make_tracks(0, 2)
+        self.songlist.tracks = list(tracks)
+        self.songlist.set_placeholder('Loading...')
+        track = make_tracks(1)[0]
+
+        self.songlist.insert_sorted_track(track, self.key)
+
+        self.assertEqual(self.songlist.tracks, [tracks[0], track, tracks[1]])
+        self.assertTrue(self.songlist.is_placeholder_shown)
+        self.assertEqual(self.get_items(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
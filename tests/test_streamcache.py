@@ -0,0 +1,92 @@
+"""
+Tests for signed stream URL cache (see :mod:`clay.streamcache`).
+"""
+import time
+import unittest
+
+from clay.streamcache import StreamURLCache
+
+
+def make_url(expires_in):
+    """
+    Return signed URL that expires in *expires_in* seconds.
+    """
+    return 'https://example.com/stream?id=1&expire={}'.format(int(time.time() + expires_in))
+
+
+class StreamURLCacheTestCase(unittest.TestCase):
+    """
+    Expiry, refresh-ahead & eviction of cached stream URLs.
+    """
+    def setUp(self):
+        self.cache = StreamURLCache(size=2, default_ttl=60, refresh_margin=30, refresh_ahead=300)
+
+    def test_expiry_from_url(self):
+        """
+        Expiry is read from "expire" parameter or defaults to TTL.
+        """
+        self.assertEqual(self.cache.get_expiry('https://example.com/?expire=1234'), 1234)
+        expiry = self.cache.get_expiry('https://example.com/?expire=never')
+        self.assertAlmostEqual(expiry, time.time() + 60, delta=5)
+
+    def test_fresh_url(self):
+        """
+        Fresh URL is served & not due for refresh.
+        """
+        url = make_url(3600)
+        self.cache.put(1, 'hi', url)
+
+        self.assertEqual(self.cache.get(1, 'hi'), (url, False))
+        self.assertEqual(self.cache.get('1', 'hi'), (url, False))
+        self.assertEqual(self.cache.get(1, 'low'), (None, False))
+
+    def test_expiring_url_is_not_served(self):
+        """
+        URL that expires within refresh margin is dropped.
+        """
+        self.cache.put(1, 'hi', make_url(10))
+
+        self.assertEqual(self.cache.get(1, 'hi'), (None, False))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_refresh_ahead(self):
+        """
+        URL that expires soon is served & reported as due for refresh only once.
+        """
+        url = make_url(120)
+        self.cache.put(1, 'hi', url)
+
+        self.assertEqual(self.cache.get(1, 'hi'), (url, True))
+        self.assertEqual(self.cache.get(1, 'hi'), (url, False))
+
+        fresh_url = make_url(3600)
+        self.cache.put(1, 'hi', fresh_url)
+        self.assertEqual(self.cache.get(1, 'hi'), (fresh_url, False))
+
+    def test_lru_eviction(self):
+        """
+        Least recently used URL is evicted when cache is full.
+        """
+        for track_id in (1, 2):
+            self.cache.put(track_id, 'hi', make_url(3600))
+        self.cache.get(1, 'hi')
+        self.cache.put(3, 'hi', make_url(3600))
+
+        self.assertEqual(len(self.cache), 2)
+        self.assertIsNone(self.cache.get(2, 'hi')[0])
+        self.assertIsNotNone(self.cache.get(1, 'hi')[0])
+        self.assertIsNotNone(self.cache.get(3, 'hi')[0])
+
+    def test_clear(self):
+        """
+        Clearing removes all URLs.
+        """
+        self.cache.put(1, 'hi', make_url(3600))
+        self.cache.clear()
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.get(1, 'hi'), (None, False))
+
+
+if __name__ == '__main__':
+    unittest.main()